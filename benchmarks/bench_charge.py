@@ -0,0 +1,196 @@
+import argparse
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_serveur import LANCEURS, lancer_serveur
+from bot import STRATEGIES, Bot
+from protocole import TAILLE_LECTURE, encoder_message
+
+TICKS = os.sysconf('SC_CLK_TCK')
+# Intervalle entre deux PONG spontanés des spectateurs, en secondes (bien moins que le delai_ping du serveur)
+PERIODE_PONG = 5.0
+
+
+def arborescence(pid):
+    # pid et tous ses descendants : les ouvriers de la grappe sont des enfants du serveur de fork, lui-même
+    # enfant du processus frontal
+    pids = [pid]
+    for numero in pids:
+        try:
+            taches = os.listdir(f"/proc/{numero}/task")
+        except FileNotFoundError:
+            continue  # Processus terminé entre-temps
+        for tache in taches:
+            try:
+                with open(f"/proc/{numero}/task/{tache}/children") as fichier:
+                    pids.extend(int(enfant) for enfant in fichier.read().split())
+            except FileNotFoundError:
+                pass
+    return pids
+
+
+def mesurer_processus(pid):
+    # Temps CPU (utilisateur + système, en secondes) et mémoire résidente (actuelle et maximale, en Mo),
+    # additionnés sur le processus et ses descendants. Le maximum est la somme des maximums de chacun,
+    # et les pages partagées sont comptées dans chaque processus : c'est une borne haute.
+    cpu = rss = rss_max = 0.0
+    for numero in arborescence(pid):
+        try:
+            with open(f"/proc/{numero}/stat") as fichier:
+                champs = fichier.read().rsplit(")", 1)[1].split()
+            memoire = {}
+            with open(f"/proc/{numero}/status") as fichier:
+                for ligne in fichier:
+                    if ligne.startswith(("VmRSS:", "VmHWM:")):
+                        nom, valeur = ligne.split(":")
+                        memoire[nom] = int(valeur.split()[0]) / 1024
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        cpu += (int(champs[11]) + int(champs[12])) / TICKS
+        rss += memoire.get("VmRSS", 0.0)
+        rss_max += memoire.get("VmHWM", 0.0)
+    return cpu, rss, rss_max
+
+
+def centile(valeurs, proportion):
+    if not valeurs:
+        return float("nan")
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * proportion))]
+
+
+def enchainer(bot, arret):
+    # Termine la partie en cours du bot déjà connecté, puis enchaîne les suivantes
+    bot.jouer()
+    if not arret.is_set():
+        bot.executer(arret)
+
+
+def regarder(hote, port, nombre, arret, recus):
+    # Tient nombre spectateurs dans un seul thread ; un spectateur dont la partie se termine en regarde une autre.
+    # recus[0] compte les octets reçus par l'ensemble des spectateurs.
+    selecteur = selectors.DefaultSelector()
+    # Les trames reçues ne sont pas décodées : au lieu de répondre aux PING du serveur, chaque spectateur
+    # envoie un PONG de lui-même assez souvent pour n'être jamais sondé
+    prochain_pong = time.monotonic() + PERIODE_PONG
+
+    def ouvrir():
+        sock = socket.create_connection((hote, port))
+        sock.sendall(encoder_message({"action": "SPECTATEUR"}))
+        sock.setblocking(False)
+        selecteur.register(sock, selectors.EVENT_READ)
+
+    for _ in range(nombre):
+        ouvrir()
+    while not arret.is_set():
+        for cle, _ in selecteur.select(0.1):
+            try:
+                donnees = cle.fileobj.recv(TAILLE_LECTURE)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                donnees = b''
+            if donnees:
+                recus[0] += len(donnees)
+                continue
+            selecteur.unregister(cle.fileobj)
+            cle.fileobj.close()
+            if not arret.is_set():
+                ouvrir()
+        if time.monotonic() >= prochain_pong:
+            prochain_pong = time.monotonic() + PERIODE_PONG
+            for cle in list(selecteur.get_map().values()):
+                try:
+                    cle.fileobj.send(encoder_message({"action": "PONG"}))
+                except OSError:
+                    pass  # La coupure sera vue à la prochaine lecture
+    for cle in list(selecteur.get_map().values()):
+        cle.fileobj.close()
+    selecteur.close()
+
+
+def mesurer(mode, hote, port, nombre_bots, joueurs_par_partie, duree, strategie, reflexion, proba_chat, binaire=False,
+            nombre_spectateurs=0):
+    # Lance le serveur dans un processus séparé, puis nombre_bots bots qui enchaînent les parties
+    processus = lancer_serveur(mode, hote, port, joueurs_max=joueurs_par_partie, delai_fin_tour=0.05,
+                               chat_debit=10**9, chat_rafale=10**9)
+    try:
+        cpu_depart, _, _ = mesurer_processus(processus.pid)
+        bots = [Bot(hote, port, f"bot{i}", strategie, reflexion, proba_chat, graine=i, binaire=binaire) for i in range(nombre_bots)]
+        arret = threading.Event()
+
+        # Connexions par seconde : ouverture de toutes les connexions depuis un seul thread
+        debut = time.perf_counter()
+        for bot in bots:
+            bot.se_connecter()
+        duree_connexion = time.perf_counter() - debut
+
+        # Les spectateurs regardent la partie la plus récente pendant que les bots jouent
+        recus_spectateurs = [0]
+        if nombre_spectateurs:
+            spectateurs = threading.Thread(target=regarder, args=(hote, port, nombre_spectateurs, arret, recus_spectateurs))
+            spectateurs.start()
+
+        debut = time.perf_counter()
+        threads = []
+        for bot in bots:
+            thread = threading.Thread(target=enchainer, args=(bot, arret))
+            thread.start()
+            threads.append(thread)
+        time.sleep(duree)
+        arret.set()
+        cpu_fin, rss, rss_max = mesurer_processus(processus.pid)
+        duree_jeu = time.perf_counter() - debut
+        for bot in bots:
+            bot.connecte = False
+            if bot.socket_client is not None:
+                try:
+                    bot.socket_client.shutdown(2)
+                except OSError:
+                    pass
+        for thread in threads:
+            thread.join(5)
+        if nombre_spectateurs:
+            spectateurs.join(5)
+    finally:
+        processus.kill()
+        processus.wait()
+
+    # Chaque tour est compté par chacun des joueurs de la partie
+    tours = sum(bot.tours for bot in bots) / joueurs_par_partie
+    latences = sorted(latence for bot in bots for latence in bot.latences_chat)
+    print(f"[{mode}] {nombre_bots} bots, {joueurs_par_partie} par partie, {duree_jeu:.1f} s")
+    print(f"[{mode}] connexions : {nombre_bots / duree_connexion:,.0f}/s")
+    print(f"[{mode}] tours : {tours / duree_jeu:,.1f}/s")
+    print(f"[{mode}] latence de diffusion du chat ({len(latences)} lignes) : "
+          f"p50 {centile(latences, 0.5) * 1000:.2f} ms, p90 {centile(latences, 0.9) * 1000:.2f} ms, "
+          f"p99 {centile(latences, 0.99) * 1000:.2f} ms")
+    if nombre_spectateurs:
+        print(f"[{mode}] {nombre_spectateurs} spectateurs : {recus_spectateurs[0] / duree_jeu / 1e3:,.0f} Ko/s reçus")
+    print(f"[{mode}] CPU serveur : {(cpu_fin - cpu_depart) / duree_jeu * 100:.0f} %, "
+          f"RSS {rss:.1f} Mo (max {rss_max:.1f} Mo)")
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Banc de charge de bout en bout avec des bots")
+    parseur.add_argument("--hote", default="127.0.0.2")
+    parseur.add_argument("--port", type=int, default=10122)
+    parseur.add_argument("--bots", type=int, default=60)
+    parseur.add_argument("--joueurs-par-partie", type=int, default=6)
+    parseur.add_argument("--duree", type=float, default=10.0)
+    parseur.add_argument("--strategie", default="aleatoire", choices=list(STRATEGIES))
+    parseur.add_argument("--reflexion", type=float, nargs=2, default=(0.0, 0.01), metavar=("MIN", "MAX"))
+    parseur.add_argument("--chat", type=float, default=0.5, help="probabilité d'écrire dans le chat à chaque tour")
+    parseur.add_argument("--binaire", action="store_true", help="les bots négocient l'encodage binaire")
+    parseur.add_argument("--spectateurs", type=int, default=0, help="spectateurs connectés pendant la mesure")
+    parseur.add_argument("--modes", nargs="+", default=list(LANCEURS), choices=list(LANCEURS))
+    arguments = parseur.parse_args()
+    for decalage, mode in enumerate(arguments.modes):
+        mesurer(mode, arguments.hote, arguments.port + decalage, arguments.bots, arguments.joueurs_par_partie,
+                arguments.duree, arguments.strategie, tuple(arguments.reflexion), arguments.chat, arguments.binaire,
+                arguments.spectateurs)
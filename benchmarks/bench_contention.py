@@ -0,0 +1,126 @@
+import argparse
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_charge import centile, enchainer
+from bench_serveur import lancer_serveur
+from bot import Bot
+
+# Histogrammes des verrous exposés par le serveur (préfixe chat_paresseux_verrou_)
+VERROUS = {
+    "jeu": "chat_paresseux_verrou",
+    "chat": "chat_paresseux_verrou_chat",
+}
+
+
+def bavarder(bot, arret, periode):
+    # Envoie une ligne de chat toutes les periode secondes, en parallèle du thread de jeu du bot
+    while not arret.wait(periode):
+        if not bot.connecte or bot.socket_client is None:
+            continue
+        try:
+            bot.envoyer({"action": "CHAT", "text": f"t={time.monotonic()}"})
+        except (OSError, AttributeError):
+            pass  # Le bot change de partie : la ligne est perdue
+
+
+def lire_histogrammes(hote_admin, port_admin):
+    # Comptes cumulés, somme et nombre d'observations de chaque histogramme exposé
+    with urllib.request.urlopen(f"http://{hote_admin}:{port_admin}/metrics", timeout=5) as reponse:
+        texte = reponse.read().decode()
+    histogrammes = {}
+    for ligne in texte.splitlines():
+        if ligne.startswith("#"):
+            continue
+        nom, valeur = ligne.rsplit(" ", 1)
+        if "_bucket{" in nom:
+            base, borne = nom.split('_bucket{le="')
+            histogrammes.setdefault(base, {"buckets": []})["buckets"].append((float(borne[:-2]), float(valeur)))
+        elif nom.endswith("_sum"):
+            histogrammes.setdefault(nom[:-4], {"buckets": []})["somme"] = float(valeur)
+        elif nom.endswith("_count"):
+            histogrammes.setdefault(nom[:-6], {"buckets": []})["nombre"] = float(valeur)
+    return histogrammes
+
+
+def borne_centile(histogramme, proportion):
+    # Borne supérieure du compartiment qui contient le centile demandé
+    for borne, cumul in histogramme["buckets"]:
+        if cumul >= proportion * histogramme["nombre"]:
+            return borne
+    return float("inf")
+
+
+def decrire_verrou(histogrammes, base):
+    attente = histogrammes.get(f"{base}_attente_secondes")
+    tenue = histogrammes.get(f"{base}_tenue_secondes")
+    if not attente or not attente.get("nombre"):
+        return "non mesuré"
+    return (f"{attente['nombre']:,.0f} prises, attente moyenne {attente['somme'] / attente['nombre'] * 1e6:.1f} µs "
+            f"(p99 ≤ {borne_centile(attente, 0.99) * 1e6:,.0f} µs), "
+            f"tenue moyenne {tenue['somme'] / tenue['nombre'] * 1e6:.1f} µs "
+            f"(p99 ≤ {borne_centile(tenue, 0.99) * 1e6:,.0f} µs)")
+
+
+def mesurer(mode, hote, port, port_admin, nombre_bots, joueurs_par_partie, duree, periode_chat):
+    # Des parties de joueurs_par_partie bots, chaque bot jouant et écrivant dans le chat depuis deux threads :
+    # le chat est en concurrence directe avec les PRET, CHOIX et calculs de scores de la même partie
+    processus = lancer_serveur(mode, hote, port, joueurs_max=joueurs_par_partie, delai_fin_tour=0.05,
+                               chat_debit=10**9, chat_rafale=10**9, metriques=True, port_admin=port_admin)
+    try:
+        bots = [Bot(hote, port, f"bot{i}", graine=i) for i in range(nombre_bots)]
+        for bot in bots:
+            bot.se_connecter()
+        arret = threading.Event()
+        debut = time.perf_counter()
+        threads = [threading.Thread(target=enchainer, args=(bot, arret)) for bot in bots]
+        threads += [threading.Thread(target=bavarder, args=(bot, arret, periode_chat)) for bot in bots]
+        for thread in threads:
+            thread.start()
+        time.sleep(duree)
+        histogrammes = lire_histogrammes("127.0.0.1", port_admin)
+        arret.set()
+        duree_jeu = time.perf_counter() - debut
+        for bot in bots:
+            bot.connecte = False
+            if bot.socket_client is not None:
+                try:
+                    bot.socket_client.shutdown(2)
+                except OSError:
+                    pass
+        for thread in threads:
+            thread.join(5)
+    finally:
+        processus.kill()
+        processus.wait()
+
+    tours = sum(bot.tours for bot in bots) / joueurs_par_partie
+    latences = sorted(latence for bot in bots for latence in bot.latences_chat)
+    print(f"[{mode}] {nombre_bots} bots, {joueurs_par_partie} par partie, une ligne de chat par bot "
+          f"toutes les {periode_chat * 1000:.0f} ms, {duree_jeu:.1f} s")
+    print(f"[{mode}] tours : {tours / duree_jeu:,.1f}/s, lignes de chat reçues en retour : {len(latences) / duree_jeu:,.0f}/s")
+    print(f"[{mode}] latence du chat : p50 {centile(latences, 0.5) * 1000:.2f} ms, "
+          f"p99 {centile(latences, 0.99) * 1000:.2f} ms")
+    for nom, base in VERROUS.items():
+        print(f"[{mode}] verrou {nom} : {decrire_verrou(histogrammes, base)}")
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Contention des verrous de partie sous un chat intense")
+    parseur.add_argument("--hote", default="127.0.0.2")
+    parseur.add_argument("--port", type=int, default=10142)
+    parseur.add_argument("--port-admin", type=int, default=9142)
+    parseur.add_argument("--bots", type=int, default=60)
+    parseur.add_argument("--joueurs-par-partie", type=int, default=10)
+    parseur.add_argument("--duree", type=float, default=10.0)
+    parseur.add_argument("--periode-chat", type=float, default=0.01, help="secondes entre deux lignes d'un même bot")
+    parseur.add_argument("--modes", nargs="+", default=["threads", "asyncio"], choices=["threads", "asyncio"])
+    arguments = parseur.parse_args()
+    for decalage, mode in enumerate(arguments.modes):
+        mesurer(mode, arguments.hote, arguments.port + decalage, arguments.port_admin + decalage, arguments.bots,
+                arguments.joueurs_par_partie, arguments.duree, arguments.periode_chat)
@@ -0,0 +1,114 @@
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_serveur import LANCEURS, lancer_serveur
+from protocole import DecodeurFlux, TAILLE_LECTURE, encoder_message
+
+
+def lecteur_normal(sock, latences, arret):
+    # Lit en continu et mesure le délai entre l'envoi d'une ligne de chat et sa réception
+    decodeur = DecodeurFlux()
+    sock.settimeout(0.2)
+    while not arret.is_set():
+        try:
+            donnees = sock.recv(TAILLE_LECTURE)
+        except socket.timeout:
+            continue
+        except OSError:
+            return
+        if not donnees:
+            return
+        maintenant = time.perf_counter()
+        for message in decodeur.alimenter(donnees):
+            if message.get("type") == "CHAT":
+                for ligne in message["lignes"]:
+                    envoi = float(ligne.split(": ", 1)[1].split()[0])
+                    latences.append(maintenant - envoi)
+
+
+def lecteur_lent_deconnecte(sock, delai):
+    # Le lecteur lent ne lit jamais ; on regarde seulement si le serveur finit par le couper
+    sock.settimeout(delai)
+    limite = time.monotonic() + delai
+    try:
+        while time.monotonic() < limite:
+            time.sleep(0.1)
+            # Un envoi vers un socket coupé par le serveur finit par échouer
+            sock.sendall(encoder_message({"action": "PARTIES"}))
+    except OSError:
+        return True
+    return False
+
+
+def mesurer(mode, hote, port, joueurs, lignes, taille_ligne):
+    processus = lancer_serveur(mode, hote, port, taille_file_envoi=256 * 1024, delai_retard=1.0,
+                                chat_debit=10**9, chat_rafale=10**9)
+    try:
+        # Le client lent réduit son tampon de réception pour saturer vite le serveur
+        lent = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        lent.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        lent.connect((hote, port))
+        lent.sendall(encoder_message({"action": "NOM", "nom": "lent"}))
+        normaux = []
+        for i in range(joueurs):
+            sock = socket.create_connection((hote, port))
+            sock.sendall(encoder_message({"action": "NOM", "nom": f"joueur{i}"}))
+            normaux.append(sock)
+        time.sleep(0.5)
+
+        latences = []
+        arret = threading.Event()
+        lecteurs = [threading.Thread(target=lecteur_normal, args=(sock, latences, arret)) for sock in normaux]
+        for lecteur in lecteurs:
+            lecteur.start()
+
+        remplissage = "x" * taille_ligne
+        debut = time.perf_counter()
+        for i in range(lignes):
+            texte = f"{time.perf_counter()} {remplissage}"
+            normaux[i % joueurs].sendall(encoder_message({"action": "CHAT", "text": texte}))
+            time.sleep(0.001)
+        duree = time.perf_counter() - debut
+        coupe = lecteur_lent_deconnecte(lent, 5.0)
+        arret.set()
+        for lecteur in lecteurs:
+            lecteur.join()
+        for sock in normaux + [lent]:
+            sock.close()
+    finally:
+        processus.kill()
+        processus.wait()
+
+    latences.sort()
+    if latences:
+        p50 = latences[len(latences) // 2] * 1000
+        p99 = latences[int(len(latences) * 0.99)] * 1000
+        print(f"[{mode}] {lignes} lignes en {duree:.2f} s, latence de diffusion p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    else:
+        print(f"[{mode}] aucune diffusion reçue par les joueurs normaux")
+    print(f"[{mode}] client lent déconnecté par le serveur : {'oui' if coupe else 'non'}")
+    return coupe
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Diffusion du chat en présence d'un client qui ne lit pas")
+    parseur.add_argument("--hote", default="127.0.0.2")
+    parseur.add_argument("--port", type=int, default=10112)
+    parseur.add_argument("--joueurs", type=int, default=5)
+    parseur.add_argument("--lignes", type=int, default=3000)
+    parseur.add_argument("--taille-ligne", type=int, default=20000)
+    parseur.add_argument("--modes", nargs="+", default=list(LANCEURS), choices=list(LANCEURS))
+    arguments = parseur.parse_args()
+    non_coupes = [mode for decalage, mode in enumerate(arguments.modes)
+                  if not mesurer(mode, arguments.hote, arguments.port + decalage, arguments.joueurs,
+                                 arguments.lignes, arguments.taille_ligne)]
+    # Sert aussi de vérification : le code de sortie signale un serveur qui garde un client qui ne lit pas
+    if non_coupes:
+        print(f"Échec : client lent toujours connecté ({', '.join(non_coupes)})")
+        sys.exit(1)
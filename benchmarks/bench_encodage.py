@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import time
+
+# Permet de lancer le script depuis la racine du dépôt ou depuis benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from protocole import DecodeurFlux, encoder_binaire, encoder_message
+
+
+def messages_types(nombre_joueurs):
+    # Messages les plus fréquents d'un tour, et table des identifiants de joueurs correspondante
+    noms = [f"joueur{j}" for j in range(nombre_joueurs)]
+    identifiants = {nom: j for j, nom in enumerate(noms)}
+    messages = {
+        "DEBUT_TOUR": {"type": "DEBUT_TOUR", "position_chat": 42, "taille_grille": 8},
+        "CHOIX": {"action": "CHOIX", "position": 17},
+        "SCORES": {"type": "SCORES", "position_chat": 42, "scores": {nom: 10 + j % 7 for j, nom in enumerate(noms)},
+                   "chat_position": 42},
+    }
+    return messages, identifiants
+
+
+def chronometrer(fonction, repetitions):
+    # Durée moyenne d'un appel, en microsecondes
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions * 1e6
+
+
+def comparer(nombre_joueurs, repetitions):
+    messages, identifiants = messages_types(nombre_joueurs)
+    # Le décodeur binaire connaît la table des identifiants, comme après un message JOUEURS
+    decodeur_json = DecodeurFlux()
+    decodeur_binaire = DecodeurFlux()
+    decodeur_binaire.noms_joueurs = {identifiant: nom for nom, identifiant in identifiants.items()}
+    print(f"{nombre_joueurs} joueurs, {repetitions} répétitions")
+    print(f"{'message':<11} {'encodage':<8} {'octets':>7} {'encodage µs':>12} {'décodage µs':>12}")
+    for nom_message, message in messages.items():
+        trame_json = encoder_message(message)
+        trame_binaire = encoder_binaire(message, identifiants)
+        # Les deux encodages doivent redonner exactement le même message
+        if decodeur_binaire.alimenter(trame_binaire) != [message] or decodeur_json.alimenter(trame_json) != [message]:
+            raise AssertionError(f"{nom_message} mal reconstitué")
+        for encodage, encoder, trame, decodeur in (
+                ("json", lambda: encoder_message(message), trame_json, decodeur_json),
+                ("binaire", lambda: encoder_binaire(message, identifiants), trame_binaire, decodeur_binaire)):
+            duree_encodage = chronometrer(encoder, repetitions)
+            duree_decodage = chronometrer(lambda: decodeur.alimenter(trame), repetitions)
+            print(f"{nom_message:<11} {encodage:<8} {len(trame):>7} {duree_encodage:>12.2f} {duree_decodage:>12.2f}")
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Compare les encodages JSON et binaire des messages de jeu")
+    parseur.add_argument("--joueurs", type=int, nargs="+", default=[3, 10, 100])
+    parseur.add_argument("--repetitions", type=int, default=20000)
+    arguments = parseur.parse_args()
+    for nombre_joueurs in arguments.joueurs:
+        comparer(nombre_joueurs, arguments.repetitions)
+        print()
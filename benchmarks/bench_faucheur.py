@@ -0,0 +1,87 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Permet de lancer le script depuis la racine du dépôt ou depuis benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from faucheur import Faucheur
+from metriques import MetriquesInactives
+
+
+class ServeurFictif:
+    # Juste ce dont le faucheur a besoin : une horloge que le banc fait avancer, et des envois comptés
+    def __init__(self):
+        self.instant = 0.0
+        self.metriques = MetriquesInactives()
+        self.pings = 0
+        self.coupures = 0
+
+
+    def horloge(self):
+        return self.instant
+
+
+    def planifier(self, delai, fonction):
+        return None  # Les passages sont lancés par le banc
+
+
+    def envoyer_message_par_socket(self, client_socket, message, cle=None, identifiants=None):
+        self.pings += 1
+
+
+    def fermer_connexion(self, cle, immediat=False):
+        self.coupures += 1
+
+
+def parcours_complet(activites, maintenant, delai):
+    # Ce que ferait un passage sans index : examiner toutes les connexions
+    return [cle for cle, instant in activites.items() if instant <= maintenant - delai]
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Mesure le coût du suivi d'activité et des passages du faucheur")
+    parseur.add_argument("--connexions", type=int, default=100000)
+    parseur.add_argument("--silencieuses", type=float, default=0.01, help="part des connexions qui cessent de parler")
+    parseur.add_argument("--lectrices", type=float, default=0.5, help="part des connexions bavardes lues à chaque seconde")
+    parseur.add_argument("--duree", type=float, default=60.0, help="temps simulé, en secondes")
+    arguments = parseur.parse_args()
+    rng = random.Random(1234)
+    serveur = ServeurFictif()
+    faucheur = Faucheur(serveur, delai_ping=20.0, delai_pong=10.0, periode=1.0)
+    connexions = list(range(arguments.connexions))
+    for cle in connexions:
+        faucheur.suivre(cle)
+    silencieuses = set(rng.sample(connexions, int(arguments.connexions * arguments.silencieuses)))
+    bavardes = [cle for cle in connexions if cle not in silencieuses]
+    activites = dict.fromkeys(connexions, 0.0)  # Pour la comparaison avec un parcours complet
+
+    # Les lectures sont réparties sur le temps simulé ; un passage a lieu à chaque seconde
+    lectures_par_seconde = int(len(bavardes) * arguments.lectrices)
+    duree_signaler = 0.0
+    duree_passages = 0.0
+    duree_complet = 0.0
+    for seconde in range(1, int(arguments.duree) + 1):
+        lecteurs = rng.sample(bavardes, lectures_par_seconde)
+        debut = time.perf_counter()
+        for numero, cle in enumerate(lecteurs):
+            serveur.instant = seconde - 1 + numero / lectures_par_seconde
+            faucheur.signaler(cle)
+        duree_signaler += time.perf_counter() - debut
+        for cle in lecteurs:
+            activites[cle] = serveur.instant
+        serveur.instant = float(seconde)
+        debut = time.perf_counter()
+        faucheur.faucher()
+        duree_passages += time.perf_counter() - debut
+        debut = time.perf_counter()
+        parcours_complet(activites, serveur.instant, faucheur.delai_ping)
+        duree_complet += time.perf_counter() - debut
+
+    print(f"{arguments.connexions:,} connexions, {len(silencieuses):,} silencieuses, {arguments.duree:.0f} s simulées")
+    print(f"Signalement d'une lecture : {duree_signaler / (lectures_par_seconde * arguments.duree) * 1e9:.0f} ns")
+    print(f"Passage du faucheur : {duree_passages / arguments.duree * 1e3:.3f} ms "
+          f"(parcours complet : {duree_complet / arguments.duree * 1e3:.3f} ms)")
+    print(f"PING envoyés : {serveur.pings:,}, connexions coupées : {serveur.coupures:,}")
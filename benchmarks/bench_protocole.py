@@ -0,0 +1,87 @@
+import os
+import random
+import sys
+import time
+
+# Permet de lancer le script depuis la racine du dépôt ou depuis benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from protocole import DecodeurFlux, encoder_message, encoder_messages
+
+
+def generer_messages(rng, nombre):
+    # Produit un mélange de messages représentatifs du trafic serveur
+    messages = []
+    for i in range(nombre):
+        genre = rng.randrange(3)
+        if genre == 0:
+            taille = rng.randint(3, 10)
+            messages.append({"type": "DEBUT_TOUR", "position_chat": rng.randrange(taille * taille), "taille_grille": taille})
+        elif genre == 1:
+            scores = {f"joueur{j}": rng.randint(-5, 50) for j in range(rng.randint(1, 200))}
+            messages.append({"type": "SCORES", "position_chat": i % 100, "scores": scores, "chat_position": i % 100})
+        else:
+            lignes = [f"joueur{j}: " + "é" * rng.randint(0, 300) for j in range(rng.randint(1, 10))]
+            messages.append({"type": "CHAT", "seq": i, "lignes": lignes})
+    return messages
+
+
+def decouper(rng, flux, taille_max):
+    # Découpe un flux en morceaux de taille aléatoire, comme le ferait TCP
+    morceaux = []
+    position = 0
+    while position < len(flux):
+        taille = rng.randint(1, taille_max)
+        morceaux.append(flux[position:position + taille])
+        position += taille
+    return morceaux
+
+
+def rejouer(morceaux):
+    # Repasse les morceaux dans un décodeur neuf et renvoie les messages reconstitués
+    decodeur = DecodeurFlux()
+    messages = []
+    for morceau in morceaux:
+        messages.extend(decodeur.alimenter(morceau))
+    if decodeur.tampon:
+        raise AssertionError("Octets résiduels dans le tampon après la fin du flux")
+    return messages
+
+
+def verifier_fuzz(graine=1234, iterations=200):
+    # Vérifie que tout découpage du flux (trames coupées ou fusionnées) redonne les mêmes messages
+    rng = random.Random(graine)
+    for _ in range(iterations):
+        messages = generer_messages(rng, rng.randint(1, 50))
+        flux = encoder_messages(messages)
+        for taille_max in (1, 7, 1024, len(flux)):
+            if rejouer(decouper(rng, flux, taille_max)) != messages:
+                raise AssertionError(f"Flux mal reconstitué (morceaux <= {taille_max} octets)")
+    print(f"Fuzz : {iterations} flux rejoués sans erreur")
+
+
+def mesurer_debit(nombre=20000, taille_lecture=65536):
+    # Mesure le débit d'encodage et de décodage avec des lectures de la taille de celles du serveur
+    rng = random.Random(42)
+    messages = generer_messages(rng, nombre)
+
+    debut = time.perf_counter()
+    trames = [encoder_message(message) for message in messages]
+    duree_encodage = time.perf_counter() - debut
+    flux = b''.join(trames)
+
+    morceaux = [flux[i:i + taille_lecture] for i in range(0, len(flux), taille_lecture)]
+    debut = time.perf_counter()
+    decodes = rejouer(morceaux)
+    duree_decodage = time.perf_counter() - debut
+    assert len(decodes) == nombre
+
+    print(f"{nombre} messages, {len(flux) / 1e6:.1f} Mo")
+    print(f"Encodage : {nombre / duree_encodage:,.0f} messages/s")
+    print(f"Décodage : {nombre / duree_decodage:,.0f} messages/s, "
+          f"{nombre / len(morceaux):.1f} messages par lecture de {taille_lecture} octets")
+
+
+if __name__ == "__main__":
+    verifier_fuzz()
+    mesurer_debit()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Permet de lancer le script depuis la racine du dépôt ou depuis benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import regles
+from regles import ecarts_scores, ecarts_scores_vectorises
+
+
+def tirer_tour(rng, nombre_joueurs, taille_grille, proba_forfait=0.05):
+    # Choix aléatoires d'un tour, avec quelques forfaits ; les cases hors de la grille sont incluses
+    # pour que les deux moteurs soient aussi comparés sur elles, même si le serveur les écarte à la réception
+    positions = [None if rng.random() < proba_forfait else rng.randrange(-2, taille_grille ** 2 + 2)
+                 for _ in range(nombre_joueurs)]
+    position_chat = (rng.randrange(taille_grille), rng.randrange(taille_grille))
+    return positions, position_chat
+
+
+def vers_tableaux(positions):
+    forfaits = regles.numpy.array([position is None for position in positions])
+    tableau = regles.numpy.array([0 if position is None else position for position in positions], dtype=regles.numpy.int64)
+    return tableau, forfaits
+
+
+def verifier(rng, iterations):
+    # Les deux moteurs doivent donner exactement les mêmes variations de score
+    for _ in range(iterations):
+        taille_grille = rng.randint(3, 10)
+        positions, position_chat = tirer_tour(rng, rng.randint(1, 500), taille_grille)
+        tableau, forfaits = vers_tableaux(positions)
+        attendu = ecarts_scores(positions, taille_grille, position_chat)
+        obtenu = ecarts_scores_vectorises(tableau, taille_grille, position_chat, forfaits).tolist()
+        if attendu != obtenu or regles.calculer_ecarts(positions, taille_grille, position_chat) != attendu:
+            raise AssertionError(f"Scores différents pour {positions} (grille {taille_grille}, chat {position_chat})")
+    print(f"Vérification : {iterations} tours identiques")
+
+
+def chronometrer(fonction, repetitions):
+    # Durée moyenne d'un appel, en microsecondes
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions * 1e6
+
+
+def comparer(rng, nombres_joueurs, taille_grille=10):
+    print(f"{'joueurs':>9} {'boucle µs':>12} {'numpy µs':>12} {'numpy+conversion µs':>20}")
+    for nombre_joueurs in nombres_joueurs:
+        positions, position_chat = tirer_tour(rng, nombre_joueurs, taille_grille)
+        tableau, forfaits = vers_tableaux(positions)
+        repetitions = max(3, 200000 // nombre_joueurs)
+        boucle = chronometrer(lambda: ecarts_scores(positions, taille_grille, position_chat), repetitions)
+        vectorise = chronometrer(lambda: ecarts_scores_vectorises(tableau, taille_grille, position_chat, forfaits), repetitions)
+        # Coût réel depuis le serveur, qui conserve les choix dans un dictionnaire
+        complet = chronometrer(lambda: regles.calculer_ecarts(positions, taille_grille, position_chat), repetitions)
+        print(f"{nombre_joueurs:>9} {boucle:>12.1f} {vectorise:>12.1f} {complet:>20.1f}")
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Compare la boucle de calcul des scores et le moteur NumPy")
+    parseur.add_argument("--joueurs", type=int, nargs="+", default=[3, 10, 100, 1000, 10000, 1000000])
+    parseur.add_argument("--graine", type=int, default=1234)
+    arguments = parseur.parse_args()
+    if regles.numpy is None:
+        print("NumPy n'est pas installé : seul le calcul en Python pur est disponible.")
+        sys.exit(0)
+    rng = random.Random(arguments.graine)
+    verifier(rng, 500)
+    comparer(rng, arguments.joueurs)
@@ -0,0 +1,139 @@
+import argparse
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import time
+
+RACINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, RACINE)
+
+from protocole import DecodeurFlux, TAILLE_LECTURE, encoder_message
+
+# Code lancé dans le processus serveur, pour que la charge ne partage pas le GIL du générateur
+LANCEURS = {
+    "threads": "from server import Serveur as S",
+    "asyncio": "from serveur_asyncio import ServeurAsyncio as S",
+    "grappe": "from grappe import Grappe as S",
+}
+
+
+def lancer_serveur(mode, hote, port, **parametres):
+    # Démarre le serveur demandé dans un processus séparé et attend qu'il écoute
+    options = "".join(f", {nom}={valeur!r}" for nom, valeur in parametres.items())
+    code = f"{LANCEURS[mode]}; S(hote={hote!r}, port={port}{options}).demarrer_serveur()"
+    processus = subprocess.Popen([sys.executable, "-c", code], cwd=RACINE,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + 10
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection((hote, port), timeout=0.2).close()
+            return processus
+        except OSError:
+            time.sleep(0.05)
+    processus.kill()
+    raise RuntimeError(f"Le serveur {mode} n'a pas démarré")
+
+
+class Charge:
+    # Tient de nombreuses connexions dans un seul thread grâce à un sélecteur
+    def __init__(self, hote, port):
+        self.hote = hote
+        self.port = port
+        self.selecteur = selectors.DefaultSelector()
+        self.sockets = []
+        # Plus grand numéro de ligne de chat vu par l'observateur ; les diffusions
+        # périmées pouvant être fusionnées par le serveur, on ne compte pas les trames
+        self.derniere_ligne = -1
+        self.decodeur_observateur = DecodeurFlux()
+
+
+    def connecter(self, nombre):
+        # Ouvre les connexions et enregistre un nom pour chacune
+        for i in range(len(self.sockets), len(self.sockets) + nombre):
+            sock = socket.create_connection((self.hote, self.port))
+            sock.sendall(encoder_message({"action": "NOM", "nom": f"bot{i}"}))
+            sock.setblocking(False)
+            self.selecteur.register(sock, selectors.EVENT_READ)
+            self.sockets.append(sock)
+
+
+    def pomper(self, delai):
+        # Vide les sockets prêts ; seul le premier socket (l'observateur) est décodé
+        for cle, _ in self.selecteur.select(delai):
+            sock = cle.fileobj
+            try:
+                donnees = sock.recv(TAILLE_LECTURE)
+            except (BlockingIOError, InterruptedError):
+                continue
+            if not donnees:
+                self.selecteur.unregister(sock)
+                continue
+            if sock is self.sockets[0]:
+                for message in self.decodeur_observateur.alimenter(donnees):
+                    if message.get("type") == "CHAT":
+                        for ligne in message["lignes"]:
+                            self.derniere_ligne = max(self.derniere_ligne, int(ligne.split(": ", 1)[1]))
+
+
+    def fermer(self):
+        for sock in self.sockets:
+            sock.close()
+        self.selecteur.close()
+
+
+def mesurer(mode, hote, port, connexions, bavards, messages_par_bavard):
+    # Toutes les connexions dans la même partie, pour que chaque ligne soit diffusée à toutes
+    processus = lancer_serveur(mode, hote, port, joueurs_max=connexions,
+                                chat_debit=10**9, chat_rafale=10**9)
+    charge = Charge(hote, port)
+    try:
+        # Connexions tenues : on ouvre toutes les connexions en continuant à vider les tampons
+        debut = time.perf_counter()
+        while len(charge.sockets) < connexions:
+            charge.connecter(min(50, connexions - len(charge.sockets)))
+            charge.pomper(0)
+        duree_connexion = time.perf_counter() - debut
+        # Laisse le serveur enregistrer tous les noms avant de mesurer le chat
+        fin = time.monotonic() + 1.0
+        while time.monotonic() < fin:
+            charge.pomper(0.05)
+
+        # Débit : chaque ligne de chat est diffusée à toutes les connexions
+        attendus = bavards * messages_par_bavard
+        numero = 0
+        debut = time.perf_counter()
+        for _ in range(messages_par_bavard):
+            for sock in charge.sockets[:bavards]:
+                sock.sendall(encoder_message({"action": "CHAT", "text": str(numero)}))
+                numero += 1
+            charge.pomper(0)
+        limite = time.monotonic() + 60
+        while charge.derniere_ligne < attendus - 1 and time.monotonic() < limite:
+            charge.pomper(0.05)
+        duree_chat = time.perf_counter() - debut
+    finally:
+        charge.fermer()
+        processus.kill()
+        processus.wait()
+
+    print(f"[{mode}] {connexions} connexions tenues en {duree_connexion:.2f} s")
+    recues = charge.derniere_ligne + 1
+    print(f"[{mode}] {recues}/{attendus} lignes de chat en {duree_chat:.2f} s : "
+          f"{recues / duree_chat:,.0f} messages entrants/s, "
+          f"{recues * connexions / duree_chat:,.0f} messages diffusés/s")
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Compare le serveur à threads et le serveur asyncio")
+    parseur.add_argument("--hote", default="127.0.0.2")
+    parseur.add_argument("--port", type=int, default=10102)
+    parseur.add_argument("--connexions", type=int, default=500)
+    parseur.add_argument("--bavards", type=int, default=20)
+    parseur.add_argument("--messages", type=int, default=20)
+    parseur.add_argument("--modes", nargs="+", default=list(LANCEURS), choices=list(LANCEURS))
+    arguments = parseur.parse_args()
+    for decalage, mode in enumerate(arguments.modes):
+        mesurer(mode, arguments.hote, arguments.port + decalage, arguments.connexions,
+                arguments.bavards, arguments.messages)
@@ -0,0 +1,74 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Permet de lancer le script depuis la racine du dépôt ou depuis benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from persistance import Stockage
+
+
+def remplir(stockage, rng, nombre_tours, joueurs_par_partie, nombre_joueurs, tours_par_partie=30):
+    # Simule des parties complètes ; renvoie le temps moyen passé à déposer un tour dans la file,
+    # c'est-à-dire le coût supporté par une partie sous son verrou
+    depot = 0.0
+    tours = 0
+    while tours < nombre_tours:
+        partie = stockage.nouvelle_partie(rng.randrange(1000))
+        joueurs = rng.sample(range(nombre_joueurs), joueurs_par_partie)
+        scores = {f"joueur{j}": 10 for j in joueurs}
+        for numero in range(1, tours_par_partie + 1):
+            resultats = []
+            for nom in scores:
+                ecart = rng.choice((10, 2, -1, -1, -1, -1))
+                scores[nom] += ecart
+                resultats.append((nom, rng.randrange(100), ecart, scores[nom]))
+            debut = time.perf_counter()
+            stockage.enregistrer_tour(partie, numero, 10, rng.randrange(100), resultats)
+            depot += time.perf_counter() - debut
+            tours += 1
+        elimine = next(iter(scores))
+        stockage.enregistrer_elimination(partie, tours_par_partie, elimine, 0)
+        stockage.enregistrer_fin(partie, rng.choice(list(scores)))
+    return depot / tours
+
+
+def chronometrer(fonction, repetitions=200):
+    # Durée moyenne d'une requête, en millisecondes
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions * 1000
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Mesure l'écriture par lots et les requêtes de l'historique")
+    parseur.add_argument("--tours", type=int, default=200000, help="tours enregistrés (un résultat par joueur et par tour)")
+    parseur.add_argument("--joueurs-par-partie", type=int, default=6)
+    parseur.add_argument("--joueurs", type=int, default=100000, help="nombre de joueurs distincts")
+    parseur.add_argument("--base", default=None, help="fichier SQLite (temporaire par défaut)")
+    arguments = parseur.parse_args()
+    chemin = arguments.base or os.path.join(tempfile.mkdtemp(), "historique.db")
+    rng = random.Random(1234)
+
+    stockage = Stockage(chemin)
+    debut = time.perf_counter()
+    depot = remplir(stockage, rng, arguments.tours, arguments.joueurs_par_partie, arguments.joueurs)
+    duree_depot = time.perf_counter() - debut
+    stockage.ecrivain.arreter()  # Attend que tout soit écrit
+    duree_totale = time.perf_counter() - debut
+    ecrites = stockage.ecrivain.ecrites
+    print(f"{ecrites:,} requêtes écrites en {stockage.ecrivain.lots:,} transactions, "
+          f"{duree_totale:.1f} s ({ecrites / duree_totale:,.0f} requêtes/s)")
+    print(f"Dépôt d'un tour dans la file : {depot * 1e6:.1f} µs ({duree_depot:.1f} s de production)")
+    (resultats,), = stockage.consulter("SELECT count(*) FROM resultats")
+    print(f"Base : {resultats:,} résultats, {os.path.getsize(chemin) / 1e6:.0f} Mo")
+
+    joueurs = [f"joueur{rng.randrange(arguments.joueurs)}" for _ in range(200)]
+    iterateur = iter(joueurs * 2)
+    print(f"Classement par victoires : {chronometrer(lambda: stockage.classement(10)):.3f} ms")
+    print(f"Classement par points : {chronometrer(lambda: stockage.classement(10, 'points')):.3f} ms")
+    print(f"Historique d'un joueur : {chronometrer(lambda: stockage.historique_joueur(next(iterateur), 20)):.3f} ms")
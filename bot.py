@@ -0,0 +1,182 @@
+import argparse
+import random
+import socket
+import threading
+import time
+from protocole import ENCODAGE_BINAIRE, ENCODAGE_JSON, DecodeurFlux, encoder_binaire, encoder_message, recevoir_messages
+
+
+# Stratégies de choix : elles reçoivent le message DEBUT_TOUR et un générateur aléatoire
+def strategie_aleatoire(message, rng):
+    # Une case au hasard
+    return rng.randrange(message["taille_grille"] ** 2)
+
+
+def strategie_centre(message, rng):
+    # Toujours la case centrale
+    taille = message["taille_grille"]
+    return (taille // 2) * taille + taille // 2
+
+
+def strategie_coin(message, rng):
+    # Toujours la première case
+    return 0
+
+
+def strategie_omniscient(message, rng):
+    # Le serveur envoie la position du chat dès le début du tour : ce bot s'en sert
+    return message["position_chat"]
+
+
+STRATEGIES = {
+    "aleatoire": strategie_aleatoire,
+    "centre": strategie_centre,
+    "coin": strategie_coin,
+    "omniscient": strategie_omniscient,
+}
+
+
+class Bot:
+    # Client sans interface qui parle le même protocole que Client (NOM, PRET, CHOIX, CHAT,
+    # DECONNEXION), pour tester le serveur en charge
+    def __init__(self, hote='127.0.0.2', port=10002, nom="bot", strategie="aleatoire", temps_reflexion=(0.0, 0.0),
+                 proba_chat=0.0, partie=None, graine=None, binaire=False):
+        self.hote = hote
+        self.port = port
+        self.nom = nom
+        self.strategie = STRATEGIES[strategie]  # Fonction de choix de la case
+        self.temps_reflexion = temps_reflexion  # Intervalle (min, max) d'attente avant chaque action, en secondes
+        self.proba_chat = proba_chat  # Probabilité d'envoyer une ligne de chat à chaque tour
+        self.partie = partie  # Partie demandée au lobby
+        self.rng = random.Random(graine)
+        self.binaire_demande = binaire  # Propose l'encodage binaire au serveur
+        self.binaire = False  # Encodage binaire accepté par le serveur
+        self.socket_client = None
+        self.verrou_envoi = threading.Lock()  # Un thread de chat peut écrire en même temps que le thread de jeu
+        self.connecte = False
+        self.tours = 0  # Tours joués (résultats reçus)
+        self.latences_chat = []  # Délais entre l'envoi d'une de ses lignes et sa réception en retour
+        self.fin = None  # Raison de la fin de la dernière session
+
+
+    def se_connecter(self, delai=5.0):
+        # Connexion au serveur et envoi du nom, puis PRET
+        self.socket_client = socket.create_connection((self.hote, self.port), timeout=delai)
+        self.socket_client.settimeout(None)
+        self.decodeur = DecodeurFlux()
+        self.connecte = True
+        message_nom = {"action": "NOM", "nom": self.nom}
+        self.binaire = False
+        if self.binaire_demande:
+            message_nom["encodages"] = [ENCODAGE_BINAIRE, ENCODAGE_JSON]
+        if self.partie is not None:
+            message_nom["partie"] = self.partie
+        self.envoyer(message_nom)
+        self.envoyer({"action": "PRET"})
+
+
+    def envoyer(self, message):
+        donnees = encoder_binaire(message) if self.binaire else encoder_message(message)
+        with self.verrou_envoi:
+            self.socket_client.sendall(donnees)
+
+
+    def reflechir(self):
+        # Simule le temps de réaction d'un joueur
+        minimum, maximum = self.temps_reflexion
+        if maximum > 0:
+            time.sleep(self.rng.uniform(minimum, maximum))
+
+
+    def jouer(self):
+        # Boucle de réception jusqu'à la fin de la partie ou la fermeture de la connexion
+        try:
+            while self.connecte:
+                messages = recevoir_messages(self.socket_client, self.decodeur)
+                if messages is None:
+                    self.fin = "connexion fermée"
+                    break
+                for message in messages:
+                    self.gerer_message(message)
+        except OSError as e:
+            self.fin = f"erreur : {e}"
+        finally:
+            self.deconnecter()
+
+
+    def gerer_message(self, message):
+        # Réagit aux messages du serveur comme le ferait un joueur
+        if message["type"] == "DEBUT_TOUR":
+            self.reflechir()
+            if self.rng.random() < self.proba_chat:
+                # Le texte porte l'instant d'envoi pour mesurer la latence de diffusion
+                self.envoyer({"action": "CHAT", "text": f"t={time.monotonic()}"})
+            self.envoyer({"action": "CHOIX", "position": self.strategie(message, self.rng)})
+        elif message["type"] == "PARTIE":
+            self.binaire = message.get("encodage") == ENCODAGE_BINAIRE
+        elif message["type"] == "SCORES":
+            self.tours += 1
+            self.reflechir()
+            self.envoyer({"action": "PRET"})
+        elif message["type"] == "CHAT":
+            maintenant = time.monotonic()
+            prefixe = f"{self.nom}: t="
+            for ligne in message["lignes"]:
+                if ligne.startswith(prefixe) and not message.get("rattrapage"):
+                    self.latences_chat.append(maintenant - float(ligne[len(prefixe):]))
+        elif message["type"] == "PING":
+            self.envoyer({"action": "PONG"})
+        elif message["type"] == "FIN_JEU":
+            self.fin = "éliminé"
+            self.connecte = False
+        elif message["type"] == "INFO" and "gagnant" in message["message"].lower():
+            self.fin = "gagnant"
+            self.connecte = False
+
+
+    def deconnecter(self):
+        # Envoie DECONNEXION si possible et ferme le socket
+        if self.socket_client is None:
+            return
+        try:
+            self.envoyer({"action": "DECONNEXION"})
+        except OSError:
+            pass
+        self.socket_client.close()
+        self.socket_client = None
+        self.connecte = False
+
+
+    def executer(self, arret=None):
+        # Enchaîne les parties jusqu'à ce que arret soit positionné (une seule partie si arret est None)
+        while True:
+            try:
+                self.se_connecter()
+            except OSError as e:
+                self.fin = f"connexion impossible : {e}"
+                return
+            self.jouer()
+            if arret is None or arret.is_set():
+                return
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Lance des joueurs automatiques contre un serveur")
+    parseur.add_argument("--hote", default="127.0.0.2")
+    parseur.add_argument("--port", type=int, default=10002)
+    parseur.add_argument("--nombre", type=int, default=3)
+    parseur.add_argument("--strategie", default="aleatoire", choices=list(STRATEGIES))
+    parseur.add_argument("--reflexion", type=float, nargs=2, default=(0.2, 1.0), metavar=("MIN", "MAX"))
+    parseur.add_argument("--chat", type=float, default=0.3, help="probabilité d'écrire dans le chat à chaque tour")
+    parseur.add_argument("--binaire", action="store_true", help="propose l'encodage binaire au serveur")
+    arguments = parseur.parse_args()
+    bots = [Bot(arguments.hote, arguments.port, f"bot{i}", arguments.strategie, tuple(arguments.reflexion), arguments.chat,
+                binaire=arguments.binaire)
+            for i in range(arguments.nombre)]
+    threads = [threading.Thread(target=bot.executer) for bot in bots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for bot in bots:
+        print(f"{bot.nom} : {bot.tours} tours, {bot.fin}")
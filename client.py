@@ -1,32 +1,67 @@
-import socket
-import json
-import threading
+import queue
 import tkinter as tk
 from tkinter import simpledialog, messagebox, scrolledtext
 import random
 import time
+from liaison import ATTENTE, CONNECTE, CONNEXION, CONNEXION_PERDUE, DELAI_FERMETURE, ERREUR_RECEPTION, ETAT_CONNEXION, \
+    RECONNEXION, Liaison
+from protocole import ENCODAGE_BINAIRE, ENCODAGE_JSON
+
+# Nombre maximal de lignes de chat conservées dans la zone de texte
+LIGNES_CHAT_MAX = 500
+# Intervalle entre deux lectures de la file des messages reçus par la boucle Tk, en millisecondes
+PERIODE_SONDAGE = 20
+# Messages appliqués au plus par lecture de la file, pour laisser la main aux événements de l'interface
+MESSAGES_PAR_LOT = 500
+# Animation de la révélation du chat : durée totale en secondes, intervalle entre deux cases en millisecondes,
+# puis délai avant la remise à zéro de la grille
+DUREE_ANIMATION = 5.0
+PAS_ANIMATION = 300
+DELAI_REINITIALISATION = 4000
 
 class Client:
-    def __init__(self, hote='127.0.0.2', port=10002):
+    def __init__(self, hote='127.0.0.2', port=10002, partie=None):
         # Initialisation du client avec l'adresse IP et le port du serveur
         self.hote = hote
         self.port = port
-        # Création d'un socket client pour la communication réseau
-        self.socket_client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        # Indique l'état de connexion du client
+        # Partie à rejoindre : un identifiant, "nouvelle", ou None pour être placé automatiquement
+        self.partie = partie
+        # Thread réseau qui possède le socket, créé à la connexion
+        self.liaison = None
+        # Indique que le client est lancé et que sa fenêtre est ouverte, même pendant une reconnexion
         self.connecte = False
         # Nom du joueur, à définir plus tard
         self.nom_joueur = None
         # Taille de la grille de jeu, déterminée par le serveur
         self.taille_grille = None
-        # Liste des boutons représentant la grille de jeu
-        self.boutons = []
+        # Réserve des boutons de la grille par case (ligne, colonne) : ils sont créés une seule fois,
+        # puis masqués ou réaffichés quand la taille de la grille change
+        self.boutons = {}
+        # Dernières options appliquées à chaque bouton, pour ne reconfigurer que ce qui change
+        self.options_cases = {}
+        # Cases affichées pour la grille en cours
+        self.cases_visibles = set()
         # Position choisie par le joueur dans la grille
         self.position_choisie = None
         # Indique si le joueur a fait un choix dans la grille
         self.est_choix_fait = False
-        # Historique actuel des messages du chat
-        self.historique_chat_actuel = []
+        # Numéro de séquence de la prochaine ligne de chat attendue (None tant qu'aucune n'est reçue)
+        self.prochain_seq_chat = None
+        # Indique qu'un rattrapage du chat a été demandé au serveur
+        self.rattrapage_chat_demande = False
+        # Derniers scores reçus du serveur
+        self.scores = {}
+        # Messages reçus par le thread réseau, appliqués à l'interface par la boucle Tk
+        self.file_messages = queue.SimpleQueue()
+        # Lignes de chat reçues pendant le lot en cours, insérées d'un coup à la fin du lot
+        self.lignes_chat_a_afficher = []
+        # État de l'animation de révélation du chat : tâche after en cours, échéance, case allumée et position finale
+        self.tache_animation = None
+        self.fin_animation = None
+        self.case_animee = None
+        self.position_chat_animee = None
+        # Remise à zéro de la grille planifiée après l'animation
+        self.tache_reinitialisation = None
         # Configuration de l'interface graphique du client
         self.configurer_gui()
 
@@ -71,6 +106,10 @@ class Client:
         self.bouton_deconnexion = tk.Button(self.root, text="Déconnexion", command=self.deconnecter)
         self.bouton_deconnexion.grid(row=13, column=10, columnspan=2, sticky="ew")
 
+        # État de la connexion au serveur, mis à jour par les événements du thread réseau
+        self.etat_connexion = tk.Label(self.root, text="Connexion au serveur...", anchor='w')
+        self.etat_connexion.grid(row=14, column=10, columnspan=2, sticky="ew")
+
 
     def effacer_placeholder(self, event):
         # Efface le texte indicatif lorsque le champ de saisie est sélectionné
@@ -87,70 +126,90 @@ class Client:
 
 
     def construire_grille(self):
-        # Construit la grille de boutons pour le jeu
-        for row in self.boutons:
-            for bouton in row:
-                bouton.destroy()  # Supprime les boutons existants
-        self.boutons = []  # Réinitialise la liste des boutons
-        # Crée de nouveaux boutons pour la grille selon sa taille
-        for i in range(self.taille_grille):
-            row = []
-            for j in range(self.taille_grille):
-                bouton = tk.Button(self.root, text=f"{i*self.taille_grille+j}", width=4, height=2,
-                                   command=lambda n=i*self.taille_grille+j: self.envoyer_choix(n))
-                bouton.grid(row=i, column=j)
-                row.append(bouton)
-            self.boutons.append(row)
+        # Affiche la grille du tour en réutilisant les boutons déjà créés : seules les cases qui
+        # apparaissent ou disparaissent par rapport à la grille précédente sont touchées
+        cases = {(i, j) for i in range(self.taille_grille) for j in range(self.taille_grille)}
+        for case in self.cases_visibles - cases:
+            self.boutons[case].grid_remove()  # Masque les cases en trop, sans les détruire
+        for case in cases - self.cases_visibles:
+            if case in self.boutons:
+                self.boutons[case].grid()  # Réaffiche à la même place une case masquée
+            else:
+                self.creer_case(*case)
+        self.cases_visibles = cases
+        # Le numéro d'une case dépend de la taille de la grille ; l'état est remis à zéro pour le tour
+        for i, j in cases:
+            self.regler_case((i, j), text=f"{i*self.taille_grille+j}", state='normal', bg='SystemButtonFace')
+
+
+    def creer_case(self, i, j):
+        # Crée le bouton d'une case ; il garde sa place (i, j) et calcule sa position au clic
+        bouton = tk.Button(self.root, width=4, height=2, command=lambda: self.envoyer_choix(i*self.taille_grille+j))
+        bouton.grid(row=i, column=j)
+        self.boutons[(i, j)] = bouton
+        self.options_cases[(i, j)] = {}
+
+
+    def regler_case(self, case, **options):
+        # Applique au bouton d'une case uniquement les options qui diffèrent de celles déjà en place
+        en_place = self.options_cases[case]
+        changements = {nom: valeur for nom, valeur in options.items() if en_place.get(nom) != valeur}
+        if changements:
+            self.boutons[case].config(**changements)
+            en_place.update(changements)
 
 
     def se_connecter_au_serveur(self):
         # Connexion au serveur
         self.demander_nom()  # Demande le nom du joueur
-        try:
-            self.socket_client.connect((self.hote, self.port))  # Tentative de connexion au serveur
-            # Envoie le nom du joueur au serveur
-            self.socket_client.send(json.dumps({"action": "NOM", "nom": self.nom_joueur}).encode('utf-8'))
-            self.connecte = True  # Marque le client comme connecté
-            # Démarre un thread pour recevoir les messages du serveur
-            threading.Thread(target=self.recevoir_messages, daemon=True).start()
-        except Exception as e:
-            # Affiche un message d'erreur en cas de problème de connexion
-            messagebox.showerror("Erreur de connexion", f"Impossible de se connecter au serveur : {e}")
-            self.deconnecter()  # Déconnecte le client en cas d'erreur
-
-
-    def recevoir_messages(self):
-        # Boucle de réception des messages du serveur
-        while self.connecte:
+        if not self.nom_joueur:
+            return
+        # Message de présentation, envoyé par le thread réseau à chaque connexion tant qu'il n'a pas de jeton de reprise
+        message_nom = {"action": "NOM", "nom": self.nom_joueur, "encodages": [ENCODAGE_BINAIRE, ENCODAGE_JSON]}
+        if self.partie is not None:
+            message_nom["partie"] = self.partie
+        # Le thread réseau se connecte, se reconnecte après une coupure, et dépose les messages reçus
+        # et ses changements d'état dans la file que la boucle Tk applique
+        self.liaison = Liaison(self.hote, self.port, message_nom, self.file_messages)
+        self.liaison.start()
+        self.connecte = True
+        self.root.after(PERIODE_SONDAGE, self.sonder_messages)
+
+
+    def envoyer(self, message):
+        # Confie un message au thread réseau sans attendre ; renvoie False si la connexion est coupée
+        return self.liaison is not None and self.liaison.envoyer(message)
+
+
+    def sonder_messages(self):
+        # Applique, dans la boucle Tk, les messages arrivés depuis le dernier passage, en un seul lot
+        for _ in range(MESSAGES_PAR_LOT):
+            if not self.connecte:
+                return  # Fenêtre fermée : plus rien à afficher ni à replanifier
             try:
-                donnees = self.socket_client.recv(4096)  # Réception des données du serveur
-                if donnees:
-                    message = json.loads(donnees.decode('utf-8'))  # Décodage du message JSON
-                    self.gerer_message(message)  # Gestion des messages reçus
-                else:
-                    # Affiche un message si la connexion est perdue
-                    messagebox.showinfo("Information", "La connexion avec le serveur a été perdue.")
-                    self.deconnecter()  # Déconnecte le client
-                    break
-            except ConnectionResetError:
-                # Gestion de la déconnexion inattendue par le serveur
-                self.deconnecter()
-                break
-            except Exception as e:
-                # Affiche un message en cas d'erreur de réception
-                messagebox.showerror("Erreur", f"Un problème est survenu : {e}")
-                self.deconnecter()
+                message = self.file_messages.get_nowait()
+            except queue.Empty:
                 break
+            self.gerer_message(message)
+        if not self.connecte:
+            return
+        self.ajouter_lignes_chat(self.lignes_chat_a_afficher)
+        self.lignes_chat_a_afficher = []
+        # Replanifié seulement une fois le lot appliqué : une boîte de dialogue ouverte par un message
+        # ne relance donc jamais un second lot par-dessus le premier
+        self.root.after(PERIODE_SONDAGE, self.sonder_messages)
 
 
     def gerer_message(self, message):
         # Traite les différents types de messages reçus du serveur
         if message["type"] == "CHAT":
-            # Mise à jour de l'historique du chat
-            self.historique_chat_actuel = message["historique_chat"]
-            self.mettre_a_jour_historique_chat(message["historique_chat"])
+            # Ajout des nouvelles lignes du chat
+            self.recevoir_lignes_chat(message)
         elif message["type"] == "DEBUT_TOUR":
-            # Mise à jour de la grille pour un nouveau tour
+            # Mise à jour de la grille pour un nouveau tour ; une animation du tour précédent est abandonnée
+            self.arreter_animation()
+            self.position_choisie = None
+            self.est_choix_fait = False
             self.taille_grille = message["taille_grille"]
             self.construire_grille()
             self.reinitialiser_bouton_pret()
@@ -158,6 +217,19 @@ class Client:
             # Affichage des scores
             self.afficher_scores(message["scores"])
             self.afficher_position_chat(message["position_chat"])
+        elif message["type"] == "PARTIE":
+            # Affiche la partie dans laquelle le joueur a été placé
+            if message["partie"] != self.partie:
+                # Nouvelle partie (après une reprise refusée) : son chat repart de zéro
+                self.prochain_seq_chat = None
+            self.partie = message["partie"]
+            self.root.title(f"Le Chat Paresseux - partie {self.partie}")
+        elif message["type"] == "ETAT":
+            # Instantané de la partie après une reprise de session
+            self.appliquer_etat(message)
+        elif message["type"] == "REPRISE_REFUSEE":
+            # La place n'a pas été gardée : le thread réseau rejoint une nouvelle partie
+            messagebox.showinfo("Information", message["message"])
         elif message["type"] == "FIN_JEU":
             # Notification de fin de jeu et déconnexion
             messagebox.showinfo("Fin du jeu", message["message"])
@@ -167,7 +239,17 @@ class Client:
             messagebox.showinfo("Information", message["message"])
             if "gagnant" in message["message"].lower():
                 self.deconnecter()  # Déconnexion si le joueur gagne
-
+        elif message["type"] == ETAT_CONNEXION:
+            # Connexion établie, coupée ou en attente d'une nouvelle tentative
+            self.afficher_etat_connexion(message)
+        elif message["type"] == CONNEXION_PERDUE:
+            # Le thread réseau a renoncé à se reconnecter
+            messagebox.showinfo("Information", f"La connexion avec le serveur a été perdue : {message['message']}")
+            self.deconnecter()
+        elif message["type"] == ERREUR_RECEPTION:
+            # Affiche un message en cas d'erreur de réception
+            messagebox.showerror("Erreur", f"Un problème est survenu : {message['message']}")
+            self.deconnecter()
 
 
     def envoyer_choix(self, position):
@@ -176,32 +258,30 @@ class Client:
             self.est_choix_fait = True  # Marque le choix comme fait
             self.position_choisie = position  # Sauvegarde la position choisie
             # Met en évidence la position choisie dans l'interface utilisateur
-            self.boutons[position // self.taille_grille][position % self.taille_grille].config(bg='red')
+            self.regler_case(divmod(position, self.taille_grille), bg='red')
             # Envoye le choix au serveur
-            self.socket_client.send(json.dumps({"action": "CHOIX", "position": position}).encode('utf-8'))
+            self.envoyer({"action": "CHOIX", "position": position})
             self.desactiver_grille()  # Désactive la grille après le choix
 
     def envoyer_message_chat(self, event=None):
         # Envoi un message écrit dans le chat au serveur
         message = self.message_chat.get()  # Obtenir le message du champ de saisie
         if message and self.connecte:
-            # Envoye le message au serveur si le client est connecté
-            self.socket_client.send(json.dumps({"action": "CHAT", "text": message}).encode('utf-8'))
-            self.message_chat.delete(0, tk.END)  # Effacer le champ de saisie après l'envoi
+            # Envoye le message au serveur ; pendant une reconnexion, il reste dans le champ de saisie
+            if self.envoyer({"action": "CHAT", "text": message}):
+                self.message_chat.delete(0, tk.END)  # Effacer le champ de saisie après l'envoi
 
 
     def activer_grille(self):
         # Active tous les boutons de la grille pour permettre des choix
-        for row in self.boutons:
-            for bouton in row:
-                bouton.config(state='normal', bg='SystemButtonFace')
+        for case in self.cases_visibles:
+            self.regler_case(case, state='normal', bg='SystemButtonFace')
 
 
     def desactiver_grille(self):
         # Désactive tous les boutons de la grille pour empêcher plusieurs choix
-        for row in self.boutons:
-            for bouton in row:
-                bouton.config(state='disabled', bg='grey')
+        for case in self.cases_visibles:
+            self.regler_case(case, state='disabled', bg='grey')
 
 
     def afficher_scores(self, scores):
@@ -212,47 +292,82 @@ class Client:
         self.zone_scores.insert(tk.END, scores_texte)
         self.zone_scores.config(state='disabled')
     # Mise à jour de l'historique de chat pour afficher le score actuel
-        self.mettre_a_jour_historique_chat(self.historique_chat_actuel)
+        self.afficher_score_joueur()
 
 
     def afficher_position_chat(self, position_chat_numero):
-        # Calcule les coordonnées du chat à partir de sa position numérique
-        x_chat, y_chat = divmod(position_chat_numero, self.taille_grille)
-        
-        # Démarre une animation qui montre le déplacement du chat pendant 5 secondes
-        fin_animation = time.time() + 5
-        while time.time() < fin_animation:
-            # Choisis une nouvelle position aléatoire pour le chat à chaque itération
+        # Démarre une animation qui montre le déplacement du chat pendant DUREE_ANIMATION secondes.
+        # Chaque étape est planifiée par root.after : la boucle Tk continue à traiter les messages.
+        self.arreter_animation()
+        self.position_chat_animee = position_chat_numero
+        self.fin_animation = time.monotonic() + DUREE_ANIMATION
+        self.etape_animation()
+
+
+    def etape_animation(self):
+        # Une étape de l'animation : éteint la case précédente, puis en allume une autre ou termine
+        self.tache_animation = None
+        if self.case_animee is not None:
+            # Remet la couleur du bouton précédent à la normale
+            self.regler_case(self.case_animee, bg='SystemButtonFace')
+            self.case_animee = None
+        if time.monotonic() < self.fin_animation:
+            # Choisis une nouvelle position aléatoire pour le chat à chaque étape
             nouvelle_x = random.randint(0, self.taille_grille - 1)
             nouvelle_y = random.randint(0, self.taille_grille - 1)
-            self.boutons[nouvelle_x][nouvelle_y].config(bg='yellow')
-            
-            # Met à jour l'interface utilisateur et attend un peu
-            self.root.update()
-            time.sleep(0.3) 
-            
-            # Remet la couleur du bouton précédent à la normale
-            self.boutons[nouvelle_x][nouvelle_y].config(bg='SystemButtonFace')
-        
-        # Affiche la position finale du chat
-        self.boutons[x_chat][y_chat].config(bg='yellow')
-        # Réinitialise la position choisie par le joueur après l'animation 
+            self.case_animee = (nouvelle_x, nouvelle_y)
+            self.regler_case(self.case_animee, bg='yellow')
+            self.tache_animation = self.root.after(PAS_ANIMATION, self.etape_animation)
+        else:
+            self.finir_animation()
+
+
+    def finir_animation(self):
+        # Calcule les coordonnées du chat à partir de sa position numérique et affiche sa position finale
+        x_chat, y_chat = divmod(self.position_chat_animee, self.taille_grille)
+        self.regler_case((x_chat, y_chat), bg='yellow')
+        # Réinitialise la position choisie par le joueur après l'animation
         if self.position_choisie is not None:
             x_choisi, y_choisi = divmod(self.position_choisie, self.taille_grille)
             if (x_choisi, y_choisi) != (x_chat, y_chat):
-                self.boutons[x_choisi][y_choisi].config(bg='white')
+                self.regler_case((x_choisi, y_choisi), bg='white')
         # Réinitialise la grille après un bref délai
-        self.root.after(4000, self.reinitialiser_grille)
+        self.tache_reinitialisation = self.root.after(DELAI_REINITIALISATION, self.reinitialiser_grille)
+
+
+    def arreter_animation(self):
+        # Abandonne l'animation et la remise à zéro en attente, avant de reconstruire la grille
+        for tache in (self.tache_animation, self.tache_reinitialisation):
+            if tache is not None:
+                self.root.after_cancel(tache)
+        self.tache_animation = None
+        self.tache_reinitialisation = None
+        self.case_animee = None
 
 
     def reinitialiser_grille(self):
         # Réinitialise l'état de la grille pour un nouveau tour
-        for ligne in self.boutons:
-            for bouton in ligne:
-                bouton.config(state='normal', bg='SystemButtonFace')
+        self.tache_reinitialisation = None
         self.position_choisie = None  # Réinitialise la position choisie
         self.est_choix_fait = False  # Réinitialise l'état de choix
-        self.desactiver_grille()  # Désactive la grille
+        self.desactiver_grille()  # Désactive la grille, en une seule reconfiguration par case
+
+
+    def appliquer_etat(self, etat):
+        # Remet l'interface dans l'état de la partie reçu après une reprise de session
+        self.afficher_scores(etat["scores"])
+        if etat["choix_ouverts"] and etat["choix"] is None:
+            # Le tour attend encore notre choix
+            self.taille_grille = etat["taille_grille"]
+            self.est_choix_fait = False
+            self.construire_grille()
+        elif not etat["pret"]:
+            self.reinitialiser_bouton_pret()
+        # Les lignes de chat diffusées pendant la coupure sont demandées au serveur
+        if self.prochain_seq_chat is not None and etat["seq_chat"] > self.prochain_seq_chat \
+                and not self.rattrapage_chat_demande:
+            self.rattrapage_chat_demande = True
+            self.envoyer({"action": "CHAT_HISTORIQUE", "depuis": self.prochain_seq_chat})
 
 
     def reinitialiser_bouton_pret(self):
@@ -268,40 +383,89 @@ class Client:
             self.root.destroy()  # Ferme l'application si aucun nom n'est fourni
 
 
-    def mettre_a_jour_historique_chat(self, historique_chat):
-        # Mettre à jour l'affichage de l'historique du chat
+    def recevoir_lignes_chat(self, message):
+        # Applique une mise à jour du chat : seules les lignes encore inconnues sont ajoutées
+        seq, lignes = message["seq"], message["lignes"]
+        if message.get("rattrapage"):
+            self.rattrapage_chat_demande = False
+        elif self.prochain_seq_chat is not None and seq > self.prochain_seq_chat:
+            # Des lignes ont été manquées : on demande un rattrapage et on ignore la suite en attendant
+            if not self.rattrapage_chat_demande:
+                self.rattrapage_chat_demande = True
+                self.envoyer({"action": "CHAT_HISTORIQUE", "depuis": self.prochain_seq_chat})
+            return
+        elif self.rattrapage_chat_demande:
+            return
+        deja_vues = 0 if self.prochain_seq_chat is None else max(self.prochain_seq_chat - seq, 0)
+        # Les lignes sont affichées à la fin du lot de messages, en une seule insertion
+        self.lignes_chat_a_afficher.extend(lignes[deja_vues:])
+        self.prochain_seq_chat = max(self.prochain_seq_chat or 0, seq + len(lignes))
+
+
+    def ajouter_lignes_chat(self, lignes):
+        # Ajoute des lignes à la fin de l'historique du chat sans réécrire la zone de texte.
+        # La première ligne de la zone est réservée au score du joueur.
+        if not lignes:
+            return
         self.historique_chat.config(state='normal')  # Active la zone de texte
-        self.historique_chat.delete(1.0, tk.END)  # Effacer le contenu actuel
+        self.historique_chat.insert(tk.END, "".join("\n" + ligne for ligne in lignes))
+        # Supprime les lignes les plus anciennes au-delà de la limite
+        nombre_lignes = int(self.historique_chat.index('end-1c').split('.')[0]) - 1
+        if nombre_lignes > LIGNES_CHAT_MAX:
+            self.historique_chat.delete("2.0", f"{2 + nombre_lignes - LIGNES_CHAT_MAX}.0")
+        self.historique_chat.see(tk.END)
+        self.historique_chat.config(state='disabled')  # Désactive la zone de texte
+
+
+    def afficher_score_joueur(self):
+        # Met à jour la ligne du score du joueur en tête de l'historique du chat
+        info_joueur = ""
         if self.nom_joueur in self.scores:
-            score_joueur = self.scores[self.nom_joueur]
-            info_joueur = f"{self.nom_joueur} : {score_joueur} points\n"
-            self.historique_chat.insert(tk.END, info_joueur)  # Affiche le score du joueur
-        self.historique_chat.insert(tk.END, "\n".join(historique_chat))  # Ajoute les messages du chat
+            info_joueur = f"{self.nom_joueur} : {self.scores[self.nom_joueur]} points"
+        self.historique_chat.config(state='normal')  # Active la zone de texte
+        self.historique_chat.delete("1.0", "1.end")
+        self.historique_chat.insert("1.0", info_joueur)  # Affiche le score du joueur
         self.historique_chat.config(state='disabled')  # Désactive la zone de texte
 
 
     def indiquer_pret(self):
         # Indique au serveur que le joueur est prêt
-        self.bouton_pret.config(bg='grey', state='disabled')
-        self.socket_client.send(json.dumps({"action": "PRET"}).encode('utf-8'))
+        if self.envoyer({"action": "PRET"}):
+            self.bouton_pret.config(bg='grey', state='disabled')
+
+
+    def afficher_etat_connexion(self, message):
+        # Affiche l'état de la connexion sous les boutons
+        etat = message["etat"]
+        if etat == CONNECTE:
+            texte = f"Connecté à {message['hote']}:{message['port']}"
+        elif etat == CONNEXION:
+            texte = "Connexion au serveur..."
+        elif etat == RECONNEXION:
+            texte = f"Connexion perdue, reconnexion (tentative {message['tentative']})..."
+            # Une demande de rattrapage du chat en cours est perdue avec la connexion
+            self.rattrapage_chat_demande = False
+        elif etat == ATTENTE:
+            texte = f"Serveur injoignable ({message['erreur']}), nouvel essai dans {message['delai']:.1f} s"
+        else:
+            texte = etat
+        self.etat_connexion.config(text=texte)
 
 
     def deconnecter(self):
-        # Déconnecte proprement le serveur
+        # Déconnecte proprement le serveur : le thread réseau envoie DECONNEXION et ferme le socket
         if self.connecte:
-            try:
-                self.socket_client.send(json.dumps({"action": "DECONNEXION"}).encode('utf-8'))
-            except Exception as e:
-                print(f"Erreur lors de l'envoi du message de déconnexion : {e}")
-            finally:
-                self.socket_client.close()  # Ferme le socket
-                self.connecte = False  # Marque comme déconnecté
-                self.root.destroy()  # Ferme l'interface graphique
+            self.connecte = False  # Marque comme déconnecté
+            self.liaison.fermer()
+            self.root.destroy()  # Ferme l'interface graphique
 
 
     def executer(self):
         # Exécute la boucle principale de l'interface graphique
         self.root.mainloop()
+        if self.liaison is not None:
+            # La fenêtre est fermée : le thread réseau a encore un court délai pour envoyer DECONNEXION
+            self.liaison.join(DELAI_FERMETURE + 0.5)
 
 
 if __name__ == "__main__":
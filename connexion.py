@@ -0,0 +1,195 @@
+import collections
+import socket
+import threading
+import time
+
+# Sondes TCP keepalive : le noyau sonde une connexion muette depuis KEEPALIVE_INACTIVITE secondes, toutes les
+# KEEPALIVE_INTERVALLE secondes, et la déclare morte après KEEPALIVE_SONDES sondes sans réponse. C'est le filet
+# de sécurité du PING applicatif : il détecte un pair disparu même si le serveur n'a rien à lui envoyer.
+KEEPALIVE_INACTIVITE = 60
+KEEPALIVE_INTERVALLE = 10
+KEEPALIVE_SONDES = 5
+
+
+def activer_keepalive(client_socket):
+    # Active les sondes keepalive sur un socket accepté ; les réglages fins n'existent pas sur tous les systèmes
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, valeur in (("TCP_KEEPIDLE", KEEPALIVE_INACTIVITE), ("TCP_KEEPINTVL", KEEPALIVE_INTERVALLE),
+                           ("TCP_KEEPCNT", KEEPALIVE_SONDES)):
+        if hasattr(socket, option):
+            client_socket.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), valeur)
+
+
+# Clés dont la dernière trame ne doit jamais être abandonnée : la table JOUEURS est nécessaire pour lire
+# les SCORES binaires qui suivent. Elle est remplacée par une plus récente, comme les autres mises à jour.
+CLES_INDISPENSABLES = frozenset({"JOUEURS"})
+
+
+class FileSortante:
+    # File d'envoi d'une connexion, bornée en octets. Les messages portant une clé (SCORES...) sont des
+    # mises à jour d'état : un nouveau message remplace celui de même clé encore en attente. Quand la
+    # file est pleine, on abandonne les plus anciennes mises à jour jusqu'à ce que la nouvelle trame
+    # tienne (sauf celles de CLES_INDISPENSABLES) ; un client qui reste en retard plus de delai_retard secondes, ou dont la file ne peut pas
+    # faire assez de place, doit être déconnecté. Une entrée remplacée ou abandonnée n'est pas retirée
+    # de la file (ce serait un parcours) : elle est marquée morte, et l'écrivain l'ignore.
+    def __init__(self, taille_max=1024 * 1024, delai_retard=5.0):
+        self.taille_max = taille_max  # Nombre maximal d'octets en attente
+        self.delai_retard = delai_retard  # Durée tolérée avec une file pleine
+        self.file = collections.deque()  # Entrées [clé, octets] dans l'ordre d'envoi ; octets None si morte
+        self.en_attente = {}  # Entrée en attente pour chaque clé
+        # Mêmes entrées, sans celles de CLES_INDISPENSABLES, de la plus ancienne à la plus récente : la
+        # première est la mise à jour à abandonner en cas de débordement
+        self.abandonnables = {}
+        self.octets = 0  # Octets en attente
+        self.mortes = 0  # Entrées mortes encore dans la file
+        self.debut_retard = None  # Instant où la file a débordé pour la première fois
+        self.fusionnes = 0  # Mises à jour remplacées par une plus récente
+        self.abandonnes = 0  # Mises à jour abandonnées faute de place
+
+
+    def __len__(self):
+        return len(self.file) - self.mortes
+
+
+    def ajouter(self, donnees, cle=None):
+        # Ajoute une trame ; renvoie False si le client est trop en retard et doit être déconnecté
+        if cle is not None and cle in self.en_attente:
+            # La mise à jour précédente n'est pas encore partie : elle est périmée. La nouvelle
+            # est placée en fin de file pour rester ordonnée par rapport aux autres messages.
+            self.tuer(self.en_attente.pop(cle))
+            self.abandonnables.pop(cle, None)
+            self.fusionnes += 1
+        # Une trame seule dans la file passe toujours, même plus grande que la borne
+        if self.octets and self.octets + len(donnees) > self.taille_max:
+            maintenant = time.monotonic()
+            if self.debut_retard is None:
+                self.debut_retard = maintenant
+            elif maintenant - self.debut_retard > self.delai_retard:
+                return False
+            while self.octets and self.octets + len(donnees) > self.taille_max:
+                if not self.abandonnables:
+                    return False  # Plus rien d'abandonnable : le client ne suit plus
+                cle_abandonnee = next(iter(self.abandonnables))
+                self.tuer(self.abandonnables.pop(cle_abandonnee))
+                del self.en_attente[cle_abandonnee]
+                self.abandonnes += 1
+        entree = [cle, donnees]
+        self.file.append(entree)
+        self.octets += len(donnees)
+        if cle is not None:
+            self.en_attente[cle] = entree
+            if cle not in CLES_INDISPENSABLES:
+                self.abandonnables[cle] = entree
+        return True
+
+
+    def tuer(self, entree):
+        # Marque une entrée comme morte ; la file est compactée quand les mortes y sont majoritaires
+        self.octets -= len(entree[1])
+        entree[1] = None
+        self.mortes += 1
+        if self.mortes * 2 > len(self.file):
+            self.file = collections.deque(entree for entree in self.file if entree[1] is not None)
+            self.mortes = 0
+
+
+    def extraire(self):
+        # Retire toutes les trames en attente et les renvoie concaténées, pour un seul envoi
+        donnees = b''.join(entree[1] for entree in self.file if entree[1] is not None)
+        self.file.clear()
+        self.en_attente.clear()
+        self.abandonnables.clear()
+        self.octets = 0
+        self.mortes = 0
+        self.debut_retard = None  # L'écrivain progresse : le retard repart de zéro
+        return donnees
+
+
+class Connexion:
+    # Connexion d'un client du serveur à threads : les envois sont déposés dans une file bornée
+    # et vidés par un thread écrivain propre à la connexion, si bien qu'un client lent ne bloque
+    # jamais les diffusions destinées aux autres
+    def __init__(self, client_socket, serveur, taille_file=1024 * 1024, delai_retard=5.0):
+        self.client_socket = client_socket
+        self.serveur = serveur
+        self.file = FileSortante(taille_file, delai_retard)
+        self.condition = threading.Condition()
+        self.fermee = False  # Plus aucun envoi accepté ; l'écrivain vide la file puis ferme
+        self.binaire = False  # Encodage binaire négocié lors de NOM
+        self.ecrivain = threading.Thread(target=self.boucle_envoi, daemon=True)
+        self.ecrivain.start()
+
+
+    def envoyer(self, donnees, cle=None):
+        # Dépose une trame déjà encodée dans la file d'envoi, sans jamais bloquer
+        with self.condition:
+            if self.fermee:
+                return
+            en_retard = not self.file.ajouter(donnees, cle)
+            self.condition.notify()
+        if en_retard:
+            # Appelé sous le verrou d'une partie : on se contente de couper la connexion, et c'est le
+            # thread de lecture, réveillé par la coupure, qui retire le joueur hors de tout verrou
+            print("Client trop lent, déconnexion.")
+            self.fermer(immediat=True)
+
+
+    def boucle_envoi(self):
+        # Envoie par lots tout ce qui s'est accumulé depuis le dernier envoi
+        while True:
+            with self.condition:
+                while not self.file and not self.fermee:
+                    self.condition.wait()
+                donnees = self.file.extraire()
+                fin = self.fermee
+            if donnees:
+                try:
+                    self.client_socket.sendall(donnees)
+                    self.serveur.metriques.octets_envoyes.inc(len(donnees))
+                except OSError as e:
+                    if not self.fermee:
+                        print(f"Erreur lors de l'envoi d'un message: {e}")
+                        self.serveur.retirer_joueur(self.client_socket)
+                    fin = True
+            if fin:
+                break
+        self.couper()
+
+
+    def fermer(self, immediat=False):
+        # Ferme la connexion, après avoir envoyé les trames en attente sauf si immediat
+        with self.condition:
+            self.fermee = True
+            if immediat:
+                self.file.extraire()
+            self.condition.notify()
+        if immediat:
+            # Débloque un sendall en cours vers un client qui ne lit plus
+            self.interrompre()
+
+
+    def attendre(self, delai):
+        # Attend la fin de l'écrivain au plus delai secondes, puis coupe la connexion s'il n'a pas fini ;
+        # renvoie True si tout a été envoyé
+        self.ecrivain.join(max(delai, 0))
+        if self.ecrivain.is_alive():
+            self.fermer(immediat=True)
+            return False
+        return True
+
+
+    def interrompre(self):
+        # shutdown réveille les threads bloqués dans recv ou sendall sur ce socket
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+    def couper(self):
+        # Seul l'écrivain ferme le socket, une fois qu'il ne l'utilise plus
+        self.interrompre()
+        try:
+            self.client_socket.close()
+        except Exception as e:
+            print(f"Erreur lors de la fermeture d'un client socket: {e}")
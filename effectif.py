@@ -0,0 +1,143 @@
+class Joueur:
+    # Fiche d'un joueur inscrit dans une partie. Les __slots__ évitent un dictionnaire par fiche :
+    # l'état d'un joueur tient en quelques attributs lus directement.
+    __slots__ = ("nom", "socket", "score", "choix", "pret", "elimine", "jeton", "seau")
+
+    def __init__(self, nom, score, seau):
+        self.nom = nom
+        self.socket = None  # Connexion du joueur, None s'il est déconnecté en attente de reprise
+        self.score = score
+        self.choix = None  # Case choisie pendant le tour, None tant qu'il n'a pas choisi
+        self.pret = False
+        # Éliminé : le joueur reste inscrit (il peut encore être connecté, ou en attente de reprise) mais ne
+        # joue plus ; il n'est ni compté, ni attendu, ni marqué
+        self.elimine = False
+        self.jeton = None  # Jeton de reprise de session
+        self.seau = seau  # Limiteur de débit du chat, protégé par le verrou du chat de la partie
+
+
+class Effectif:
+    # Table des joueurs d'une partie : une fiche par joueur, retrouvée par son nom ou par sa connexion,
+    # et des compteurs tenus à jour à chaque changement. Vérifier que tous les joueurs connectés encore
+    # en lice sont prêts, ou ont choisi, ne parcourt donc jamais la table. Toutes les méthodes s'appellent
+    # sous le verrou du jeu.
+    def __init__(self):
+        # Nom -> fiche, dans l'ordre d'inscription : c'est l'ordre des scores envoyés et enregistrés
+        self.joueurs = {}
+        self.connectes = {}  # Connexion -> fiche, pour les joueurs connectés
+        self.actifs = 0  # Joueurs connectés et non éliminés
+        self.prets = 0  # Joueurs actifs qui sont prêts
+        self.choisis = 0  # Joueurs actifs qui ont choisi leur case pour le tour
+
+
+    def __len__(self):
+        return len(self.joueurs)
+
+
+    def __contains__(self, nom_joueur):
+        return nom_joueur in self.joueurs
+
+
+    def inscrire(self, nom_joueur, client_socket, score, seau):
+        # Nouveau joueur, connecté par client_socket
+        joueur = Joueur(nom_joueur, score, seau)
+        self.joueurs[nom_joueur] = joueur
+        self.connecter(joueur, client_socket)
+        return joueur
+
+
+    def connecter(self, joueur, client_socket):
+        # Rattache une connexion au joueur ; un choix fait avant une coupure compte de nouveau
+        if joueur.socket is not None:
+            del self.connectes[joueur.socket]  # La connexion précédente est remplacée
+        elif not joueur.elimine:
+            self.actifs += 1
+            self.choisis += joueur.choix is not None
+            self.prets += joueur.pret
+        joueur.socket = client_socket
+        self.connectes[client_socket] = joueur
+
+
+    def deconnecter(self, joueur):
+        # Détache la connexion du joueur, qui garde son score et son choix ; il n'est plus prêt
+        if joueur.socket is None:
+            return
+        del self.connectes[joueur.socket]
+        joueur.socket = None
+        self.decompter(joueur)
+
+
+    def decompter(self, joueur):
+        # Le joueur, jusque-là actif, cesse de compter ; il n'est plus prêt
+        if not joueur.elimine:
+            self.actifs -= 1
+            self.choisis -= joueur.choix is not None
+            self.prets -= joueur.pret
+        joueur.pret = False
+
+
+    def eliminer(self, joueur):
+        # Le joueur ne joue plus ; renvoie False s'il était déjà éliminé
+        if joueur.elimine:
+            return False
+        if joueur.socket is not None:
+            self.decompter(joueur)
+        joueur.elimine = True
+        return True
+
+
+    def retirer(self, joueur):
+        # Efface la fiche du joueur
+        self.deconnecter(joueur)
+        del self.joueurs[joueur.nom]
+
+
+    def marquer_pret(self, joueur):
+        if not joueur.pret and not joueur.elimine:
+            joueur.pret = True
+            self.prets += joueur.socket is not None
+
+
+    def choisir(self, joueur, position):
+        if joueur.elimine:
+            return
+        if joueur.socket is not None:
+            self.choisis += (position is not None) - (joueur.choix is not None)
+        joueur.choix = position
+
+
+    def nouveau_tour(self):
+        # Plus personne n'est prêt ni n'a choisi
+        for joueur in self.joueurs.values():
+            joueur.choix = None
+            joueur.pret = False
+        self.prets = 0
+        self.choisis = 0
+
+
+    def tous_prets(self):
+        # Au moins un joueur actif, et tous sont prêts
+        return 0 < self.prets == self.actifs
+
+
+    def tous_choisis(self):
+        # Au moins un joueur actif, et tous ont choisi
+        return 0 < self.choisis == self.actifs
+
+
+    def en_lice(self):
+        # Joueurs non éliminés, connectés ou non, dans l'ordre d'inscription
+        return [joueur for joueur in self.joueurs.values() if not joueur.elimine]
+
+
+    def scores(self):
+        # Nom -> score de tous les inscrits, dans l'ordre d'inscription
+        return {nom_joueur: joueur.score for nom_joueur, joueur in self.joueurs.items()}
+
+
+    def vider(self):
+        self.joueurs.clear()
+        self.connectes.clear()
+        self.actifs = 0
+        self.prets = 0
+        self.choisis = 0
@@ -0,0 +1,125 @@
+import itertools
+import json
+import queue
+import struct
+import threading
+import time
+
+# Un enregistrement est une suite de trames (longueur sur 4 octets, puis JSON). Une session commence
+# par un en-tête (objet JSON : graine et paramètres des parties), suivi de ses événements, chacun une
+# liste [instant, connexion, type, contenu] où l'instant est en secondes depuis le début de la session.
+TAILLE = struct.Struct("!I")
+
+# Types d'événements
+CONNEXION = "C"  # Connexion acceptée
+MESSAGE = "M"  # Message reçu (contenu : le message décodé)
+DECONNEXION = "D"  # Fin de la lecture d'une connexion
+JETON = "J"  # Jeton de reprise remis à la connexion (contenu : le jeton)
+
+
+def lire_sessions(chemin):
+    # Renvoie les sessions d'un enregistrement : une liste de (en-tête, événements)
+    sessions = []
+    with open(chemin, "rb") as fichier:
+        donnees = fichier.read()
+    position = 0
+    while position + TAILLE.size <= len(donnees):
+        (longueur,) = TAILLE.unpack_from(donnees, position)
+        position += TAILLE.size
+        if position + longueur > len(donnees):
+            break  # Dernière trame incomplète (serveur arrêté brutalement) : ignorée
+        trame = json.loads(donnees[position:position + longueur])
+        position += longueur
+        if isinstance(trame, dict):
+            sessions.append((trame, []))
+        elif sessions:
+            sessions[-1][1].append(trame)
+    return sessions
+
+
+class Enregistreur:
+    # Journal en ajout seul de tout le trafic entrant, pour rejouer une session (voir rejeu.py). Les
+    # appelants ne font que déposer l'événement dans une file : l'écriture est faite par un thread dédié,
+    # jamais sous le verrou d'une partie.
+    actif = True
+
+    def __init__(self, chemin, entete):
+        self.fichier = open(chemin, "ab")
+        self.debut = time.monotonic()
+        self.numeros = {}  # Numéro de chaque connexion enregistrée
+        self.compteur = itertools.count(1)
+        self.file = queue.SimpleQueue()  # Trames à écrire ; None demande l'arrêt
+        self.file.put(dict(entete, debut=time.time()))
+        self.ecrivain = threading.Thread(target=self.ecrire, daemon=True)
+        self.ecrivain.start()
+
+
+    def ajouter(self, numero, type_evenement, contenu=None):
+        self.file.put([round(time.monotonic() - self.debut, 6), numero, type_evenement, contenu])
+
+
+    def connexion(self, client_socket):
+        numero = next(self.compteur)
+        self.numeros[client_socket] = numero
+        self.ajouter(numero, CONNEXION)
+
+
+    def message(self, client_socket, message):
+        numero = self.numeros.get(client_socket)
+        if numero is not None:
+            self.ajouter(numero, MESSAGE, message)
+
+
+    def jeton(self, client_socket, jeton):
+        numero = self.numeros.get(client_socket)
+        if numero is not None:
+            self.ajouter(numero, JETON, jeton)
+
+
+    def deconnexion(self, client_socket):
+        numero = self.numeros.pop(client_socket, None)
+        if numero is not None:
+            self.ajouter(numero, DECONNEXION)
+
+
+    def ecrire(self):
+        # Écrit les trames dans l'ordre de dépôt, et vide le tampon du fichier quand la file est vide
+        while True:
+            trame = self.file.get()
+            if trame is None:
+                break
+            donnees = json.dumps(trame, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self.fichier.write(TAILLE.pack(len(donnees)) + donnees)
+            if self.file.empty():
+                self.fichier.flush()
+        self.fichier.close()
+
+
+    def fermer(self):
+        # Écrit ce qui reste dans la file et ferme le fichier
+        self.file.put(None)
+        self.ecrivain.join()
+
+
+class EnregistreurInactif:
+    # Même interface quand le trafic n'est pas enregistré
+    actif = False
+
+    def connexion(self, client_socket):
+        pass
+
+
+    def message(self, client_socket, message):
+        pass
+
+
+    def jeton(self, client_socket, jeton):
+        pass
+
+
+    def deconnexion(self, client_socket):
+        pass
+
+
+    def fermer(self):
+        pass
@@ -0,0 +1,134 @@
+import collections
+import threading
+
+# Message envoyé à une connexion silencieuse ; le client répond PONG
+PING = {"type": "PING"}
+
+
+class Faucheur:
+    # Repère les connexions mortes ou à moitié ouvertes, que la lecture bloquée ne détecte jamais.
+    # Une connexion silencieuse depuis delai_ping secondes reçoit un PING ; si rien n'arrive dans les
+    # delai_pong secondes suivantes, elle est coupée, et son thread de lecture retire le joueur.
+    # Les connexions sont rangées par instant de dernière activité dans deux OrderedDict, du plus ancien
+    # au plus récent : chaque passage ne parcourt que les connexions échues, quel que soit leur nombre.
+    actif = True
+
+    def __init__(self, serveur, delai_ping=20.0, delai_pong=10.0, periode=1.0):
+        self.serveur = serveur
+        self.delai_ping = delai_ping
+        self.delai_pong = delai_pong
+        # Intervalle entre deux passages ; c'est aussi la précision de l'index : une lecture ne déplace
+        # une connexion dans l'index que si sa dernière activité indexée date d'au moins periode secondes
+        self.periode = periode
+        self.actives = collections.OrderedDict()  # Connexion -> dernière activité indexée
+        self.sondees = collections.OrderedDict()  # Connexion -> instant du PING, pour celles qui n'ont pas répondu
+        self.verrou = threading.Lock()  # Les threads de lecture signalent leur activité en parallèle
+        self.tache = None
+        self.pings = 0  # PING envoyés depuis le démarrage
+        self.coupees = 0  # Connexions coupées faute de réponse
+
+
+    def suivre(self, cle):
+        # Nouvelle connexion : elle entre dans l'index comme si elle venait de parler
+        with self.verrou:
+            self.actives[cle] = self.serveur.horloge()
+
+
+    def oublier(self, cle):
+        # Connexion fermée
+        with self.verrou:
+            self.actives.pop(cle, None)
+            self.sondees.pop(cle, None)
+
+
+    def signaler(self, cle):
+        # Appelé à chaque lecture. Le plus souvent, la dernière activité indexée est assez récente :
+        # rien n'est modifié et le verrou n'est pas pris.
+        derniere = self.actives.get(cle)
+        if derniere is not None and self.serveur.horloge() - derniere < self.periode:
+            return
+        with self.verrou:
+            if self.sondees.pop(cle, None) is None and cle not in self.actives:
+                return  # Connexion déjà oubliée
+            # Instant lu sous le verrou, pour que les instants restent croissants dans l'ordre de l'index
+            self.actives[cle] = self.serveur.horloge()
+            self.actives.move_to_end(cle)
+
+
+    def demarrer(self):
+        # Premier passage ; chaque passage planifie le suivant sur l'ordonnanceur du serveur
+        self.tache = self.serveur.planifier(self.periode, self.faucher)
+
+
+    def faucher(self):
+        # Envoie un PING aux connexions devenues silencieuses et coupe celles qui n'ont pas répondu
+        a_sonder = []
+        a_couper = []
+        with self.verrou:
+            maintenant = self.serveur.horloge()
+            while self.actives:
+                cle = next(iter(self.actives))
+                if self.actives[cle] > maintenant - self.delai_ping:
+                    break
+                del self.actives[cle]
+                self.sondees[cle] = maintenant
+                a_sonder.append(cle)
+            while self.sondees:
+                cle = next(iter(self.sondees))
+                if self.sondees[cle] > maintenant - self.delai_pong:
+                    break
+                del self.sondees[cle]
+                a_couper.append(cle)
+        # Hors du verrou : les envois et les coupures ne retardent pas les threads de lecture
+        for cle in a_sonder:
+            self.serveur.envoyer_message_par_socket(cle, PING, cle="PING")
+        for cle in a_couper:
+            # Coupure seulement : réveillé par elle, le thread de lecture retire le joueur hors de tout verrou
+            self.serveur.fermer_connexion(cle, immediat=True)
+        self.pings += len(a_sonder)
+        self.coupees += len(a_couper)
+        if a_couper:
+            self.serveur.metriques.coupures_inactivite.inc(len(a_couper))
+            print(f"{len(a_couper)} connexion(s) sans réponse coupée(s).")
+        self.tache = self.serveur.planifier(self.periode, self.faucher)
+
+
+    def arreter(self):
+        if self.tache is not None:
+            self.tache.cancel()
+            self.tache = None
+
+
+    def nombre_sondees(self):
+        # Connexions qui n'ont pas encore répondu à leur PING
+        return len(self.sondees)
+
+
+class FaucheurInactif:
+    # Même interface que Faucheur quand les connexions silencieuses ne sont pas surveillées
+    actif = False
+    pings = 0
+    coupees = 0
+
+    def suivre(self, cle):
+        pass
+
+
+    def oublier(self, cle):
+        pass
+
+
+    def signaler(self, cle):
+        pass
+
+
+    def demarrer(self):
+        pass
+
+
+    def arreter(self):
+        pass
+
+
+    def nombre_sondees(self):
+        return 0
@@ -0,0 +1,367 @@
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import selectors
+import signal
+import socket
+import threading
+import time
+
+from protocole import EN_TETE, TAILLE_EN_TETE, TAILLE_LECTURE
+from releve import annoncer_pret, lancer_successeur, sockets_herites
+from server import Serveur
+
+# Occupation publiée par chaque ouvrier dans un tableau partagé : CHAMPS_OCCUPATION entiers par ouvrier
+CHAMPS_OCCUPATION = 3
+JOUEURS = 0  # Joueurs placés dans une partie
+PARTIES = 1  # Parties hébergées
+PLACES = 2  # Places libres dans les parties qui acceptent encore des joueurs
+# Période de publication de l'occupation par les ouvriers, en secondes
+PERIODE_OCCUPATION = 0.1
+# Octets lus au plus par le frontal avant de confier la connexion à un ouvrier
+TAILLE_PREMIERE_TRAME_MAX = TAILLE_LECTURE
+# Les ouvriers partent d'un processus neuf : avec fork, ils hériteraient du socket d'écoute et
+# des sockets des clients en attente, qui resteraient ouverts après leur fermeture par le frontal
+CONTEXTE = multiprocessing.get_context("forkserver")
+
+
+def lire_premier_message(tampon):
+    # Premier message complet d'un tampon, ou None s'il n'est pas encore arrivé
+    if len(tampon) < TAILLE_EN_TETE:
+        return None
+    (longueur,) = EN_TETE.unpack_from(tampon)
+    if len(tampon) < TAILLE_EN_TETE + longueur:
+        return None
+    contenu = bytes(tampon[TAILLE_EN_TETE:TAILLE_EN_TETE + longueur])
+    if contenu[:1] != b'{':
+        return {}  # Trame binaire : aucune demande de partie possible
+    try:
+        message = json.loads(contenu.decode('utf-8'))
+    except ValueError:
+        return {}  # L'ouvrier signalera l'erreur de protocole
+    return message if isinstance(message, dict) else {}
+
+
+class ServeurOuvrier(Serveur):
+    # Serveur d'un processus ouvrier : il n'écoute pas lui-même, il reçoit du frontal les sockets
+    # des clients (avec les octets déjà lus) par un socket Unix, et publie son occupation
+    def __init__(self, numero, nombre_ouvriers, canal, occupation, **parametres):
+        if parametres.get("metriques"):
+            # Un point d'accès des métriques par ouvrier
+            parametres["port_admin"] = parametres.get("port_admin", 9102) + numero
+        if parametres.get("enregistrement"):
+            # Un enregistrement par ouvrier, chacun rejouable séparément
+            parametres["enregistrement"] = f"{parametres['enregistrement']}.{numero}"
+        super().__init__(premier_identifiant=numero + 1, pas_identifiant=nombre_ouvriers, **parametres)
+        self.numero = numero  # Rang de l'ouvrier dans la grappe
+        self.canal = canal  # Socket Unix relié au frontal
+        self.occupation = occupation  # Tableau partagé avec le frontal
+        self.socket_serveur.close()  # Jamais utilisé : le frontal écoute pour tous les ouvriers
+
+
+    def demarrer_serveur(self):
+        # Reçoit les connexions du frontal jusqu'à ce qu'il ferme le canal
+        self.demarrer_admin()
+        self.spectateurs.demarrer()
+        self.faucheur.demarrer()
+        self.publier_occupation()
+        while True:
+            try:
+                donnees, descripteurs, _, _ = socket.recv_fds(self.canal, TAILLE_PREMIERE_TRAME_MAX, 1)
+            except OSError:
+                break
+            if not descripteurs:
+                break  # Le frontal est arrêté
+            client_socket = socket.socket(fileno=descripteurs[0])
+            # Le frontal lisait ce socket en mode non bloquant, partagé par les deux descripteurs
+            client_socket.setblocking(True)
+            self.ajouter_client(client_socket, donnees)
+        self.arreter_serveur()
+
+
+    def publier_occupation(self):
+        # Met à jour la part du tableau partagé propre à cet ouvrier, puis se replanifie
+        parties = self.lobby.lister_parties()
+        base = self.numero * CHAMPS_OCCUPATION
+        self.occupation[base + JOUEURS] = len(self.parties_clients)
+        self.occupation[base + PARTIES] = len(parties)
+        self.occupation[base + PLACES] = sum(partie.joueurs_max - len(partie.inscrits)
+                                             for partie in parties if partie.peut_accueillir())
+        self.planifier(PERIODE_OCCUPATION, self.publier_occupation)
+
+
+def executer_ouvrier(numero, nombre_ouvriers, canal, occupation, parametres):
+    # Point d'entrée d'un processus ouvrier. Un Ctrl-C atteint tout le groupe de processus : les ouvriers
+    # l'ignorent, c'est le frontal qui les arrête en douceur en fermant leur canal.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ServeurOuvrier(numero, nombre_ouvriers, canal, occupation, **parametres).demarrer_serveur()
+
+
+class Grappe:
+    # Mode de déploiement sur plusieurs cœurs : un processus frontal accepte les connexions, lit le
+    # premier message de chaque client pour connaître la partie demandée, puis transmet le socket
+    # (descripteur de fichier) au processus ouvrier qui convient. Chaque ouvrier est un Serveur
+    # complet hébergeant ses propres parties ; un superviseur relance les ouvriers qui s'arrêtent.
+    def __init__(self, hote='127.0.0.2', port=10002, ouvriers=None, delai_premier_message=5.0,
+                 delai_redemarrage=1.0, **parametres):
+        self.hote = hote
+        self.port = port
+        self.nombre_ouvriers = ouvriers or os.cpu_count()  # Un ouvrier par cœur par défaut
+        self.delai_premier_message = delai_premier_message  # Attente maximale du premier message d'un client
+        self.delai_redemarrage = delai_redemarrage  # Délai minimal entre deux relances d'un même ouvrier
+        self.parametres = parametres  # Paramètres transmis au Serveur de chaque ouvrier
+        self.joueurs_max = parametres.get("joueurs_max", 10)  # Places d'une nouvelle partie
+        self.occupation = CONTEXTE.Array('i', self.nombre_ouvriers * CHAMPS_OCCUPATION, lock=False)
+        self.processus = [None] * self.nombre_ouvriers  # Processus de chaque ouvrier
+        self.canaux = [None] * self.nombre_ouvriers  # Extrémité frontale du canal de chaque ouvrier
+        self.verrou = threading.Lock()  # Protège processus et canaux, modifiés par le superviseur
+        self.actif = True
+        self.releve_en_cours = False
+        self.socket_serveur = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.selecteur = selectors.DefaultSelector()
+        # Paire de sockets qui réveille la boucle d'acceptation lors d'une demande d'arrêt
+        self.reveil_lecture, self.reveil = socket.socketpair()
+        self.en_attente = {}  # Connexions dont le premier message n'est pas encore arrivé : [tampon, échéance]
+
+
+    def lancer_ouvrier(self, numero):
+        # Démarre (ou redémarre) un ouvrier avec un canal neuf. SOCK_SEQPACKET préserve les limites
+        # des messages : chaque envoi contient un descripteur et les octets déjà lus de ce client.
+        canal_frontal, canal_ouvrier = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        base = numero * CHAMPS_OCCUPATION
+        for champ in range(CHAMPS_OCCUPATION):
+            self.occupation[base + champ] = 0
+        processus = CONTEXTE.Process(target=executer_ouvrier, name=f"ouvrier-{numero}",
+                                     args=(numero, self.nombre_ouvriers, canal_ouvrier, self.occupation,
+                                           self.parametres))
+        processus.start()
+        canal_ouvrier.close()
+        with self.verrou:
+            ancien_canal = self.canaux[numero]
+            self.processus[numero] = processus
+            self.canaux[numero] = canal_frontal
+        if ancien_canal is not None:
+            ancien_canal.close()
+
+
+    def superviser(self):
+        # Attend l'arrêt d'un ouvrier et le relance, sans relancer en boucle un ouvrier qui échoue au démarrage
+        derniers_lancements = [time.monotonic()] * self.nombre_ouvriers
+        while self.actif:
+            with self.verrou:
+                sentinelles = {processus.sentinel: numero for numero, processus in enumerate(self.processus)}
+            for sentinelle in multiprocessing.connection.wait(list(sentinelles), timeout=1.0):
+                numero = sentinelles[sentinelle]
+                if not self.actif:
+                    return
+                print(f"L'ouvrier {numero} s'est arrêté (code {self.processus[numero].exitcode}), relance.")
+                attente = derniers_lancements[numero] + self.delai_redemarrage - time.monotonic()
+                if attente > 0:
+                    time.sleep(attente)
+                derniers_lancements[numero] = time.monotonic()
+                self.lancer_ouvrier(numero)
+
+
+    def choisir_ouvrier(self, message):
+        # Choisit l'ouvrier d'un client d'après son premier message et l'occupation publiée :
+        # le propriétaire de la partie demandée, sinon un ouvrier ayant une partie ouverte, sinon le moins chargé
+        demande = message.get("partie") if message.get("action") in ("NOM", "SPECTATEUR") else None
+        if message.get("action") == "REPRISE":
+            # Le jeton de reprise commence par l'identifiant de la partie
+            identifiant, _, _ = str(message.get("jeton", "")).partition(".")
+            demande = int(identifiant) if identifiant.isdigit() else "nouvelle"
+        if isinstance(demande, int) and not isinstance(demande, bool) and demande > 0:
+            return (demande - 1) % self.nombre_ouvriers
+        ouvriers = range(self.nombre_ouvriers)
+        if demande is None:
+            avec_places = [numero for numero in ouvriers if self.occupation[numero * CHAMPS_OCCUPATION + PLACES] > 0]
+            if avec_places:
+                return min(avec_places, key=lambda numero: self.occupation[numero * CHAMPS_OCCUPATION + PLACES])
+        return min(ouvriers, key=lambda numero: self.occupation[numero * CHAMPS_OCCUPATION + JOUEURS])
+
+
+    def transmettre(self, client_socket, donnees, message):
+        # Confie le socket d'un client à un ouvrier, puis le ferme côté frontal
+        numero = self.choisir_ouvrier(message)
+        base = numero * CHAMPS_OCCUPATION
+        # Estimation locale en attendant la prochaine publication de l'ouvrier, pour répartir les rafales
+        if message.get("action") == "NOM":
+            self.occupation[base + JOUEURS] += 1
+            if message.get("partie") is None:
+                if self.occupation[base + PLACES] > 0:
+                    self.occupation[base + PLACES] -= 1
+                else:
+                    # L'ouvrier va ouvrir une partie : les suivants doivent pouvoir la rejoindre
+                    self.occupation[base + PLACES] = self.joueurs_max - 1
+        with self.verrou:
+            canal = self.canaux[numero]
+        try:
+            socket.send_fds(canal, [bytes(donnees)], [client_socket.fileno()])
+        except OSError as e:
+            # L'ouvrier vient de s'arrêter : le client devra se reconnecter
+            print(f"Transmission à l'ouvrier {numero} impossible : {e}")
+        client_socket.close()
+
+
+    def demarrer_serveur(self):
+        # Lance les ouvriers et le superviseur, puis accepte les connexions
+        herites = sockets_herites()
+        if "ecoute" in herites:
+            # Relève : le socket du frontal précédent écoute déjà, avec ses connexions en attente
+            self.socket_serveur.close()
+            self.socket_serveur = herites["ecoute"]
+        else:
+            self.socket_serveur.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.socket_serveur.bind((self.hote, self.port))
+            self.socket_serveur.listen()
+        for numero in range(self.nombre_ouvriers):
+            self.lancer_ouvrier(numero)
+        threading.Thread(target=self.superviser, daemon=True).start()
+        print(f"Grappe de {self.nombre_ouvriers} ouvriers en écoute sur l'adresse {self.hote} et sur le port {self.port}")
+        self.socket_serveur.setblocking(False)
+        self.selecteur.register(self.socket_serveur, selectors.EVENT_READ)
+        self.selecteur.register(self.reveil_lecture, selectors.EVENT_READ)
+        self.installer_signaux()
+        annoncer_pret()
+        try:
+            while self.actif:
+                for cle, _ in self.selecteur.select(timeout=1.0):
+                    if cle.fileobj is self.socket_serveur:
+                        self.accepter()
+                    elif cle.fileobj is self.reveil_lecture:
+                        self.reveil_lecture.recv(4096)
+                    else:
+                        self.lire(cle.fileobj)
+                self.expirer()
+        finally:
+            self.arreter_serveur()
+
+
+    def installer_signaux(self):
+        # Comme pour Serveur : SIGTERM et SIGINT arrêtent la grappe en douceur, SIGUSR2 passe la main
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGTERM, lambda *_: self.demander_arret())
+        signal.signal(signal.SIGINT, lambda *_: self.demander_arret())
+        signal.signal(signal.SIGUSR2, lambda *_: self.lancer_releve())
+
+
+    def demander_arret(self):
+        # Appelable depuis un gestionnaire de signal ou le thread de la relève : réveille la boucle d'acceptation
+        self.actif = False
+        try:
+            self.reveil.send(b'\0')
+        except OSError:
+            pass
+
+
+    def lancer_releve(self):
+        if not self.releve_en_cours and self.actif:
+            self.releve_en_cours = True
+            threading.Thread(target=self.passer_la_main, daemon=True).start()
+
+
+    def passer_la_main(self):
+        # Lance un nouveau frontal, qui démarre ses propres ouvriers ; les ouvriers de celui-ci terminent leurs
+        # connexions quand il ferme leur canal
+        try:
+            processus = lancer_successeur({"ecoute": self.socket_serveur})
+        except OSError as e:
+            print(f"Relève impossible, la grappe continue : {e}")
+            self.releve_en_cours = False
+            return
+        print(f"Le processus {processus.pid} a pris la relève.")
+        self.demander_arret()
+
+
+    def accepter(self):
+        try:
+            client_socket, _ = self.socket_serveur.accept()
+        except (BlockingIOError, OSError):
+            return
+        client_socket.setblocking(False)
+        self.en_attente[client_socket] = [bytearray(), time.monotonic() + self.delai_premier_message]
+        self.selecteur.register(client_socket, selectors.EVENT_READ)
+
+
+    def lire(self, client_socket):
+        # Accumule les octets d'un client jusqu'à son premier message complet
+        tampon = self.en_attente[client_socket][0]
+        try:
+            donnees = client_socket.recv(TAILLE_PREMIERE_TRAME_MAX - len(tampon))
+        except BlockingIOError:
+            return
+        except OSError:
+            donnees = b''
+        if not donnees:
+            # Le client est parti avant d'avoir envoyé son premier message
+            self.oublier(client_socket)
+            client_socket.close()
+            return
+        tampon += donnees
+        message = lire_premier_message(tampon)
+        if message is None and len(tampon) < TAILLE_PREMIERE_TRAME_MAX:
+            return
+        self.oublier(client_socket)
+        self.transmettre(client_socket, tampon, message or {})
+
+
+    def expirer(self):
+        # Les clients silencieux trop longtemps sont confiés au moins chargé des ouvriers
+        maintenant = time.monotonic()
+        for client_socket, (tampon, echeance) in list(self.en_attente.items()):
+            if echeance <= maintenant:
+                self.oublier(client_socket)
+                self.transmettre(client_socket, tampon, {})
+
+
+    def oublier(self, client_socket):
+        self.selecteur.unregister(client_socket)
+        del self.en_attente[client_socket]
+
+
+    def arreter_serveur(self):
+        # Ferme l'écoute puis les canaux : chaque ouvrier termine alors ses parties et s'arrête
+        self.actif = False
+        for sock in (self.socket_serveur, self.reveil_lecture):
+            if sock in self.selecteur.get_map():
+                self.selecteur.unregister(sock)
+        self.socket_serveur.close()
+        # Les clients dont le premier message est en route sont confiés aux ouvriers plutôt qu'abandonnés,
+        # au plus tard à l'expiration de leur délai
+        while self.en_attente:
+            for cle, _ in self.selecteur.select(timeout=0.1):
+                if cle.fileobj in self.en_attente:
+                    self.lire(cle.fileobj)
+            self.expirer()
+        self.selecteur.close()
+        self.reveil.close()
+        self.reveil_lecture.close()
+        with self.verrou:
+            canaux = list(self.canaux)
+            processus = list(self.processus)
+        for canal in canaux:
+            if canal is not None:
+                canal.close()
+        for ouvrier in processus:
+            if ouvrier is not None:
+                # Chaque ouvrier vide les files d'envoi de ses clients pendant au plus delai_arret secondes
+                ouvrier.join(self.parametres.get("delai_arret", 5.0) + 1)
+                if ouvrier.is_alive():
+                    ouvrier.terminate()
+        print("Grappe arrêtée.")
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Lance le serveur sur plusieurs processus")
+    parseur.add_argument("--hote", default="127.0.0.2")
+    parseur.add_argument("--port", type=int, default=10002)
+    parseur.add_argument("--ouvriers", type=int, default=os.cpu_count())
+    arguments = parseur.parse_args()
+    grappe = Grappe(arguments.hote, arguments.port, arguments.ouvriers)
+    try:
+        grappe.demarrer_serveur()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,269 @@
+import random
+import selectors
+import socket
+import threading
+from protocole import ENCODAGE_BINAIRE, ENCODAGE_JSON, DecodeurFlux, ErreurProtocole, TAILLE_LECTURE, encoder_binaire, \
+    encoder_message
+
+# Attente maximale de l'établissement d'une connexion, en secondes
+DELAI_CONNEXION = 5.0
+# Attente avant une nouvelle tentative après un échec : doublée à chaque échec consécutif jusqu'au plafond,
+# puis tirée au hasard entre la moitié et la totalité pour que des clients coupés ensemble ne reviennent pas ensemble
+ATTENTE_INITIALE = 0.5
+ATTENTE_MAX = 10.0
+# Échecs consécutifs au-delà desquels la connexion est abandonnée
+TENTATIVES_MAX = 8
+# Temps laissé à la fermeture pour envoyer ce qui reste, dont le message DECONNEXION
+DELAI_FERMETURE = 1.0
+
+# Événements déposés dans la file, en plus des messages du serveur
+ETAT_CONNEXION = "ETAT_CONNEXION"
+CONNEXION_PERDUE = "CONNEXION_PERDUE"
+ERREUR_RECEPTION = "ERREUR_RECEPTION"
+# États de la connexion annoncés par ETAT_CONNEXION
+CONNEXION = "connexion"  # Première tentative en cours
+CONNECTE = "connecte"
+RECONNEXION = "reconnexion"  # Tentative en cours après une coupure ou un échec
+ATTENTE = "attente"  # Pause avant la prochaine tentative
+
+
+class Liaison(threading.Thread):
+    # Thread réseau du client. Il possède le socket : l'interface dépose ses messages avec envoyer() sans
+    # jamais attendre le réseau, et le thread écrit en un seul envoi tout ce qui s'est accumulé depuis son
+    # dernier passage. Les messages reçus et les changements d'état sont déposés dans la file de l'interface.
+    # Après une coupure, le thread se reconnecte et reprend la session avec le jeton de reprise.
+    def __init__(self, hote, port, message_nom, file_messages, delai_connexion=DELAI_CONNEXION,
+                 attente_initiale=ATTENTE_INITIALE, attente_max=ATTENTE_MAX, tentatives_max=TENTATIVES_MAX):
+        super().__init__(daemon=True)
+        self.hote = hote
+        self.port = port
+        self.message_nom = message_nom  # Premier message d'une connexion tant qu'aucune session n'est ouverte
+        self.file_messages = file_messages
+        self.delai_connexion = delai_connexion
+        self.attente_initiale = attente_initiale
+        self.attente_max = attente_max
+        self.tentatives_max = tentatives_max
+        self.etat = CONNEXION
+        self.socket_client = None
+        self.decodeur = None
+        self.binaire = False  # Encodage binaire accepté par le serveur pour la connexion en cours
+        self.jeton = None  # Jeton de reprise de la session en cours
+        self.terminee = False  # La partie est finie pour ce joueur : une coupure n'est plus rattrapée
+        self.arret = False
+        self.verrou = threading.Lock()  # Protège a_envoyer et arret, partagés avec l'interface
+        self.a_envoyer = []  # Messages déposés par l'interface, pas encore encodés
+        self.sortie = bytearray()  # Octets encodés que le socket n'a pas encore acceptés
+        # Paire de sockets qui réveille le sélecteur quand l'interface dépose un message ou demande l'arrêt
+        self.reveil_lecture, self.reveil_ecriture = socket.socketpair()
+        self.reveil_lecture.setblocking(False)
+        self.reveil_ecriture.setblocking(False)
+        self.selecteur = selectors.DefaultSelector()
+        self.selecteur.register(self.reveil_lecture, selectors.EVENT_READ)
+        self.envois = 0  # Appels à send, pour comparer au nombre de messages envoyés
+        self.messages_envoyes = 0
+
+
+    def envoyer(self, message):
+        # Appelé par l'interface : dépose le message et rend la main aussitôt. Renvoie False si la
+        # connexion n'est pas établie ; le message est alors abandonné, l'état sera resynchronisé à la reprise.
+        with self.verrou:
+            if self.arret or self.etat != CONNECTE:
+                return False
+            reveiller = not self.a_envoyer
+            self.a_envoyer.append(message)
+        if reveiller:
+            self.reveiller()
+        return True
+
+
+    def fermer(self):
+        # Appelé par l'interface : envoie DECONNEXION puis ferme, sans attendre le thread
+        with self.verrou:
+            if self.arret:
+                return
+            if self.etat == CONNECTE:
+                self.a_envoyer.append({"action": "DECONNEXION"})
+            self.arret = True
+        self.reveiller()
+
+
+    def reveiller(self):
+        try:
+            self.reveil_ecriture.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # Un réveil est déjà en attente, ou le thread est terminé
+
+
+    def signaler(self, etat, **details):
+        # Annonce un changement d'état à l'interface
+        self.etat = etat
+        self.file_messages.put({"type": ETAT_CONNEXION, "etat": etat, **details})
+
+
+    def run(self):
+        echecs = 0  # Tentatives consécutives sans succès
+        try:
+            while not self.arret:
+                self.signaler(RECONNEXION if echecs or self.jeton else CONNEXION, tentative=echecs + 1)
+                try:
+                    self.ouvrir()
+                except OSError as e:
+                    echecs += 1
+                    if echecs >= self.tentatives_max:
+                        self.file_messages.put({"type": CONNEXION_PERDUE, "message": str(e)})
+                        return
+                    attente = min(self.attente_max, self.attente_initiale * 2 ** (echecs - 1)) * random.uniform(0.5, 1.0)
+                    self.signaler(ATTENTE, delai=attente, erreur=str(e))
+                    self.patienter(attente)
+                    continue
+                echecs = 0
+                try:
+                    if not self.arret:
+                        self.servir()
+                except ErreurProtocole as e:
+                    self.file_messages.put({"type": ERREUR_RECEPTION, "message": str(e)})
+                    return
+                finally:
+                    self.fermer_socket()
+                if self.terminee:
+                    return
+        finally:
+            self.selecteur.close()
+            self.reveil_lecture.close()
+            self.reveil_ecriture.close()
+
+
+    def ouvrir(self):
+        # Établit la connexion et prépare son premier message : la reprise de la session s'il y en a une
+        self.socket_client = socket.create_connection((self.hote, self.port), timeout=self.delai_connexion)
+        self.socket_client.setblocking(False)
+        # Les messages d'un même passage partent déjà groupés : inutile d'attendre d'autres octets
+        self.socket_client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.decodeur = DecodeurFlux()
+        self.binaire = False
+        self.sortie = bytearray()
+        if self.jeton is not None:
+            premier = {"action": "REPRISE", "jeton": self.jeton, "encodages": [ENCODAGE_BINAIRE, ENCODAGE_JSON]}
+        else:
+            premier = self.message_nom
+        self.sortie += encoder_message(premier)
+        with self.verrou:
+            self.a_envoyer = []  # Ce qui a été déposé avant la coupure n'a plus cours
+        self.selecteur.register(self.socket_client, selectors.EVENT_READ | selectors.EVENT_WRITE)
+        self.signaler(CONNECTE, hote=self.hote, port=self.port)
+
+
+    def patienter(self, attente):
+        # Attend avant la prochaine tentative ; fermer() interrompt l'attente
+        for cle, _ in self.selecteur.select(timeout=attente):
+            self.vider_reveil()
+
+
+    def servir(self):
+        # Boucle de la connexion établie : lit, décode, et écrit les lots en attente. Rend la main à la coupure.
+        while True:
+            for cle, evenements in self.selecteur.select():
+                if cle.fileobj is self.reveil_lecture:
+                    self.vider_reveil()
+                    self.preparer_envoi()
+                    continue
+                if evenements & selectors.EVENT_READ and not self.lire():
+                    return
+                if evenements & selectors.EVENT_WRITE and not self.ecrire():
+                    return
+            if self.arret:
+                self.terminer_envoi()
+                return
+
+
+    def vider_reveil(self):
+        try:
+            while self.reveil_lecture.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+    def preparer_envoi(self):
+        # Encode d'un coup tout ce que l'interface a déposé, puis tente de l'écrire
+        with self.verrou:
+            messages = self.a_envoyer
+            self.a_envoyer = []
+        if not messages:
+            return
+        encoder = encoder_binaire if self.binaire else encoder_message
+        self.sortie += b''.join(encoder(message) for message in messages)
+        self.messages_envoyes += len(messages)
+        self.ecrire()
+
+
+    def ecrire(self):
+        # Écrit ce que le socket accepte sans bloquer ; le reste attend qu'il soit de nouveau inscriptible
+        if self.sortie:
+            try:
+                envoyes = self.socket_client.send(self.sortie)
+            except BlockingIOError:
+                envoyes = 0
+            except OSError:
+                return False
+            self.envois += 1
+            del self.sortie[:envoyes]
+        evenements = selectors.EVENT_READ | selectors.EVENT_WRITE if self.sortie else selectors.EVENT_READ
+        if self.selecteur.get_key(self.socket_client).events != evenements:
+            self.selecteur.modify(self.socket_client, evenements)
+        return True
+
+
+    def lire(self):
+        # Lit et dépose les messages complets ; renvoie False si la connexion est fermée
+        try:
+            donnees = self.socket_client.recv(TAILLE_LECTURE)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not donnees:
+            return False
+        for message in self.decodeur.alimenter(donnees):
+            if message.get("type") == "PING":
+                # Répondu ici : le serveur sait que la connexion vit même si l'interface est occupée
+                self.sortie += encoder_message({"action": "PONG"})
+                continue
+            self.suivre(message)
+            self.file_messages.put(message)
+        return self.ecrire() if self.sortie else True
+
+
+    def suivre(self, message):
+        # Retient, dans le thread réseau, ce qu'il faut pour encoder les envois et reprendre la session
+        type_message = message.get("type")
+        if type_message == "PARTIE":
+            self.binaire = message.get("encodage") == ENCODAGE_BINAIRE
+            self.jeton = message.get("jeton")
+        elif type_message == "REPRISE_REFUSEE":
+            # La place n'a pas été gardée : le joueur rejoint une nouvelle partie
+            self.jeton = None
+            self.message_nom = {cle: valeur for cle, valeur in self.message_nom.items() if cle != "partie"}
+            self.sortie += encoder_message(self.message_nom)
+        elif type_message == "FIN_JEU" or (type_message == "INFO" and "gagnant" in message["message"].lower()):
+            self.terminee = True
+
+
+    def terminer_envoi(self):
+        # Envoie ce qui reste, en bloquant au plus DELAI_FERMETURE
+        self.preparer_envoi()
+        if self.sortie:
+            try:
+                self.socket_client.settimeout(DELAI_FERMETURE)
+                self.socket_client.sendall(self.sortie)
+            except OSError:
+                pass
+
+
+    def fermer_socket(self):
+        with self.verrou:
+            if not self.arret:
+                self.etat = RECONNEXION  # Refuse les envois jusqu'à la prochaine connexion
+        self.selecteur.unregister(self.socket_client)
+        self.socket_client.close()
+        self.socket_client = None
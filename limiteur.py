@@ -0,0 +1,23 @@
+import time
+
+
+class SeauJetons:
+    # Limiteur de débit à seau de jetons : le seau se remplit de debit jetons par seconde,
+    # jusqu'à rafale jetons, et chaque action autorisée en consomme un
+    def __init__(self, debit, rafale, maintenant=None):
+        self.debit = debit  # Jetons ajoutés par seconde
+        self.rafale = rafale  # Capacité du seau
+        self.jetons = float(rafale)  # Le seau est plein au départ
+        self.derniere_maj = time.monotonic() if maintenant is None else maintenant
+
+
+    def consommer(self, maintenant=None):
+        # Renvoie True si l'action est autorisée, False si elle doit être limitée
+        if maintenant is None:
+            maintenant = time.monotonic()
+        self.jetons = min(self.rafale, self.jetons + (maintenant - self.derniere_maj) * self.debit)
+        self.derniere_maj = maintenant
+        if self.jetons >= 1:
+            self.jetons -= 1
+            return True
+        return False
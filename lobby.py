@@ -0,0 +1,99 @@
+import itertools
+import threading
+
+from partie import Partie
+
+
+class Lobby:
+    # Registre des parties hébergées par un serveur. Son verrou ne protège que le registre :
+    # il n'est jamais pris pendant une action de jeu, et une partie peut le prendre sous son
+    # propre verrou (l'inverse est interdit, pour éviter les interblocages).
+    def __init__(self, serveur, premier_identifiant=1, pas_identifiant=1, **parametres_partie):
+        self.serveur = serveur
+        self.parametres_partie = parametres_partie  # Paramètres transmis à chaque nouvelle partie
+        self.parties = {}  # Dictionnaire des parties par identifiant
+        # Parties qui acceptent encore des joueurs, dans l'ordre de création : le placement
+        # automatique prend la plus ancienne pour remplir les salles avant d'en ouvrir d'autres
+        self.parties_ouvertes = {}
+        # Générateur d'identifiants de partie ; en mode grappe, chaque processus ouvrier a sa propre
+        # suite (même pas, premier identifiant différent) pour que les identifiants restent uniques
+        self.compteur = itertools.count(premier_identifiant, pas_identifiant)
+        self.verrou = threading.Lock()
+
+
+    def creer_partie(self):
+        # Crée une nouvelle partie vide et l'enregistre
+        with self.verrou:
+            return self._creer_partie()
+
+
+    def _creer_partie(self):
+        identifiant = next(self.compteur)
+        # Chaque partie a son propre générateur, dérivé de la graine du serveur et de son identifiant
+        partie = Partie(self.serveur, identifiant, graine=f"{self.serveur.graine}.{identifiant}", **self.parametres_partie)
+        self.parties[identifiant] = partie
+        self.parties_ouvertes[identifiant] = partie
+        return partie
+
+
+    def placer(self, demande=None):
+        # Choisit la partie d'un joueur : une partie précise (par identifiant), une nouvelle partie
+        # ("nouvelle"), ou à défaut la plus ancienne partie ouverte. Renvoie None si la partie
+        # demandée n'existe pas ou n'accepte plus de joueurs.
+        with self.verrou:
+            if demande == "nouvelle":
+                return self._creer_partie()
+            if demande is not None:
+                return self.parties_ouvertes.get(demande)
+            for partie in self.parties_ouvertes.values():
+                return partie
+            return self._creer_partie()
+
+
+    def mettre_a_jour(self, partie):
+        # Appelé par une partie lorsque son effectif ou son état change
+        with self.verrou:
+            if partie.identifiant not in self.parties:
+                return
+            if partie.peut_accueillir():
+                self.parties_ouvertes[partie.identifiant] = partie
+            else:
+                self.parties_ouvertes.pop(partie.identifiant, None)
+
+
+    def retirer(self, partie):
+        # Oublie une partie terminée ou abandonnée
+        with self.verrou:
+            self.parties.pop(partie.identifiant, None)
+            self.parties_ouvertes.pop(partie.identifiant, None)
+
+
+    def trouver(self, identifiant=None):
+        # Partie à regarder pour un spectateur : celle demandée, ou à défaut la plus récente, même commencée
+        with self.verrou:
+            if identifiant is not None:
+                return self.parties.get(identifiant)
+            return next(reversed(self.parties.values()), None)
+
+
+    def lister_parties(self):
+        # Copie de la liste des parties, pour la parcourir sans garder le verrou
+        with self.verrou:
+            return list(self.parties.values())
+
+
+    def lister(self):
+        # Résumé des parties pour les clients qui veulent en choisir une
+        parties = self.lister_parties()
+        return [{"partie": partie.identifiant, "joueurs": len(partie.annuaire),
+                 "joueurs_max": partie.joueurs_max, "en_cours": partie.partie_en_cours}
+                for partie in parties]
+
+
+    def vider(self):
+        # Retire toutes les parties du registre et les renvoie, pour l'arrêt du serveur
+        with self.verrou:
+            parties = list(self.parties.values())
+            self.parties.clear()
+            self.parties_ouvertes.clear()
+        return parties
@@ -0,0 +1,247 @@
+import bisect
+import http.server
+import threading
+import time
+
+# Bornes (en secondes) des histogrammes de durée, de la microseconde à la seconde
+BORNES_DUREE = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0)
+
+
+def formater_etiquette(nom_etiquette, valeur):
+    if nom_etiquette is None:
+        return ""
+    valeur = str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'{{{nom_etiquette}="{valeur}"}}'
+
+
+class Compteur:
+    # Compteur monotone, éventuellement ventilé selon une étiquette (par exemple l'action d'un message)
+    def __init__(self, nom, aide, nom_etiquette=None):
+        self.nom = nom
+        self.aide = aide
+        self.nom_etiquette = nom_etiquette
+        self.valeurs = {}  # Valeur par valeur d'étiquette
+        self.verrou = threading.Lock()
+
+
+    def inc(self, quantite=1, etiquette=None):
+        with self.verrou:
+            self.valeurs[etiquette] = self.valeurs.get(etiquette, 0) + quantite
+
+
+    def exposer(self):
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} counter"]
+        with self.verrou:
+            valeurs = sorted(self.valeurs.items(), key=lambda item: str(item[0]))
+        for etiquette, valeur in valeurs:
+            lignes.append(f"{self.nom}{formater_etiquette(self.nom_etiquette, etiquette)} {valeur}")
+        return lignes
+
+
+class Jauge:
+    # Valeur instantanée, lue au moment de l'exposition par une fonction
+    def __init__(self, nom, aide, fonction):
+        self.nom = nom
+        self.aide = aide
+        self.fonction = fonction
+
+
+    def exposer(self):
+        return [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} gauge", f"{self.nom} {self.fonction()}"]
+
+
+class Histogramme:
+    # Histogramme cumulatif au format Prometheus
+    def __init__(self, nom, aide, bornes=BORNES_DUREE):
+        self.nom = nom
+        self.aide = aide
+        self.bornes = bornes
+        self.comptes = [0] * (len(bornes) + 1)  # Le dernier compartiment correspond à +Inf
+        self.somme = 0.0
+        self.verrou = threading.Lock()
+
+
+    def observer(self, valeur):
+        indice = bisect.bisect_left(self.bornes, valeur)
+        with self.verrou:
+            self.comptes[indice] += 1
+            self.somme += valeur
+
+
+    def exposer(self):
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} histogram"]
+        with self.verrou:
+            comptes = list(self.comptes)
+            somme = self.somme
+        cumul = 0
+        for borne, compte in zip(self.bornes, comptes):
+            cumul += compte
+            lignes.append(f'{self.nom}_bucket{{le="{borne}"}} {cumul}')
+        cumul += comptes[-1]
+        lignes.append(f'{self.nom}_bucket{{le="+Inf"}} {cumul}')
+        lignes.append(f"{self.nom}_sum {somme}")
+        lignes.append(f"{self.nom}_count {cumul}")
+        return lignes
+
+
+class VerrouInstrumente:
+    # Enveloppe un RLock et mesure l'attente pour l'obtenir et la durée pendant laquelle il est tenu.
+    # Seule la prise la plus externe est mesurée, les prises réentrantes sont gratuites.
+    def __init__(self, attente, tenue):
+        self.verrou = threading.RLock()
+        self.attente = attente  # Histogramme des attentes
+        self.tenue = tenue  # Histogramme des durées de détention
+        self.profondeur = 0  # Niveau de réentrance, modifié uniquement par le détenteur
+        self.debut_tenue = 0.0
+
+
+    def __enter__(self):
+        debut = time.perf_counter()
+        self.verrou.acquire()
+        if self.profondeur == 0:
+            self.debut_tenue = time.perf_counter()
+            self.attente.observer(self.debut_tenue - debut)
+        self.profondeur += 1
+        return self
+
+
+    def __exit__(self, *exc):
+        self.profondeur -= 1
+        if self.profondeur == 0:
+            self.tenue.observer(time.perf_counter() - self.debut_tenue)
+        self.verrou.release()
+
+
+class Metriques:
+    # Métriques du serveur : compteurs et histogrammes des chemins critiques
+    actif = True
+
+    def __init__(self):
+        self.metriques = []
+        self.messages_recus = self.compteur("chat_paresseux_messages_recus_total", "Messages reçus des clients", "action")
+        self.messages_envoyes = self.compteur("chat_paresseux_messages_envoyes_total", "Messages envoyés aux clients", "type")
+        self.octets_envoyes = self.compteur("chat_paresseux_octets_envoyes_total", "Octets écrits sur les sockets clients")
+        self.coupures_inactivite = self.compteur("chat_paresseux_coupures_inactivite_total",
+                                                 "Connexions coupées faute de réponse au PING")
+        self.attente_verrou = self.histogramme("chat_paresseux_verrou_attente_secondes", "Attente pour obtenir le verrou d'une partie")
+        self.tenue_verrou = self.histogramme("chat_paresseux_verrou_tenue_secondes", "Durée de détention du verrou d'une partie")
+        self.attente_verrou_chat = self.histogramme("chat_paresseux_verrou_chat_attente_secondes",
+                                                    "Attente pour obtenir le verrou du chat d'une partie")
+        self.tenue_verrou_chat = self.histogramme("chat_paresseux_verrou_chat_tenue_secondes",
+                                                  "Durée de détention du verrou du chat d'une partie")
+        self.duree_scores = self.histogramme("chat_paresseux_calcul_scores_secondes", "Durée de calculer_scores")
+        self.duree_diffusion = self.histogramme("chat_paresseux_diffusion_secondes", "Durée de mise en file d'une diffusion")
+
+
+    def compteur(self, nom, aide, nom_etiquette=None):
+        compteur = Compteur(nom, aide, nom_etiquette)
+        self.metriques.append(compteur)
+        return compteur
+
+
+    def histogramme(self, nom, aide, bornes=BORNES_DUREE):
+        histogramme = Histogramme(nom, aide, bornes)
+        self.metriques.append(histogramme)
+        return histogramme
+
+
+    def jauge(self, nom, aide, fonction):
+        jauge = Jauge(nom, aide, fonction)
+        self.metriques.append(jauge)
+        return jauge
+
+
+    def verrou(self, nom="partie"):
+        # Verrou de partie instrumenté ; le verrou du chat ("chat") a ses propres histogrammes
+        if nom == "chat":
+            return VerrouInstrumente(self.attente_verrou_chat, self.tenue_verrou_chat)
+        return VerrouInstrumente(self.attente_verrou, self.tenue_verrou)
+
+
+    def exposition(self):
+        # Texte au format d'exposition Prometheus
+        lignes = []
+        for metrique in self.metriques:
+            lignes.extend(metrique.exposer())
+        return "\n".join(lignes) + "\n"
+
+
+class MetriqueInactive:
+    # Remplace compteurs, jauges et histogrammes quand les métriques sont désactivées
+    def inc(self, quantite=1, etiquette=None):
+        pass
+
+
+    def observer(self, valeur):
+        pass
+
+
+class MetriquesInactives:
+    # Même interface que Metriques, sans aucun coût autre qu'un appel de méthode vide.
+    # Les mesures de durée sont en plus évitées par les appelants grâce à actif.
+    actif = False
+
+    def __init__(self):
+        inactive = MetriqueInactive()
+        self.messages_recus = self.messages_envoyes = self.octets_envoyes = self.coupures_inactivite = inactive
+        self.attente_verrou = self.tenue_verrou = self.duree_scores = self.duree_diffusion = inactive
+        self.attente_verrou_chat = self.tenue_verrou_chat = inactive
+
+
+    def compteur(self, nom, aide, nom_etiquette=None):
+        return self.messages_recus
+
+
+    def histogramme(self, nom, aide, bornes=BORNES_DUREE):
+        return self.messages_recus
+
+
+    def jauge(self, nom, aide, fonction):
+        return None
+
+
+    def verrou(self, nom="partie"):
+        return threading.RLock()
+
+
+    def exposition(self):
+        return ""
+
+
+class ServeurAdmin(threading.Thread):
+    # Petit serveur HTTP local qui expose les métriques sur /metrics
+    def __init__(self, metriques, hote='127.0.0.1', port=9102, socket_ecoute=None):
+        # socket_ecoute : socket déjà lié, hérité du processus précédent lors d'une relève
+        super().__init__(daemon=True)
+        metriques_exposees = metriques
+
+        class Gestionnaire(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                corps = metriques_exposees.exposition().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corps)))
+                self.end_headers()
+                self.wfile.write(corps)
+
+            def log_message(self, format, *args):
+                pass  # Pas de journal pour chaque collecte
+
+        if socket_ecoute is None:
+            self.serveur_http = http.server.ThreadingHTTPServer((hote, port), Gestionnaire)
+        else:
+            self.serveur_http = http.server.ThreadingHTTPServer((hote, port), Gestionnaire, bind_and_activate=False)
+            self.serveur_http.socket.close()
+            self.serveur_http.socket = socket_ecoute
+
+
+    def run(self):
+        self.serveur_http.serve_forever()
+
+
+    def arreter(self):
+        self.serveur_http.shutdown()
+        self.serveur_http.server_close()
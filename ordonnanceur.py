@@ -0,0 +1,79 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Tache:
+    # Exécution différée renvoyée par Ordonnanceur.planifier ; cancel() a le même nom que pour
+    # threading.Timer et asyncio.TimerHandle, que l'ordonnanceur remplace
+    __slots__ = ('echeance', 'fonction', 'args', 'annulee')
+
+    def __init__(self, echeance, fonction, args):
+        self.echeance = echeance  # Instant d'exécution (horloge monotone)
+        self.fonction = fonction
+        self.args = args
+        self.annulee = False
+
+
+    def cancel(self):
+        # Une tâche annulée reste dans le tas mais sera ignorée à son échéance
+        self.annulee = True
+
+
+class Ordonnanceur:
+    # Un seul thread exécute toutes les tâches différées du serveur (fin de tour, délais de choix
+    # et de préparation, regroupement du chat...) pour toutes les parties, dans l'ordre de leurs
+    # échéances rangées dans un tas. Les tâches doivent être courtes : elles retardent les suivantes.
+    def __init__(self):
+        self.tas = []  # Entrées (échéance, numéro, tâche)
+        self.compteur = itertools.count()  # Départage les tâches de même échéance
+        self.condition = threading.Condition()
+        self.thread = None  # Démarré au premier planifier
+        self.actif = True
+
+
+    def planifier(self, delai, fonction, *args):
+        # Exécute fonction(*args) dans delai secondes et renvoie la tâche, pour pouvoir l'annuler
+        tache = Tache(time.monotonic() + delai, fonction, args)
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.boucle, daemon=True)
+                self.thread.start()
+            heapq.heappush(self.tas, (tache.echeance, next(self.compteur), tache))
+            # Réveille le thread seulement si la nouvelle tâche passe en tête
+            if self.tas[0][2] is tache:
+                self.condition.notify()
+        return tache
+
+
+    def boucle(self):
+        # Attend la prochaine échéance, puis exécute toutes les tâches arrivées à échéance
+        while True:
+            with self.condition:
+                while self.actif:
+                    maintenant = time.monotonic()
+                    if self.tas and self.tas[0][0] <= maintenant:
+                        break
+                    self.condition.wait(self.tas[0][0] - maintenant if self.tas else None)
+                if not self.actif:
+                    return
+                a_executer = []
+                while self.tas and self.tas[0][0] <= maintenant:
+                    a_executer.append(heapq.heappop(self.tas)[2])
+            # Les tâches s'exécutent sans le verrou de l'ordonnanceur, pour pouvoir en planifier d'autres
+            for tache in a_executer:
+                if tache.annulee:
+                    continue
+                try:
+                    tache.fonction(*tache.args)
+                except Exception as e:
+                    print(f"Erreur dans une tâche planifiée: {e}")
+
+
+    def arreter(self):
+        # Arrête le thread ; les tâches en attente sont abandonnées
+        with self.condition:
+            self.actif = False
+            self.tas.clear()
+            self.condition.notify()
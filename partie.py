@@ -0,0 +1,607 @@
+import collections
+import itertools
+import random
+import time
+
+from effectif import Effectif
+from limiteur import SeauJetons
+from regles import calculer_ecarts, generer_position_chat, joueurs_elimines
+
+
+class Partie:
+    # Une partie (ou salle) de jeu : elle possède ses joueurs, ses scores, son chat et son propre verrou,
+    # si bien que plusieurs parties hébergées par le même serveur ne se bloquent jamais entre elles
+    def __init__(self, serveur, identifiant, taille_grille_min=3, taille_grille_max=10, points_depart=10, joueurs_max=10,
+                 taille_historique_chat=100, chat_debit=5.0, chat_rafale=10, chat_fenetre=0.005,
+                 delai_choix=30.0, delai_pret=60.0, delai_fin_tour=3.0, delai_reprise=30.0, graine=None):
+        self.serveur = serveur  # Serveur chargé des envois et de la planification
+        self.identifiant = identifiant  # Identifiant de la partie dans le lobby
+        self.taille_grille_min = taille_grille_min  # Taille minimale de la grille de jeu
+        self.taille_grille_max = taille_grille_max  # Taille maximale de la grille de jeu
+        self.points_depart = points_depart  # Points de départ pour chaque joueur
+        self.joueurs_max = joueurs_max  # Nombre maximal de joueurs dans la partie
+        self.delai_choix = delai_choix  # Temps laissé pour choisir une case, None pour attendre indéfiniment
+        self.delai_pret = delai_pret  # Temps laissé aux autres joueurs pour être prêts après le premier
+        self.delai_fin_tour = delai_fin_tour  # Temps d'affichage des résultats avant la vérification de fin de jeu
+        self.delai_reprise = delai_reprise  # Temps laissé à un joueur déconnecté pour reprendre sa place, None pour aucun
+        # Générateur propre à la partie : avec la même graine et les mêmes actions, une partie rejouée
+        # tire les mêmes grilles et les mêmes positions du chat
+        self.rng = random.Random(graine)
+        # Génération aléatoire de la taille de la grille pour la partie actuelle
+        self.taille_grille = self.rng.randint(self.taille_grille_min, self.taille_grille_max)
+        # Table des joueurs inscrits : connexion, score, choix, état prêt, jeton et limiteur du chat de chacun
+        self.effectif = Effectif()
+        # Identifiant court de chaque joueur, utilisé à la place du nom dans les messages binaires
+        self.identifiants_joueurs = {}
+        self.compteur_joueurs = itertools.count()  # Les identifiants ne sont jamais réutilisés dans une partie
+        self.jetons = {}  # Joueur associé à chaque jeton de reprise de session
+        # Joueurs dont la connexion a été perdue : leur place est gardée jusqu'à l'échéance (tâche planifiée)
+        self.deconnectes = {}
+        self.position_chat = self.generer_position_chat()  # Génération de la position initiale du chat
+        # Dernières lignes du chat, en anneau borné pour ne pas grossir indéfiniment
+        self.historique_chat = collections.deque(maxlen=taille_historique_chat)
+        self.seq_chat = 0  # Numéro de séquence de la prochaine ligne de chat
+        self.chat_debit = chat_debit  # Lignes de chat par seconde autorisées par joueur
+        self.chat_rafale = chat_rafale  # Lignes de chat autorisées d'affilée par joueur
+        self.chat_fenetre = chat_fenetre  # Fenêtre de regroupement des lignes de chat, en secondes
+        self.lignes_chat_en_attente = []  # Lignes reçues pendant la fenêtre de regroupement
+        self.chat_limites = 0  # Lignes refusées par le limiteur de débit
+        self.chat_fusionnes = 0  # Lignes envoyées dans la diffusion d'une autre
+        # Verrou du jeu : effectif (connexions, scores, jetons) et état du tour. Les deux restent sous le même
+        # verrou car un départ doit revérifier la fin du tour dans la même section critique. Il est
+        # réentrant car terminer_tour et verifier_occupation sont appelés sous le verrou. Il est instrumenté
+        # (attente et durée de détention) quand les métriques du serveur sont activées.
+        self.verrou = serveur.metriques.verrou()
+        # Verrou du chat : historique, numéros de séquence, limiteurs des joueurs et lignes en attente. Le chat ne
+        # prend jamais le verrou du jeu ; l'ordre de prise est toujours jeu, puis chat, puis lobby.
+        self.verrou_chat = serveur.metriques.verrou("chat")
+        # Instantanés de l'effectif, remplacés (jamais modifiés) sous le verrou du jeu et lus sans verrou :
+        # socket vers fiche des joueurs connectés, sockets à qui diffuser, et noms de tous les inscrits
+        # (déconnectés en attente de reprise compris)
+        self.annuaire = {}
+        self.destinataires = ()
+        self.inscrits = frozenset()
+        # Version de l'état montré aux spectateurs (effectif, tour, scores), incrémentée sous le verrou du jeu ;
+        # le diffuseur des spectateurs la compare, avec seq_chat, pour n'envoyer que les parties qui ont changé
+        self.version = 0
+        self.position_revelee = None  # Position du chat du dernier tour terminé, cachée pendant les choix
+        self.partie_en_cours = False  # Indicateur de partie en cours
+        self.premier_tour_passe = False  # Indicateur pour vérifier si le premier tour est passé
+        self.terminee = False  # Indicateur de partie terminée
+        self.choix_ouverts = False  # Indique qu'un tour attend les choix des joueurs
+        self.echeance_choix = None  # Tâche planifiée qui clôt le tour faute de choix de tous les joueurs
+        self.echeance_pret = None  # Tâche planifiée qui lance le tour faute de joueurs tous prêts
+        self.numero_tour = 0  # Numéro du tour en cours, à partir de 1
+        # Identifiant de la partie dans l'historique persistant (None s'il n'est pas conservé)
+        self.id_historique = serveur.stockage.nouvelle_partie(identifiant)
+
+
+    def generer_position_chat(self):
+        # Génération aléatoire de la position du chat dans la grille
+        return generer_position_chat(self.taille_grille, self.rng)
+
+
+    def peut_accueillir(self):
+        # Une partie accepte de nouveaux joueurs tant qu'elle n'a pas commencé et n'est pas pleine ;
+        # les joueurs déconnectés gardent leur place
+        return not self.terminee and not self.partie_en_cours and len(self.effectif) < self.joueurs_max
+
+
+    def enregistrer_nom(self, client_socket, nom_joueur):
+        # Enregistrement du nom du joueur et initialisation de son score et de son choix.
+        # Renvoie False si la partie ne peut plus accueillir le joueur (commencée ou pleine entre-temps).
+        with self.verrou:
+            if not self.peut_accueillir():
+                return False
+            if nom_joueur in self.effectif:
+                self.envoyer_message_par_socket(client_socket, {"type": "INFO", "message": "Ce nom est déjà pris dans cette partie."})
+                return False
+            # Fiche du joueur : score de départ, pas encore de choix ; le limiteur n'est lu par le chat
+            # qu'une fois la fiche publiée dans l'annuaire
+            joueur = self.effectif.inscrire(nom_joueur, client_socket, self.points_depart,
+                                            SeauJetons(self.chat_debit, self.chat_rafale, self.serveur.horloge()))
+            self.identifiants_joueurs[nom_joueur] = next(self.compteur_joueurs)
+            self.publier_annuaire()
+            # Jeton secret permettant de reprendre la place du joueur après une coupure
+            jeton = self.serveur.creer_jeton(self)
+            self.serveur.enregistreur.jeton(client_socket, jeton)
+            self.jetons[jeton] = nom_joueur
+            joueur.jeton = jeton
+            self.serveur.sessions[jeton] = self
+            print(f"{nom_joueur} est connecté à la partie {self.identifiant}.")
+            self.envoyer_message(nom_joueur, {"type": "PARTIE", "partie": self.identifiant, "jeton": jeton,
+                                              "encodage": self.serveur.encodage(client_socket)})
+            # Tous les joueurs reçoivent la table des identifiants, nécessaire pour lire les scores binaires
+            self.serveur.diffuser(self.destinataires, {"type": "JOUEURS", "joueurs": self.identifiants_joueurs},
+                                  cle="JOUEURS")
+            # Envoi un message de bienvenue au joueur
+            message_bienvenue = "Il faut un minimum de 3 joueurs pour lancer le jeu. Cliquez juste sur prêt si oui, et patientez que la grille s'active, merci."
+            self.envoyer_message(nom_joueur, {"type": "INFO", "message": message_bienvenue})
+            # Le nouveau joueur reçoit les 10 dernières lignes du chat
+            self.envoyer_historique_chat(client_socket, self.seq_chat - 10)
+            self.serveur.lobby.mettre_a_jour(self)
+            return True
+
+
+    def publier_annuaire(self):
+        # Publie de nouveaux instantanés de l'effectif ; appelé sous le verrou du jeu après chaque changement
+        self.annuaire = dict(self.effectif.connectes)
+        self.destinataires = tuple(self.annuaire)
+        self.inscrits = frozenset(self.effectif.joueurs)
+        self.version += 1
+
+
+    def gerer_pret(self, client_socket):
+        # Gestion de l'état prêt d'un joueur
+        with self.verrou:
+            effectif = self.effectif
+            joueur = effectif.connectes.get(client_socket)
+            if joueur is None:
+                return
+            effectif.marquer_pret(joueur)
+
+            # Vérifie si tous les joueurs sont prêts pour commencer un nouveau tour
+            if self.tous_prets():
+                self.commencer_nouveau_tour()  # Commence un nouveau tour si toutes les conditions sont remplies
+                return
+            if not self.premier_tour_passe:
+                # Affichage de l'état de préparation des joueurs avant le début du jeu
+                print(f"Partie {self.identifiant} : en attente que tous les joueurs soient prêts. {effectif.prets}/{effectif.actifs} joueurs prêts.")
+            # Les retardataires ont delai_pret secondes à partir du premier joueur prêt
+            if self.echeance_pret is None and self.delai_pret is not None and not self.choix_ouverts:
+                self.echeance_pret = self.serveur.planifier(self.delai_pret, self.expirer_pret)
+
+
+    def tous_prets(self):
+        # Tous les joueurs actifs sont prêts, et ils sont assez nombreux pour le premier tour
+        return self.effectif.tous_prets() and (self.effectif.actifs >= 3 or self.premier_tour_passe)
+
+
+    def expirer_pret(self):
+        # Lance le tour sans attendre les joueurs qui ne se sont pas déclarés prêts
+        with self.verrou:
+            self.echeance_pret = None
+            if self.terminee or self.choix_ouverts or not self.effectif.prets:
+                return
+            if self.effectif.actifs >= 3 or self.premier_tour_passe:
+                print(f"Partie {self.identifiant} : délai de préparation écoulé, {self.effectif.prets}/{self.effectif.actifs} joueurs prêts.")
+                self.commencer_nouveau_tour()
+
+
+    def commencer_nouveau_tour(self):
+        # Début d'un nouveau tour de jeu
+        # Réinitialisation de la taille de la grille pour le nouveau tour
+        self.taille_grille = self.rng.randint(self.taille_grille_min, self.taille_grille_max)
+        self.position_chat = self.generer_position_chat()  # Génération d'une nouvelle position pour le chat
+        self.effectif.nouveau_tour()  # Réinitialisation des joueurs prêts et des choix pour le nouveau tour
+        self.annuler_echeances()
+        self.choix_ouverts = True
+        self.numero_tour += 1
+        self.position_revelee = None
+        self.version += 1
+        # Envoi de la nouvelle position du chat et de la taille de la grille aux joueurs
+        self.serveur.diffuser(self.destinataires, {
+            "type": "DEBUT_TOUR",
+            "position_chat": self.position_chat_numero(),
+            "taille_grille": self.taille_grille
+        })
+        self.premier_tour_passe = True
+        if not self.partie_en_cours:
+            self.partie_en_cours = True  # Indication que la partie est en cours
+            self.serveur.lobby.mettre_a_jour(self)  # La partie n'accepte plus de joueurs
+        # Un joueur qui ne choisit pas à temps ne bloque pas le tour : il perd son choix
+        if self.delai_choix is not None:
+            self.echeance_choix = self.serveur.planifier(self.delai_choix, self.expirer_choix)
+
+
+    def traiter_choix(self, client_socket, position):
+        # Traitement du choix de position envoyé par un joueur ; les choix hors tour, d'un inconnu ou qui
+        # ne sont pas un entier sont écartés d'après l'instantané, sans prendre le verrou
+        if client_socket not in self.annuaire or not self.choix_ouverts or type(position) is not int:
+            return
+        with self.verrou:
+            joueur = self.effectif.connectes.get(client_socket)
+            if joueur is None or not self.choix_ouverts:
+                return
+            if not 0 <= position < self.taille_grille ** 2:
+                return  # Case hors de la grille du tour
+            # Enregistrement du choix du joueur
+            self.effectif.choisir(joueur, position)
+            self.verifier_fin_tour()
+
+
+    def verifier_fin_tour(self):
+        # Si tous les joueurs connectés ont fait leur choix, calculer les scores ; les joueurs
+        # déconnectés n'ont pas à être attendus et perdront le point du tour. Le compteur des choix suffit :
+        # la vérification ne dépend pas du nombre de joueurs.
+        if self.choix_ouverts and self.effectif.tous_choisis():
+            self.terminer_tour()
+
+
+    def expirer_choix(self):
+        # Clôt le tour à l'échéance : les joueurs sans choix perdent le point du tour
+        with self.verrou:
+            self.echeance_choix = None
+            if not self.choix_ouverts:
+                return
+            forfaits = [joueur.nom for joueur in self.effectif.en_lice() if joueur.choix is None]
+            print(f"Partie {self.identifiant} : délai de choix écoulé, forfait pour {', '.join(forfaits)}.")
+            self.terminer_tour()
+
+
+    def terminer_tour(self):
+        # Calcule et envoie les scores du tour, une seule fois par tour. Le tour n'est clos qu'une fois
+        # les scores calculés : en cas d'erreur, il reste ouvert au lieu d'être figé sans échéance.
+        self.calculer_scores()
+        self.choix_ouverts = False
+        self.annuler_echeances()
+        self.envoyer_scores()
+        self.position_revelee = self.position_chat_numero()
+        self.version += 1
+
+
+    def annuler_echeances(self):
+        # Annule les délais de préparation et de choix en attente
+        for echeance in (self.echeance_pret, self.echeance_choix):
+            if echeance is not None:
+                echeance.cancel()
+        self.echeance_pret = None
+        self.echeance_choix = None
+
+
+    def calculer_scores(self):
+        # Calcul des scores des joueurs en fonction de leurs choix et de la position du chat
+        metriques = self.serveur.metriques
+        if metriques.actif:
+            debut = time.perf_counter()
+        # Les joueurs éliminés ne jouent plus : leur score reste figé
+        joueurs = self.effectif.en_lice()
+        # Un choix absent (None) avant l'échéance compte comme un forfait
+        ecarts = calculer_ecarts([joueur.choix for joueur in joueurs], self.taille_grille, self.position_chat)
+        for joueur, ecart in zip(joueurs, ecarts):
+            joueur.score += ecart
+        stockage = self.serveur.stockage
+        if stockage.actif:
+            # Simple dépôt dans la file de l'écrivain : aucune écriture disque sous le verrou
+            stockage.enregistrer_tour(self.id_historique, self.numero_tour, self.taille_grille, self.position_chat_numero(),
+                                      [(joueur.nom, joueur.choix, ecart, joueur.score)
+                                       for joueur, ecart in zip(joueurs, ecarts)])
+        if metriques.actif:
+            metriques.duree_scores.observer(time.perf_counter() - debut)
+
+        # Mise en place d'un délai avant de vérifier la fin du jeu pour permettre aux joueurs de voir les résultats
+        self.serveur.planifier(self.delai_fin_tour, self.verifier_fin_jeu)
+
+
+    def verifier_fin_jeu(self):
+        # Vérifie si la partie doit se terminer ; les connexions sont fermées après avoir rendu le verrou
+        sockets = None
+        with self.verrou:
+            if self.terminee:
+                return
+            # Identifie, parmi les joueurs encore en lice, ceux dont le score est inférieur ou égal à 0 ;
+            # un joueur déjà éliminé n'est ni prévenu ni enregistré une seconde fois
+            scores = {joueur.nom: joueur.score for joueur in self.effectif.en_lice()}
+            joueurs_a_retirer = joueurs_elimines(scores)
+            for nom_joueur in joueurs_a_retirer:
+                # Envoi un message aux joueurs éliminés et les retire du jeu
+                self.effectif.eliminer(self.effectif.joueurs[nom_joueur])
+                self.envoyer_message(nom_joueur, {"type": "FIN_JEU", "message": "Vous avez perdu toutes vos vies!"})
+                self.serveur.stockage.enregistrer_elimination(self.id_historique, self.numero_tour, nom_joueur,
+                                                              scores[nom_joueur])
+
+            # Si tous les joueurs sont éliminés, la partie s'arrête
+            if len(scores) - len(joueurs_a_retirer) == 0:
+                print(f"Partie {self.identifiant} : tous les joueurs ont perdu. Partie terminée.")
+                self.serveur.stockage.enregistrer_fin(self.id_historique)
+                sockets = self.clore()
+            elif len(scores) - len(joueurs_a_retirer) == 1:
+                # S'il reste un seul joueur, il est le gagnant
+                gagnant = next(iter(set(scores) - set(joueurs_a_retirer)))
+                print(f"Partie {self.identifiant} : {gagnant} est le gagnant!")
+                self.serveur.stockage.enregistrer_fin(self.id_historique, gagnant)
+                self.envoyer_message(gagnant, {"type": "INFO", "message": "Félicitations, vous êtes le gagnant!"})
+                sockets = self.clore()
+            elif joueurs_a_retirer:
+                # Les joueurs éliminés ne sont plus attendus : ils étaient peut-être les derniers à devoir
+                # choisir, ou à devoir se déclarer prêts pour le tour suivant
+                if self.choix_ouverts:
+                    self.verifier_fin_tour()
+                elif self.tous_prets():
+                    self.commencer_nouveau_tour()
+        if sockets is not None:
+            self.liberer(sockets)
+
+
+    def position_chat_numero(self):
+        # Calcule la position numérique du chat dans la grille
+        return self.position_chat[0] * self.taille_grille + self.position_chat[1]
+
+
+    def envoyer_scores(self):
+        # Envoi les scores actuels et la position du chat à tous les clients
+        mise_a_jour = {
+            "type": "SCORES",
+            "position_chat": self.position_chat_numero(),
+            "scores": self.effectif.scores(),
+            "chat_position": self.position_chat_numero()
+        }
+        self.serveur.diffuser(self.destinataires, mise_a_jour, cle="SCORES", identifiants=self.identifiants_joueurs)
+
+
+    def traiter_chat(self, texte, client_socket):
+        # Traite un message de chat envoyé par un joueur : seul le verrou du chat est pris,
+        # le chat n'attend donc jamais un calcul de scores ou un départ
+        joueur = self.annuaire.get(client_socket)
+        if joueur is None:
+            return
+        with self.verrou_chat:
+            seau = joueur.seau
+            if seau is None:
+                return  # Joueur retiré entre-temps
+            if not seau.consommer(self.serveur.horloge()):
+                self.chat_limites += 1  # Le joueur envoie trop de messages : la ligne est ignorée
+                return
+            message_chat = f"{joueur.nom}: {texte}"
+            self.historique_chat.append(message_chat)  # Ajoute le message à l'historique
+            self.serveur.stockage.enregistrer_chat(self.id_historique, self.seq_chat, message_chat)
+            self.seq_chat += 1
+            # Les lignes reçues pendant la fenêtre partent ensemble dans une seule diffusion
+            self.lignes_chat_en_attente.append(message_chat)
+            if len(self.lignes_chat_en_attente) == 1:
+                if self.chat_fenetre > 0:
+                    self.serveur.planifier(self.chat_fenetre, self.vider_chat)
+                else:
+                    self.vider_chat()
+
+
+    def vider_chat(self):
+        # Diffuse d'un coup les lignes accumulées pendant la fenêtre de regroupement. La diffusion reste
+        # sous le verrou du chat pour garder l'ordre des lignes ; elle ne fait que remplir les files d'envoi.
+        with self.verrou_chat:
+            lignes = self.lignes_chat_en_attente
+            if not lignes:
+                return
+            self.lignes_chat_en_attente = []
+            self.chat_fusionnes += len(lignes) - 1
+            self.diffuser_chat(self.seq_chat - len(lignes), lignes)  # Diffuse les lignes à tous les joueurs
+
+
+    def diffuser_chat(self, seq, lignes):
+        # Diffuse uniquement les nouvelles lignes ; seq est le numéro de la première
+        mise_a_jour_chat = {
+            "type": "CHAT",
+            "seq": seq,
+            "lignes": lignes
+        }
+        self.serveur.diffuser(self.destinataires, mise_a_jour_chat)
+
+
+    def lignes_chat_depuis(self, depuis):
+        # Renvoie le numéro de la première ligne encore conservée à partir de depuis, et les lignes suivantes
+        premiere = self.seq_chat - len(self.historique_chat)
+        depuis = min(max(depuis, premiere), self.seq_chat)
+        return depuis, list(itertools.islice(self.historique_chat, depuis - premiere, None))
+
+
+    def envoyer_historique_chat(self, client_socket, depuis=0):
+        # Rattrapage pour un client qui arrive ou qui a manqué des lignes ; si les lignes
+        # demandées ne sont plus conservées, le client reçoit les plus anciennes disponibles
+        with self.verrou_chat:
+            seq, lignes = self.lignes_chat_depuis(depuis)
+            self.envoyer_message_par_socket(client_socket, {"type": "CHAT", "seq": seq, "lignes": lignes, "rattrapage": True})
+
+
+    def spectacle(self, nombre_lignes):
+        # Instantané de la partie pour les spectateurs : l'état des messages DEBUT_TOUR, SCORES et CHAT,
+        # copié sous chaque verrou le temps de quelques affectations, puis encodé hors verrou
+        with self.verrou:
+            spectacle = {
+                "type": "SPECTACLE",
+                "partie": self.identifiant,
+                "tour": self.numero_tour,
+                "en_cours": self.partie_en_cours,
+                "terminee": self.terminee,
+                "choix_ouverts": self.choix_ouverts,
+                "taille_grille": self.taille_grille,
+                "position_chat": self.position_revelee,
+                "deconnectes": list(self.deconnectes),
+            }
+            if not self.terminee:
+                # Les scores sont effacés à la fin de la partie : les spectateurs gardent ceux du dernier instantané
+                spectacle["scores"] = self.effectif.scores()
+        with self.verrou_chat:
+            seq, lignes = self.lignes_chat_depuis(self.seq_chat - nombre_lignes)
+        spectacle["seq"] = seq  # Numéro de la première ligne, comme dans les messages CHAT
+        spectacle["lignes"] = lignes
+        return spectacle
+
+
+    def envoyer_message(self, nom_joueur, message):
+        # Envoi un message à un joueur spécifique
+        joueur = self.effectif.joueurs.get(nom_joueur)
+        if joueur is not None and joueur.socket is not None:
+            self.envoyer_message_par_socket(joueur.socket, message)
+
+
+    def envoyer_message_par_socket(self, client_socket, message):
+        # Les envois passent par le serveur, qui connaît le transport utilisé
+        self.serveur.envoyer_message_par_socket(client_socket, message)
+
+
+    def deconnecter_joueur(self, client_socket):
+        # Connexion perdue sans DECONNEXION : la place du joueur est gardée delai_reprise secondes.
+        # La connexion a déjà été fermée par le serveur.
+        with self.verrou:
+            joueur = self.effectif.connectes.get(client_socket)
+            suspendre = joueur is not None and self.delai_reprise is not None and not self.terminee
+            if suspendre:
+                nom_joueur = joueur.nom
+                self.effectif.deconnecter(joueur)
+                self.deconnectes[nom_joueur] = self.serveur.planifier(self.delai_reprise,
+                                                                      lambda: self.expirer_session(nom_joueur))
+                self.publier_annuaire()
+                print(f"{nom_joueur} a perdu la connexion, sa place est gardée {self.delai_reprise} s.")
+                # Le joueur parti était peut-être le dernier à devoir choisir
+                self.verifier_fin_tour()
+        if not suspendre:
+            self.retirer_joueur(client_socket)
+
+
+    def expirer_session(self, nom_joueur):
+        # Fin du délai de reprise : le joueur déconnecté perd définitivement sa place
+        with self.verrou:
+            if self.deconnectes.pop(nom_joueur, None) is None:
+                return  # Le joueur est revenu entre-temps
+            self.oublier_joueur(nom_joueur)
+            self.publier_annuaire()
+            print(f"{nom_joueur} a été retiré de la partie {self.identifiant}.")
+            self.verifier_fin_tour()
+            self.verifier_occupation()
+
+
+    def reprendre(self, client_socket, jeton):
+        # Rattache un joueur à sa place à partir de son jeton ; renvoie False si le jeton n'est plus valable
+        ancien_socket = None
+        with self.verrou:
+            nom_joueur = self.jetons.get(jeton)
+            if nom_joueur is None or self.terminee:
+                return False
+            joueur = self.effectif.joueurs[nom_joueur]
+            tache = self.deconnectes.pop(nom_joueur, None)
+            if tache is not None:
+                tache.cancel()
+            else:
+                # La coupure n'a pas encore été détectée : l'ancienne connexion est abandonnée
+                ancien_socket = joueur.socket
+                if ancien_socket is not None:
+                    self.serveur.oublier_client(ancien_socket)
+            self.effectif.connecter(joueur, client_socket)
+            self.publier_annuaire()
+            print(f"{nom_joueur} a repris sa place dans la partie {self.identifiant}.")
+            self.envoyer_message_par_socket(client_socket, {"type": "PARTIE", "partie": self.identifiant, "jeton": jeton,
+                                                            "encodage": self.serveur.encodage(client_socket)})
+            self.envoyer_message_par_socket(client_socket, {"type": "JOUEURS", "joueurs": self.identifiants_joueurs})
+            self.envoyer_message_par_socket(client_socket, self.etat(joueur))
+        if ancien_socket is not None:
+            self.serveur.fermer_connexion(ancien_socket, immediat=True)
+        return True
+
+
+    def etat(self, joueur):
+        # Instantané compact de la partie pour un joueur qui reprend sa place, au lieu de tout rejouer ;
+        # le client demande lui-même les lignes de chat manquantes à partir de seq_chat
+        return {
+            "type": "ETAT",
+            "tour": self.numero_tour,
+            "en_cours": self.partie_en_cours,
+            "choix_ouverts": self.choix_ouverts,
+            "taille_grille": self.taille_grille,
+            "choix": joueur.choix,
+            "pret": joueur.pret,
+            "scores": self.effectif.scores(),
+            "seq_chat": self.seq_chat,
+        }
+
+
+    def retirer_joueur(self, client_socket):
+        # Retire définitivement un joueur de la partie et ferme sa connexion, une fois le verrou rendu
+        with self.verrou:
+            joueur = self.effectif.connectes.get(client_socket)
+            nom_joueur = joueur.nom if joueur is not None else None
+            if nom_joueur:
+                print(f"{nom_joueur} s'est déconnecté.")
+                self.oublier_joueur(nom_joueur)
+                self.publier_annuaire()
+                print(f"{nom_joueur} a été retiré de la partie {self.identifiant}.")
+                # Le joueur parti était peut-être le dernier à devoir choisir
+                self.verifier_fin_tour()
+            self.verifier_occupation()
+        if nom_joueur:
+            self.serveur.fermer_connexion(client_socket)
+
+
+    def oublier_joueur(self, nom_joueur):
+        # Efface la fiche d'un joueur (score, choix, jeton...) et son identifiant
+        joueur = self.effectif.joueurs.get(nom_joueur)
+        if joueur is None:
+            return
+        self.effectif.retirer(joueur)
+        with self.verrou_chat:
+            joueur.seau = None  # Une ligne de chat lue avant le retrait est ignorée
+        self.identifiants_joueurs.pop(nom_joueur, None)
+        if joueur.jeton is not None:
+            self.jetons.pop(joueur.jeton, None)
+            self.serveur.sessions.pop(joueur.jeton, None)
+
+
+    def verifier_occupation(self):
+        # Met à jour le lobby après un départ ; une partie sans aucun joueur, même en attente de reprise, disparaît
+        if self.effectif.connectes or self.deconnectes:
+            self.serveur.lobby.mettre_a_jour(self)
+        elif not self.terminee:
+            # Une partie vide n'a plus de raison d'exister
+            self.terminee = True
+            self.serveur.stockage.enregistrer_fin(self.id_historique)
+            self.serveur.lobby.retirer(self)
+
+
+    def annoncer(self, message):
+        # Envoi un message d'information à tous les joueurs de la partie, d'après l'instantané de l'effectif
+        self.serveur.diffuser(self.destinataires, {"type": "INFO", "message": message})
+
+
+    def vider(self):
+        # Efface l'état de la partie, sous le verrou du jeu ; renvoie les sockets à fermer une fois le verrou rendu
+        sockets = list(self.effectif.connectes)
+        for client_socket in sockets:
+            self.serveur.oublier_client(client_socket)
+        with self.verrou_chat:
+            for joueur in self.effectif.joueurs.values():
+                joueur.seau = None  # Efface les limiteurs du chat
+        self.effectif.vider()  # Efface les joueurs, leurs scores et leurs choix
+        for jeton in self.jetons:
+            self.serveur.sessions.pop(jeton, None)  # Les jetons de reprise ne sont plus valables
+        self.jetons.clear()
+        for tache in self.deconnectes.values():
+            tache.cancel()
+        self.deconnectes.clear()
+        self.partie_en_cours = False  # Indique que la partie n'est plus en cours
+        self.choix_ouverts = False
+        self.annuler_echeances()
+        self.terminee = True
+        self.publier_annuaire()
+        return sockets
+
+
+    def fermer_connexions(self, sockets):
+        # Chaque connexion envoie ses messages en attente avant de se fermer
+        for client_socket in sockets:
+            self.serveur.fermer_connexion(client_socket)
+
+
+    def fermer(self):
+        # Ferme toutes les connexions de la partie et efface son état
+        with self.verrou:
+            sockets = self.vider()
+        self.fermer_connexions(sockets)
+
+
+    def clore(self):
+        # Fin de partie, sous le verrou du jeu : prévient les joueurs et efface l'état
+        self.annoncer("La partie est terminée.")
+        return self.vider()
+
+
+    def liberer(self, sockets):
+        # Suite de clore, hors de tout verrou : ferme les connexions et libère la salle
+        self.fermer_connexions(sockets)
+        self.serveur.lobby.retirer(self)
+        print(f"Partie {self.identifiant} terminée.")
+
+
+    def terminer(self):
+        # Termine la partie : prévient les joueurs, ferme leurs connexions et libère la salle
+        with self.verrou:
+            sockets = self.clore()
+        self.liberer(sockets)
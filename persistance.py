@@ -0,0 +1,260 @@
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+# Schéma de la base : les résultats par tour sont dénormalisés (partie, tour, instant) pour que
+# l'historique d'un joueur se lise par un seul parcours d'index, et les totaux de chaque joueur
+# sont tenus à jour à l'écriture pour que le classement ne parcoure jamais les résultats.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parties (
+    id INTEGER PRIMARY KEY,
+    salle INTEGER NOT NULL,
+    debut REAL NOT NULL,
+    fin REAL,
+    gagnant TEXT
+);
+CREATE TABLE IF NOT EXISTS tours (
+    partie INTEGER NOT NULL,
+    numero INTEGER NOT NULL,
+    instant REAL NOT NULL,
+    taille_grille INTEGER NOT NULL,
+    position_chat INTEGER NOT NULL,
+    PRIMARY KEY (partie, numero)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS resultats (
+    partie INTEGER NOT NULL,
+    numero INTEGER NOT NULL,
+    joueur TEXT NOT NULL,
+    choix INTEGER,
+    ecart INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    instant REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resultats_joueur ON resultats (joueur, instant);
+CREATE INDEX IF NOT EXISTS resultats_partie ON resultats (partie, numero);
+CREATE TABLE IF NOT EXISTS eliminations (
+    partie INTEGER NOT NULL,
+    numero INTEGER NOT NULL,
+    joueur TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    instant REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS eliminations_joueur ON eliminations (joueur, instant);
+CREATE TABLE IF NOT EXISTS chat (
+    partie INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    instant REAL NOT NULL,
+    ligne TEXT NOT NULL,
+    PRIMARY KEY (partie, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS joueurs (
+    nom TEXT PRIMARY KEY,
+    tours INTEGER NOT NULL DEFAULT 0,
+    points INTEGER NOT NULL DEFAULT 0,
+    victoires INTEGER NOT NULL DEFAULT 0,
+    eliminations INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS joueurs_victoires ON joueurs (victoires DESC, points DESC);
+CREATE INDEX IF NOT EXISTS joueurs_points ON joueurs (points DESC);
+"""
+
+INSERER_PARTIE = "INSERT INTO parties (id, salle, debut) VALUES (?, ?, ?)"
+TERMINER_PARTIE = "UPDATE parties SET fin = ?, gagnant = ? WHERE id = ?"
+INSERER_TOUR = "INSERT OR REPLACE INTO tours VALUES (?, ?, ?, ?, ?)"
+INSERER_RESULTAT = "INSERT INTO resultats VALUES (?, ?, ?, ?, ?, ?, ?)"
+CUMULER_RESULTAT = ("INSERT INTO joueurs (nom, tours, points) VALUES (?, 1, ?) "
+                    "ON CONFLICT (nom) DO UPDATE SET tours = tours + 1, points = points + excluded.points")
+INSERER_ELIMINATION = "INSERT INTO eliminations VALUES (?, ?, ?, ?, ?)"
+CUMULER_ELIMINATION = ("INSERT INTO joueurs (nom, eliminations) VALUES (?, 1) "
+                       "ON CONFLICT (nom) DO UPDATE SET eliminations = eliminations + 1")
+CUMULER_VICTOIRE = ("INSERT INTO joueurs (nom, victoires) VALUES (?, 1) "
+                    "ON CONFLICT (nom) DO UPDATE SET victoires = victoires + 1")
+INSERER_CHAT = "INSERT OR REPLACE INTO chat VALUES (?, ?, ?, ?)"
+
+# Critères de classement acceptés, avec l'ordre correspondant (servi par un index de joueurs)
+CLASSEMENTS = {
+    "victoires": "victoires DESC, points DESC",
+    "points": "points DESC",
+}
+
+
+def ouvrir(chemin):
+    # Connexion SQLite en mode WAL : les lectures ne bloquent pas l'écrivain, et plusieurs
+    # processus (mode grappe) peuvent partager le même fichier
+    connexion = sqlite3.connect(chemin, timeout=30.0, check_same_thread=False)
+    connexion.execute("PRAGMA journal_mode=WAL")
+    connexion.execute("PRAGMA synchronous=NORMAL")
+    return connexion
+
+
+class EcrivainLots(threading.Thread):
+    # Thread unique qui écrit dans la base : les parties déposent leurs requêtes dans une file sans
+    # jamais attendre le disque, et l'écrivain les applique par lots, dans une transaction par lot.
+    def __init__(self, connexion, taille_lot=5000, periode=0.2):
+        super().__init__(daemon=True)
+        self.connexion = connexion
+        self.taille_lot = taille_lot  # Requêtes au plus par transaction
+        self.periode = periode  # Attente maximale avant l'écriture d'un lot incomplet, en secondes
+        self.file = queue.SimpleQueue()  # Requêtes (sql, paramètres) en attente ; None demande l'arrêt
+        self.ecrites = 0  # Requêtes écrites depuis le démarrage
+        self.lots = 0  # Transactions validées
+
+
+    def ajouter(self, requete, parametres):
+        self.file.put((requete, parametres))
+
+
+    def run(self):
+        fin = False
+        while not fin:
+            premiere = self.file.get()
+            if premiere is None:
+                break
+            lot = [premiere]
+            echeance = time.monotonic() + self.periode
+            # Accumule jusqu'à remplir le lot ou atteindre l'échéance
+            while len(lot) < self.taille_lot:
+                attente = echeance - time.monotonic()
+                try:
+                    requete = self.file.get(timeout=attente) if attente > 0 else self.file.get_nowait()
+                except queue.Empty:
+                    break
+                if requete is None:
+                    fin = True
+                    break
+                lot.append(requete)
+            self.ecrire(lot)
+
+
+    def ecrire(self, lot):
+        # Les requêtes consécutives identiques passent en un seul executemany ; l'ordre est conservé
+        try:
+            with self.connexion:
+                debut = 0
+                while debut < len(lot):
+                    requete = lot[debut][0]
+                    fin = debut + 1
+                    while fin < len(lot) and lot[fin][0] == requete:
+                        fin += 1
+                    self.connexion.executemany(requete, [parametres for _, parametres in lot[debut:fin]])
+                    debut = fin
+            self.ecrites += len(lot)
+            self.lots += 1
+        except sqlite3.Error as e:
+            print(f"Erreur lors de l'écriture de l'historique: {e}")
+
+
+    def arreter(self):
+        # Écrit ce qui reste dans la file, puis arrête le thread
+        self.file.put(None)
+        self.join()
+
+
+class Stockage:
+    # Historique persistant des parties, tours, éliminations et lignes de chat, avec classement
+    actif = True
+
+    def __init__(self, chemin="chat_paresseux.db", taille_lot=5000, periode=0.2):
+        self.chemin = chemin
+        connexion = ouvrir(chemin)
+        connexion.executescript(SCHEMA)
+        self.ecrivain = EcrivainLots(connexion, taille_lot, periode)
+        self.ecrivain.start()
+        self.lecture = ouvrir(chemin)  # Connexion réservée aux requêtes de consultation
+        self.verrou_lecture = threading.Lock()
+        self.rng = random.SystemRandom()
+
+
+    def nouvelle_partie(self, salle):
+        # Enregistre une partie et renvoie son identifiant dans l'historique. Les identifiants de salle
+        # repartent de 1 à chaque démarrage : l'historique utilise des identifiants aléatoires sur 63 bits.
+        identifiant = self.rng.getrandbits(63)
+        self.ecrivain.ajouter(INSERER_PARTIE, (identifiant, salle, time.time()))
+        return identifiant
+
+
+    def enregistrer_tour(self, partie, numero, taille_grille, position_chat, resultats):
+        # resultats : (joueur, choix, écart, score après le tour) de chaque joueur
+        instant = time.time()
+        self.ecrivain.ajouter(INSERER_TOUR, (partie, numero, instant, taille_grille, position_chat))
+        for joueur, choix, ecart, score in resultats:
+            self.ecrivain.ajouter(INSERER_RESULTAT, (partie, numero, joueur, choix, ecart, score, instant))
+        for joueur, _, ecart, _ in resultats:
+            self.ecrivain.ajouter(CUMULER_RESULTAT, (joueur, ecart))
+
+
+    def enregistrer_elimination(self, partie, numero, joueur, score):
+        self.ecrivain.ajouter(INSERER_ELIMINATION, (partie, numero, joueur, score, time.time()))
+        self.ecrivain.ajouter(CUMULER_ELIMINATION, (joueur,))
+
+
+    def enregistrer_fin(self, partie, gagnant=None):
+        self.ecrivain.ajouter(TERMINER_PARTIE, (time.time(), gagnant, partie))
+        if gagnant is not None:
+            self.ecrivain.ajouter(CUMULER_VICTOIRE, (gagnant,))
+
+
+    def enregistrer_chat(self, partie, seq, ligne):
+        self.ecrivain.ajouter(INSERER_CHAT, (partie, seq, time.time(), ligne))
+
+
+    def consulter(self, requete, parametres=()):
+        with self.verrou_lecture:
+            return self.lecture.execute(requete, parametres).fetchall()
+
+
+    def classement(self, limite=10, critere="victoires"):
+        # Meilleurs joueurs : (nom, victoires, points, tours, éliminations)
+        return self.consulter(f"SELECT nom, victoires, points, tours, eliminations FROM joueurs "
+                              f"ORDER BY {CLASSEMENTS[critere]} LIMIT ?", (limite,))
+
+
+    def historique_joueur(self, joueur, limite=20):
+        # Derniers tours d'un joueur, du plus récent au plus ancien : (instant, partie, tour, choix, écart, score)
+        return self.consulter("SELECT instant, partie, numero, choix, ecart, score FROM resultats "
+                              "WHERE joueur = ? ORDER BY instant DESC LIMIT ?", (joueur, limite))
+
+
+    def fermer(self):
+        # Vide la file d'écriture et ferme la base
+        self.ecrivain.arreter()
+        self.ecrivain.connexion.close()
+        self.lecture.close()
+
+
+class StockageInactif:
+    # Même interface que Stockage quand l'historique n'est pas conservé
+    actif = False
+
+    def nouvelle_partie(self, salle):
+        return None
+
+
+    def enregistrer_tour(self, partie, numero, taille_grille, position_chat, resultats):
+        pass
+
+
+    def enregistrer_elimination(self, partie, numero, joueur, score):
+        pass
+
+
+    def enregistrer_fin(self, partie, gagnant=None):
+        pass
+
+
+    def enregistrer_chat(self, partie, seq, ligne):
+        pass
+
+
+    def classement(self, limite=10, critere="victoires"):
+        return []
+
+
+    def historique_joueur(self, joueur, limite=20):
+        return []
+
+
+    def fermer(self):
+        pass
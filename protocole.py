@@ -0,0 +1,139 @@
+import json
+import struct
+
+# Chaque message circule sous la forme d'une trame : 4 octets (big-endian) donnant
+# la longueur du contenu, suivis du contenu JSON encodé en UTF-8.
+# Un client peut aussi négocier l'encodage binaire, où les messages les plus fréquents
+# (DEBUT_TOUR, CHOIX, SCORES) sont des structures de taille fixe. Un contenu JSON commence
+# toujours par "{", un contenu binaire par son code de type : les deux formats cohabitent
+# dans un même flux sans état.
+EN_TETE = struct.Struct('!I')
+TAILLE_EN_TETE = EN_TETE.size
+# Taille maximale acceptée pour une trame, pour éviter qu'un pair malveillant
+# ne nous fasse allouer un tampon démesuré
+TAILLE_TRAME_MAX = 1024 * 1024
+# Taille des lectures sur le socket : une seule lecture peut ramener plusieurs trames
+TAILLE_LECTURE = 65536
+
+# Encodages proposés par le client dans NOM, et celui retenu par le serveur dans PARTIE
+ENCODAGE_JSON = "json"
+ENCODAGE_BINAIRE = "binaire"
+# Codes de type des messages binaires
+CODE_DEBUT_TOUR = 1
+CODE_CHOIX = 2
+CODE_SCORES = 3
+DEBUT_TOUR_BINAIRE = struct.Struct('!BHH')  # Code, position du chat, taille de la grille
+CHOIX_BINAIRE = struct.Struct('!BH')  # Code, position choisie
+SCORES_BINAIRE = struct.Struct('!BHH')  # Code, position du chat, nombre de joueurs
+SCORE_JOUEUR = struct.Struct('!Hi')  # Identifiant du joueur, score
+
+
+class ErreurProtocole(Exception):
+    # Levée lorsqu'un flux reçu ne respecte pas le format des trames
+    pass
+
+
+def encoder_message(message):
+    # Sérialise un message et le préfixe de sa longueur
+    contenu = json.dumps(message).encode('utf-8')
+    return EN_TETE.pack(len(contenu)) + contenu
+
+
+def encoder_binaire(message, identifiants=None):
+    # Trame binaire d'un message, ou trame JSON s'il n'a pas de forme binaire.
+    # identifiants associe à chaque nom de joueur son identifiant (annoncé par un message JOUEURS).
+    type_message = message.get("type", message.get("action"))
+    if type_message == "DEBUT_TOUR":
+        contenu = DEBUT_TOUR_BINAIRE.pack(CODE_DEBUT_TOUR, message["position_chat"], message["taille_grille"])
+    elif type_message == "CHOIX":
+        contenu = CHOIX_BINAIRE.pack(CODE_CHOIX, message["position"])
+    elif type_message == "SCORES" and identifiants is not None:
+        scores = message["scores"]
+        valeurs = [CODE_SCORES, message["position_chat"], len(scores)]
+        for nom, score in scores.items():
+            valeurs.append(identifiants[nom])
+            valeurs.append(score)
+        # Un seul pack pour toute la trame ; struct garde en cache les formats déjà compilés
+        contenu = struct.pack(SCORES_BINAIRE.format + SCORE_JOUEUR.format[1:] * len(scores), *valeurs)
+    else:
+        return encoder_message(message)
+    return EN_TETE.pack(len(contenu)) + contenu
+
+
+def decoder_binaire(contenu, noms_joueurs):
+    # Reconstitue le message d'une trame binaire ; noms_joueurs associe à chaque identifiant son nom
+    try:
+        code = contenu[0]
+        if code == CODE_DEBUT_TOUR:
+            _, position, taille = DEBUT_TOUR_BINAIRE.unpack(contenu)
+            return {"type": "DEBUT_TOUR", "position_chat": position, "taille_grille": taille}
+        if code == CODE_CHOIX:
+            _, position = CHOIX_BINAIRE.unpack(contenu)
+            return {"action": "CHOIX", "position": position}
+        if code == CODE_SCORES:
+            _, position, nombre = SCORES_BINAIRE.unpack_from(contenu)
+            if len(contenu) != SCORES_BINAIRE.size + nombre * SCORE_JOUEUR.size:
+                raise ErreurProtocole("Trame SCORES de taille incorrecte")
+            scores = {}
+            for identifiant, score in SCORE_JOUEUR.iter_unpack(contenu[SCORES_BINAIRE.size:]):
+                scores[noms_joueurs[identifiant]] = score
+            # Même forme que le message JSON, où la position du chat figure deux fois
+            return {"type": "SCORES", "position_chat": position, "scores": scores, "chat_position": position}
+    except (IndexError, struct.error) as e:
+        raise ErreurProtocole(f"Trame binaire illisible : {e}")
+    except KeyError as e:
+        raise ErreurProtocole(f"Identifiant de joueur inconnu : {e}")
+    raise ErreurProtocole(f"Type de trame binaire inconnu : {code}")
+
+
+def encoder_messages(messages):
+    # Concatène plusieurs trames pour les envoyer en un seul appel à sendall
+    return b''.join(encoder_message(message) for message in messages)
+
+
+class DecodeurFlux:
+    # Décodeur incrémental : accumule les octets reçus et restitue les messages complets,
+    # qu'ils soient en JSON ou en binaire
+    def __init__(self, taille_max=TAILLE_TRAME_MAX):
+        self.tampon = bytearray()  # Tampon de lecture propre à la connexion
+        self.taille_max = taille_max  # Taille maximale d'une trame
+        self.noms_joueurs = {}  # Nom de chaque identifiant de joueur, d'après le dernier message JOUEURS
+
+
+    def alimenter(self, donnees):
+        # Ajoute des octets reçus et renvoie la liste des messages complets décodés
+        self.tampon += donnees
+        messages = []
+        debut = 0
+        fin_tampon = len(self.tampon)
+        while fin_tampon - debut >= TAILLE_EN_TETE:
+            (longueur,) = EN_TETE.unpack_from(self.tampon, debut)
+            if longueur > self.taille_max:
+                raise ErreurProtocole(f"Trame trop grande : {longueur} octets")
+            fin_trame = debut + TAILLE_EN_TETE + longueur
+            if fin_trame > fin_tampon:
+                break  # Trame incomplète : on attend la suite
+            contenu = bytes(self.tampon[debut + TAILLE_EN_TETE:fin_trame])
+            if contenu[:1] == b'{':
+                try:
+                    message = json.loads(contenu.decode('utf-8'))
+                except ValueError as e:
+                    raise ErreurProtocole(f"Trame illisible : {e}")
+                if message.get("type") == "JOUEURS":
+                    self.noms_joueurs = {identifiant: nom for nom, identifiant in message["joueurs"].items()}
+            else:
+                message = decoder_binaire(contenu, self.noms_joueurs)
+            messages.append(message)
+            debut = fin_trame
+        # Supprime en une fois les octets déjà consommés
+        if debut:
+            del self.tampon[:debut]
+        return messages
+
+
+def recevoir_messages(sock, decodeur):
+    # Lit le socket une fois et renvoie les messages complets, ou None si la connexion est fermée
+    donnees = sock.recv(TAILLE_LECTURE)
+    if not donnees:
+        return None
+    return decodeur.alimenter(donnees)
@@ -0,0 +1,68 @@
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # NumPy est facultatif : le calcul en Python pur reste disponible
+
+# Points gagnés ou perdus à chaque tour
+POINTS_EXACT = 10  # Case du chat
+POINTS_VOISIN = 2  # Case voisine du chat (même ligne ou même colonne, à une case)
+POINTS_RATE = -1  # Autre case, ou pas de choix avant l'échéance
+# En dessous de ce nombre de joueurs, la conversion vers NumPy coûte plus que la boucle Python
+SEUIL_VECTORISATION = 128
+
+
+def generer_position_chat(taille_grille, rng=random):
+    # Position aléatoire (ligne, colonne) du chat dans la grille
+    return rng.randint(0, taille_grille - 1), rng.randint(0, taille_grille - 1)
+
+
+def joueurs_elimines(scores_joueurs):
+    # Joueurs dont le score est inférieur ou égal à 0 à la fin d'un tour
+    return [nom for nom, score in scores_joueurs.items() if score <= 0]
+
+
+def ecarts_scores(positions, taille_grille, position_chat):
+    # Variation de score de chaque joueur, dans l'ordre de positions (None pour un forfait)
+    chat_x, chat_y = position_chat
+    ecarts = []
+    for position in positions:
+        if position is None:
+            ecarts.append(POINTS_RATE)
+            continue
+        joueur_x, joueur_y = divmod(position, taille_grille)
+        # Attribution des points en fonction de la proximité du choix avec la position du chat
+        if (joueur_x, joueur_y) == (chat_x, chat_y):
+            ecarts.append(POINTS_EXACT)
+        elif (abs(joueur_x - chat_x) == 1 and joueur_y == chat_y) or \
+             (abs(joueur_y - chat_y) == 1 and joueur_x == chat_x):
+            ecarts.append(POINTS_VOISIN)
+        else:
+            ecarts.append(POINTS_RATE)
+    return ecarts
+
+
+def ecarts_scores_vectorises(positions, taille_grille, position_chat, forfaits=None):
+    # Même calcul qu'ecarts_scores en une passe NumPy : positions est un tableau d'entiers,
+    # forfaits un tableau booléen facultatif marquant les joueurs sans choix
+    chat_x, chat_y = position_chat
+    joueurs_x, joueurs_y = numpy.divmod(positions, taille_grille)
+    # Voisin orthogonal : exactement une case d'écart au total sur les deux axes
+    distances = numpy.abs(joueurs_x - chat_x) + numpy.abs(joueurs_y - chat_y)
+    ecarts = numpy.full(distances.shape, POINTS_RATE, dtype=numpy.int64)
+    ecarts[distances == 1] = POINTS_VOISIN
+    ecarts[distances == 0] = POINTS_EXACT
+    if forfaits is not None:
+        ecarts[forfaits] = POINTS_RATE
+    return ecarts
+
+
+def calculer_ecarts(positions, taille_grille, position_chat):
+    # Variations de score d'une liste de choix, vectorisées si NumPy est disponible et que la liste est longue
+    if numpy is None or len(positions) < SEUIL_VECTORISATION:
+        return ecarts_scores(positions, taille_grille, position_chat)
+    forfaits = numpy.fromiter((position is None for position in positions), dtype=bool, count=len(positions))
+    tableau = numpy.fromiter((0 if position is None else position for position in positions),
+                             dtype=numpy.int64, count=len(positions))
+    return ecarts_scores_vectorises(tableau, taille_grille, position_chat, forfaits).tolist()
@@ -0,0 +1,196 @@
+import argparse
+import collections
+import contextlib
+import hashlib
+import heapq
+import io
+import itertools
+import random
+import time
+
+from enregistreur import CONNEXION, DECONNEXION, JETON, MESSAGE, EnregistreurInactif, lire_sessions
+from ordonnanceur import Tache
+from server import Serveur
+
+# Temps virtuel laissé aux délais en cours (fin de tour, choix, reprise) après le dernier événement
+DELAI_FINAL = 3600.0
+
+
+class OrdonnanceurVirtuel:
+    # Même interface que Ordonnanceur, mais sans thread : le temps n'avance que lorsque le rejeu le demande,
+    # et les tâches échues s'exécutent dans l'ordre de leurs échéances, entre deux événements enregistrés
+    def __init__(self):
+        self.tas = []  # Entrées (échéance, numéro, tâche)
+        self.compteur = itertools.count()
+        self.instant = 0.0  # Temps virtuel, en secondes depuis le début de la session
+
+
+    def maintenant(self):
+        return self.instant
+
+
+    def planifier(self, delai, fonction, *args):
+        tache = Tache(self.instant + delai, fonction, args)
+        heapq.heappush(self.tas, (tache.echeance, next(self.compteur), tache))
+        return tache
+
+
+    def avancer(self, instant):
+        # Exécute toutes les tâches échues jusqu'à instant, y compris celles qu'elles planifient elles-mêmes
+        while self.tas and self.tas[0][0] <= instant:
+            echeance, _, tache = heapq.heappop(self.tas)
+            self.instant = max(self.instant, echeance)
+            if tache.annulee:
+                continue
+            try:
+                tache.fonction(*tache.args)
+            except Exception as e:
+                print(f"Erreur dans une tâche planifiée: {e}")
+        self.instant = max(self.instant, instant)
+
+
+    def arreter(self):
+        self.tas.clear()
+
+
+class ConnexionMemoire:
+    # Remplace Connexion : les trames ne sont pas envoyées, mais comptées et résumées dans une empreinte
+    def __init__(self):
+        self.binaire = False
+        self.fermee = False
+        self.trames = 0
+        self.octets = 0
+        self.empreinte = hashlib.blake2b(digest_size=16)
+
+
+    def envoyer(self, donnees, cle=None):
+        if self.fermee:
+            return
+        self.trames += 1
+        self.octets += len(donnees)
+        self.empreinte.update(donnees)
+
+
+    def fermer(self, immediat=False):
+        self.fermee = True
+
+
+class ClientRejeu:
+    # Tient lieu de socket : seule son identité compte pour le serveur
+    __slots__ = ('numero',)
+
+    def __init__(self, numero):
+        self.numero = numero
+
+
+class JetonsRejeu(EnregistreurInactif):
+    # Retient le dernier jeton remis à chaque client rejoué, pour traduire les jetons enregistrés
+    def __init__(self):
+        self.jetons = {}
+
+
+    def jeton(self, client_socket, jeton):
+        self.jetons[client_socket] = jeton
+
+
+class ServeurRejeu(Serveur):
+    # Logique du serveur sans réseau ni thread : les événements d'un enregistrement lui sont appliqués
+    # un par un, et le temps des délais est virtuel. Avec la même graine, le rejeu est déterministe.
+    def __init__(self, entete):
+        super().__init__(graine=entete["graine"], premier_identifiant=entete["premier_identifiant"],
+                         pas_identifiant=entete["pas_identifiant"], delai_ping=None, **entete["parametres"])
+        self.ordonnanceur = OrdonnanceurVirtuel()
+        self.horloge = self.ordonnanceur.maintenant
+        self.enregistreur = JetonsRejeu()
+        self.rng_jetons = random.Random(entete["graine"])  # Jetons reproductibles d'un rejeu à l'autre
+        self.clients_rejeu = {}  # Client de chaque numéro de connexion
+        self.memoires = {}  # Connexion en mémoire de chaque numéro, gardée après la déconnexion
+        self.traduction = {}  # Jeton du rejeu correspondant à chaque jeton enregistré
+        self.types_envoyes = collections.Counter()  # Messages envoyés par type
+
+
+    def creer_jeton(self, partie):
+        return f"{partie.identifiant}.{self.rng_jetons.getrandbits(96):024x}"
+
+
+    def envoyer_message_par_socket(self, client_socket, message, cle=None, identifiants=None):
+        self.types_envoyes[message.get("type")] += 1
+        super().envoyer_message_par_socket(client_socket, message, cle, identifiants)
+
+
+    def diffuser(self, sockets, message, cle=None, identifiants=None):
+        self.types_envoyes[message.get("type")] += len(sockets)
+        super().diffuser(sockets, message, cle, identifiants)
+
+
+    def appliquer(self, numero, type_evenement, contenu):
+        # Applique un événement enregistré, comme l'aurait fait le thread de lecture de la connexion
+        if type_evenement == CONNEXION:
+            client = self.clients_rejeu[numero] = ClientRejeu(numero)
+            self.connexions[client] = self.memoires[numero] = ConnexionMemoire()
+            return
+        client = self.clients_rejeu.get(numero)
+        if client is None:
+            return
+        if type_evenement == MESSAGE:
+            if contenu.get("action") == "REPRISE":
+                contenu = dict(contenu, jeton=self.traduction.get(contenu.get("jeton"), contenu.get("jeton")))
+            try:
+                self.traiter_action(client, contenu)
+            except Exception as e:
+                # Comme en production : le message fautif est perdu, la déconnexion suit dans l'enregistrement
+                print(f"Erreur lors du traitement d'un message rejoué: {e!r}")
+        elif type_evenement == JETON:
+            self.traduction[contenu] = self.enregistreur.jetons.get(client)
+        elif type_evenement == DECONNEXION:
+            self.retirer_joueur(client)
+            self.connexions.pop(client, None)
+            del self.clients_rejeu[numero]
+
+
+    def empreinte(self):
+        # Résumé de tout ce que le serveur a envoyé, connexion par connexion : deux rejeux d'un même
+        # enregistrement doivent donner la même empreinte, sauf changement de comportement du serveur
+        empreinte = hashlib.blake2b(digest_size=16)
+        for numero in sorted(self.memoires):
+            empreinte.update(numero.to_bytes(8, "big") + self.memoires[numero].empreinte.digest())
+        return empreinte.hexdigest()
+
+
+def rejouer(entete, evenements, vitesse=None):
+    # Rejoue une session ; vitesse=None va aussi vite que possible, vitesse=1.0 respecte les instants enregistrés
+    serveur = ServeurRejeu(entete)
+    debut = time.perf_counter()
+    for instant, numero, type_evenement, contenu in evenements:
+        if vitesse:
+            attente = debut + instant / vitesse - time.perf_counter()
+            if attente > 0:
+                time.sleep(attente)
+        serveur.ordonnanceur.avancer(instant)
+        serveur.appliquer(numero, type_evenement, contenu)
+    dernier = evenements[-1][0] if evenements else 0.0
+    serveur.ordonnanceur.avancer(dernier + DELAI_FINAL)
+    return serveur, time.perf_counter() - debut
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Rejoue une session enregistrée avec Serveur(enregistrement=...)")
+    parseur.add_argument("enregistrement")
+    parseur.add_argument("--session", type=int, default=-1, help="session du fichier à rejouer (la dernière par défaut)")
+    parseur.add_argument("--vitesse", type=float, default=None,
+                         help="1 pour la vitesse d'origine, 2 pour deux fois plus vite ; aussi vite que possible par défaut")
+    parseur.add_argument("--verbeux", action="store_true", help="affiche les messages du serveur")
+    arguments = parseur.parse_args()
+    entete, evenements = lire_sessions(arguments.enregistrement)[arguments.session]
+    sortie = contextlib.nullcontext() if arguments.verbeux else contextlib.redirect_stdout(io.StringIO())
+    with sortie:
+        serveur, duree = rejouer(entete, evenements, arguments.vitesse)
+    messages = sum(1 for evenement in evenements if evenement[2] == MESSAGE)
+    duree_enregistree = evenements[-1][0] if evenements else 0.0
+    print(f"{len(evenements):,} événements ({messages:,} messages) sur {duree_enregistree:.1f} s, "
+          f"rejoués en {duree:.3f} s ({len(evenements) / max(duree, 1e-9):,.0f} événements/s)")
+    memoires = serveur.memoires.values()
+    print(f"{len(serveur.memoires)} connexions, {sum(m.trames for m in memoires):,} trames, "
+          f"{sum(m.octets for m in memoires):,} octets envoyés")
+    print("Messages envoyés : " + ", ".join(f"{t} {n}" for t, n in sorted(serveur.types_envoyes.items(), key=str)))
+    print(f"Empreinte : {serveur.empreinte()}")
@@ -0,0 +1,67 @@
+import os
+import select
+import socket
+import subprocess
+import sys
+
+# Relève d'un processus serveur par un autre, pour un redéploiement sans refuser de connexion : le processus
+# en place relance sa propre commande, et le nouveau processus hérite des sockets d'écoute déjà liés au lieu
+# de les recréer. La file des connexions en attente d'acceptation est celle du socket partagé : rien n'est
+# perdu entre les deux. Le nouveau processus annonce qu'il accepte les connexions par un tube, puis l'ancien
+# s'arrête en douceur.
+
+# Variables d'environnement du nouveau processus : ses sockets hérités ("nom=descripteur,...") et le tube
+# où il annonce qu'il est prêt
+VARIABLE_SOCKETS = "CHAT_PARESSEUX_SOCKETS"
+VARIABLE_PRET = "CHAT_PARESSEUX_PRET"
+# Attente maximale du nouveau processus, en secondes ; au-delà, l'ancien continue de servir
+DELAI_SUCCESSEUR = 10.0
+
+
+def sockets_herites():
+    # Sockets transmis par le processus précédent, par nom. Les variables sont retirées de l'environnement
+    # pour que les processus lancés ensuite (ouvriers de la grappe, futur successeur) ne les reprennent pas.
+    valeur = os.environ.pop(VARIABLE_SOCKETS, "")
+    sockets = {}
+    for entree in filter(None, valeur.split(",")):
+        nom, _, descripteur = entree.partition("=")
+        sockets[nom] = socket.socket(fileno=int(descripteur))
+    return sockets
+
+
+def annoncer_pret():
+    # Prévient le processus précédent que celui-ci accepte les connexions ; sans effet au premier démarrage
+    descripteur = os.environ.pop(VARIABLE_PRET, None)
+    if descripteur is None:
+        return
+    try:
+        os.write(int(descripteur), b'1')
+    except OSError:
+        pass  # Le processus précédent a déjà abandonné la relève
+    finally:
+        os.close(int(descripteur))
+
+
+def lancer_successeur(sockets, delai=DELAI_SUCCESSEUR):
+    # Relance la commande de ce processus en lui transmettant les sockets (nom -> socket) ; renvoie le
+    # nouveau processus dès qu'il est prêt, ou lève OSError s'il ne l'est pas dans le délai
+    lecture, ecriture = os.pipe()
+    descripteurs = {nom: sock.fileno() for nom, sock in sockets.items()}
+    environnement = dict(os.environ)
+    environnement[VARIABLE_SOCKETS] = ",".join(f"{nom}={fd}" for nom, fd in descripteurs.items())
+    environnement[VARIABLE_PRET] = str(ecriture)
+    try:
+        processus = subprocess.Popen(sys.orig_argv, env=environnement,
+                                     pass_fds=(*descripteurs.values(), ecriture))
+    finally:
+        os.close(ecriture)
+    try:
+        # Le tube se ferme sans rien transmettre si le nouveau processus meurt avant d'être prêt
+        prets, _, _ = select.select([lecture], [], [], delai)
+        if not prets or os.read(lecture, 1) != b'1':
+            processus.kill()
+            processus.wait()
+            raise OSError(f"le nouveau processus n'a pas démarré (code {processus.returncode})")
+    finally:
+        os.close(lecture)
+    return processus
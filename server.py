@@ -1,290 +1,475 @@
-import socket
 import random
-import json
+import secrets
+import selectors
+import signal
+import socket
 import threading
 import time
+from connexion import Connexion, activer_keepalive
+from enregistreur import Enregistreur, EnregistreurInactif
+from faucheur import Faucheur, FaucheurInactif
+from lobby import Lobby
+from metriques import Metriques, MetriquesInactives, ServeurAdmin
+from ordonnanceur import Ordonnanceur
+from persistance import Stockage, StockageInactif
+from protocole import (ENCODAGE_BINAIRE, ENCODAGE_JSON, DecodeurFlux, ErreurProtocole, encoder_binaire,
+                       encoder_message, recevoir_messages)
+from releve import annoncer_pret, lancer_successeur, sockets_herites
+from spectateurs import DiffuseurSpectateurs
 
 class Serveur:
-    def __init__(self, hote='127.0.0.2', port=10002, taille_grille_min=3, taille_grille_max=10, points_depart=10):
+    def __init__(self, hote='127.0.0.2', port=10002, taille_grille_min=3, taille_grille_max=10, points_depart=10, joueurs_max=10,
+                 taille_file_envoi=1024 * 1024, delai_retard=5.0, taille_historique_chat=100,
+                 chat_debit=5.0, chat_rafale=10, chat_fenetre=0.005,
+                 delai_choix=30.0, delai_pret=60.0, delai_fin_tour=3.0, delai_reprise=30.0,
+                 metriques=False, hote_admin='127.0.0.1', port_admin=9102, premier_identifiant=1, pas_identifiant=1,
+                 base_donnees=None, periode_spectateurs=0.25, lignes_chat_spectateurs=20, graine=None,
+                 enregistrement=None, delai_ping=20.0, delai_pong=10.0, keepalive=True, delai_arret=5.0):
         # Initialisation du serveur avec des paramètres par défaut
         self.hote = hote  # Adresse IP du serveur
         self.port = port  # Port du serveur
         self.taille_grille_min = taille_grille_min  # Taille minimale de la grille de jeu
         self.taille_grille_max = taille_grille_max  # Taille maximale de la grille de jeu
-        # Génération aléatoire de la taille de la grille pour la partie actuelle
-        self.taille_grille = random.randint(self.taille_grille_min, self.taille_grille_max)
         self.points_depart = points_depart  # Points de départ pour chaque joueur
-        # Création d'un socket TCP/IP pour le serveur
+        self.joueurs_max = joueurs_max  # Nombre maximal de joueurs par partie
+        self.taille_file_envoi = taille_file_envoi  # Octets en attente tolérés par client
+        self.delai_retard = delai_retard  # Durée tolérée avec une file d'envoi pleine avant déconnexion
+        self.keepalive = keepalive  # Active les sondes TCP keepalive sur les connexions acceptées
+        self.delai_arret = delai_arret  # Temps laissé aux clients pour recevoir leurs derniers messages à l'arrêt
+        # Métriques (compteurs et histogrammes) ; désactivées, elles ne coûtent qu'un appel de méthode vide
+        self.metriques = Metriques() if metriques else MetriquesInactives()
+        self.hote_admin = hote_admin  # Adresse du point d'accès HTTP des métriques
+        self.port_admin = port_admin  # Port du point d'accès HTTP des métriques
+        self.serveur_admin = None  # Démarré avec le serveur si les métriques sont activées
+        # Historique persistant (tours, éliminations, chat) dans une base SQLite, si base_donnees est donné
+        self.stockage = Stockage(base_donnees) if base_donnees else StockageInactif()
+        # Graine dont chaque partie dérive son propre générateur aléatoire ; tirée au hasard si elle n'est
+        # pas donnée, et conservée dans l'enregistrement pour rejouer les mêmes grilles et positions du chat
+        self.graine = graine if graine is not None else random.SystemRandom().getrandbits(63)
+        # Horloge des délais qui ne passent pas par l'ordonnanceur (limiteur du chat) ; virtuelle au rejeu
+        self.horloge = time.monotonic
+        # Création d'un socket TCP/IP pour le serveur ; remplacé par le socket hérité lors d'une relève
         self.socket_serveur = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.clients = {}  # Dictionnaire pour stocker les sockets des clients
-        self.noms_clients = {}  # Dictionnaire pour stocker les noms des clients
-        self.scores_joueurs = {}  # Dictionnaire pour stocker les scores des joueurs
-        self.choix_joueurs = {}  # Dictionnaire pour stocker les choix des joueurs
-        self.position_chat = self.generer_position_chat()  # Génération de la position initiale du chat
-        self.historique_chat = []  # Liste pour stocker l'historique du chat
-        self.verrou = threading.Lock()  # Verrou pour gérer l'accès concurrent aux ressources partagées
-        self.joueurs_prets = set()  # Ensemble pour stocker les joueurs qui sont prêts
-        self.partie_demarree = False  # Indicateur de début de partie
-        self.partie_en_cours = False  # Indicateur de partie en cours
-        self.premier_tour_passe = False  # Indicateur pour vérifier si le premier tour est passé
-
-        
-    def generer_position_chat(self):
-        # Génération aléatoire de la position du chat dans la grille
-        return random.randint(0, self.taille_grille - 1), random.randint(0, self.taille_grille - 1)
-    
+        # Arrêt demandé (signal, relève) : la boucle d'acceptation s'arrête, puis le serveur se vide
+        self.arret_demande = False
+        self.reveil = None  # Socket qui réveille la boucle d'acceptation, créé avec elle
+        self.releve_en_cours = False
+        # Lobby hébergeant les parties ; chaque partie possède son état et son propre verrou
+        self.lobby = Lobby(self, taille_grille_min=taille_grille_min, taille_grille_max=taille_grille_max,
+                           points_depart=points_depart, joueurs_max=joueurs_max,
+                           taille_historique_chat=taille_historique_chat, chat_debit=chat_debit,
+                           chat_rafale=chat_rafale, chat_fenetre=chat_fenetre, delai_choix=delai_choix,
+                           delai_pret=delai_pret, delai_fin_tour=delai_fin_tour, delai_reprise=delai_reprise,
+                           premier_identifiant=premier_identifiant, pas_identifiant=pas_identifiant)
+        # Enregistrement du trafic entrant dans le fichier enregistrement, avec ce qu'il faut pour le rejouer
+        if enregistrement:
+            self.enregistreur = Enregistreur(enregistrement, {
+                "graine": self.graine, "premier_identifiant": premier_identifiant,
+                "pas_identifiant": pas_identifiant, "parametres": self.lobby.parametres_partie})
+        else:
+            self.enregistreur = EnregistreurInactif()
+        # Partie de chaque client placé. Chaque entrée n'est écrite que par le thread de son
+        # client ou à la fermeture de sa partie, donc sans verrou global.
+        self.parties_clients = {}
+        # Connexion (file d'envoi et thread écrivain) de chaque socket client
+        self.connexions = {}
+        # Partie de chaque jeton de reprise de session, écrit par les parties sous leur verrou
+        self.sessions = {}
+        # Un seul thread exécute les délais de toutes les parties
+        self.ordonnanceur = Ordonnanceur()
+        # Connexions silencieuses sondées par PING, puis coupées sans réponse ; désactivé si delai_ping est None
+        self.faucheur = Faucheur(self, delai_ping, delai_pong) if delai_ping else FaucheurInactif()
+        # Spectateurs : connexions en lecture seule, servies par instantanés périodiques
+        self.spectateurs = DiffuseurSpectateurs(self, periode_spectateurs, lignes_chat_spectateurs)
+        self.metriques.jauge("chat_paresseux_parties_actives", "Parties hébergées par le lobby",
+                             lambda: len(self.lobby.lister_parties()))
+        self.metriques.jauge("chat_paresseux_joueurs_actifs", "Joueurs placés dans une partie",
+                             lambda: len(self.parties_clients))
+        self.metriques.jauge("chat_paresseux_connexions_actives", "Connexions clientes ouvertes",
+                             lambda: len(self.connexions))
+        self.metriques.jauge("chat_paresseux_spectateurs", "Spectateurs rattachés à une partie",
+                             self.spectateurs.nombre)
+        self.metriques.jauge("chat_paresseux_connexions_sondees", "Connexions qui n'ont pas encore répondu au PING",
+                             self.faucheur.nombre_sondees)
+
 
     def demarrer_serveur(self):
         # Démarrage du serveur pour écouter les connexions entrantes
-        self.socket_serveur.bind((self.hote, self.port))  # Association du socket avec l'adresse IP et le port
-        self.socket_serveur.listen()  # Le serveur écoute les connexions entrantes
+        herites = sockets_herites()
+        self.ouvrir_ecoute(herites.get("ecoute"))
         print(f"Serveur en écoute sur l'adresse {self.hote} et sur le port {self.port}")
+        self.demarrer_admin(herites.get("admin"))
+        self.spectateurs.demarrer()
+        self.faucheur.demarrer()
+        self.installer_signaux()
+        annoncer_pret()
         self.accepter_connexions()  # Appel de la fonction pour accepter les connexions
 
 
+    def ouvrir_ecoute(self, socket_herite=None):
+        if socket_herite is not None:
+            # Relève : le socket du processus précédent écoute déjà, avec ses connexions en attente
+            self.socket_serveur.close()
+            self.socket_serveur = socket_herite
+            return
+        # SO_REUSEADDR : un redémarrage peut se lier au port malgré les connexions de l'ancien processus
+        self.socket_serveur.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket_serveur.bind((self.hote, self.port))  # Association du socket avec l'adresse IP et le port
+        self.socket_serveur.listen()  # Le serveur écoute les connexions entrantes
+
+
+    def demarrer_admin(self, socket_ecoute=None):
+        # Expose les métriques au format Prometheus sur http://hote_admin:port_admin/metrics
+        if not self.metriques.actif:
+            return
+        self.serveur_admin = ServeurAdmin(self.metriques, self.hote_admin, self.port_admin, socket_ecoute)
+        self.serveur_admin.start()
+        print(f"Métriques disponibles sur http://{self.hote_admin}:{self.port_admin}/metrics")
+
+
+    def installer_signaux(self):
+        # SIGTERM et SIGINT arrêtent le serveur en douceur, SIGUSR2 passe la main à un nouveau processus.
+        # Les signaux ne peuvent être détournés que depuis le thread principal.
+        if threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGTERM, lambda *_: self.demander_arret())
+        signal.signal(signal.SIGINT, lambda *_: self.demander_arret())
+        signal.signal(signal.SIGUSR2, lambda *_: self.lancer_releve())
+
+
     def accepter_connexions(self):
-        # Boucle infinie pour accepter les nouvelles connexions
+        # Accepte les nouvelles connexions jusqu'à une demande d'arrêt, puis arrête le serveur ;
+        # le placement dans une partie se fait à la réception du nom du joueur
+        selecteur = selectors.DefaultSelector()
+        self.reveil, reveil_lecture = socket.socketpair()
+        self.socket_serveur.setblocking(False)
+        selecteur.register(self.socket_serveur, selectors.EVENT_READ)
+        selecteur.register(reveil_lecture, selectors.EVENT_READ)
+        try:
+            while not self.arret_demande:
+                for cle, _ in selecteur.select():
+                    if cle.fileobj is self.socket_serveur:
+                        self.accepter_en_attente()
+        finally:
+            selecteur.close()
+            reveil_lecture.close()
+        self.arreter_serveur()
+
+
+    def accepter_en_attente(self):
+        # Accepte toutes les connexions déjà arrivées, pas seulement la première
         while True:
-            client_socket, _ = self.socket_serveur.accept()  # Accepte une nouvelle connexion
-            if self.partie_en_cours:
-                # Si une partie est déjà en cours, refuse la nouvelle connexion
-                print("Un joueur a tenté de se connecter pendant une partie en cours.")
-                message = json.dumps({"type": "INFO", "message": "Une partie est déjà en cours. Veuillez réessayer plus tard."})
-                try:
-                    client_socket.send(message.encode('utf-8'))  # Envoie un message au client
-                    time.sleep(1)  # Attendre un peu avant de fermer la connexion
-                finally:
-                    client_socket.close()  # Ferme la connexion avec le client
-            else:
-                # Si aucune partie n'est en cours, démarre un nouveau thread pour gérer le client
-                threading.Thread(target=self.gerer_client, args=(client_socket,)).start()
-
-
-    def gerer_client(self, client_socket):
+            try:
+                client_socket, _ = self.socket_serveur.accept()  # Accepte une nouvelle connexion
+            except (BlockingIOError, InterruptedError, ConnectionAbortedError):
+                return
+            client_socket.setblocking(True)
+            self.ajouter_client(client_socket)
+
+
+    def demander_arret(self):
+        # Appelable depuis un gestionnaire de signal ou un autre thread : réveille la boucle d'acceptation
+        self.arret_demande = True
+        if self.reveil is not None:
+            try:
+                self.reveil.send(b'\0')
+            except OSError:
+                pass
+
+
+    def lancer_releve(self):
+        # Gestionnaire de SIGUSR2 : la relève attend le nouveau processus dans un thread, pendant que
+        # celui-ci continue d'accepter les connexions
+        if not self.releve_en_cours and not self.arret_demande:
+            self.releve_en_cours = True
+            threading.Thread(target=self.passer_la_main, daemon=True).start()
+
+
+    def passer_la_main(self):
+        # Lance un nouveau processus avec les sockets d'écoute ; une fois qu'il accepte les connexions,
+        # celui-ci s'arrête en douceur
+        sockets = {"ecoute": self.socket_serveur}
+        if self.serveur_admin is not None:
+            sockets["admin"] = self.serveur_admin.serveur_http.socket
+        try:
+            processus = lancer_successeur(sockets)
+        except OSError as e:
+            print(f"Relève impossible, le serveur continue : {e}")
+            self.releve_en_cours = False
+            return
+        print(f"Le processus {processus.pid} a pris la relève.")
+        self.demander_arret()
+
+
+    def ajouter_client(self, client_socket, donnees_initiales=b''):
+        # Prend en charge une connexion acceptée ; donnees_initiales contient les octets déjà lus
+        # sur le socket (par le frontal du mode grappe)
+        if self.keepalive:
+            activer_keepalive(client_socket)
+        self.connexions[client_socket] = Connexion(client_socket, self, self.taille_file_envoi, self.delai_retard)
+        self.faucheur.suivre(client_socket)
+        self.enregistreur.connexion(client_socket)
+        # Démarre un nouveau thread pour gérer le client
+        threading.Thread(target=self.gerer_client, args=(client_socket, donnees_initiales)).start()
+
+
+    def gerer_client(self, client_socket, donnees_initiales=b''):
         # Fonction pour gérer la communication avec un client spécifique
+        decodeur = DecodeurFlux()  # Tampon de lecture propre à cette connexion
         try:
+            for message in decodeur.alimenter(donnees_initiales):
+                self.traiter_action(client_socket, message)
             while True:
-                # Boucle pour lire les messages du client
-                message = client_socket.recv(1024)  # Lecture d'un message du client
-                if not message:
-                    break  # Sortie de la boucle si aucun message n'est reçu
-                message = json.loads(message.decode('utf-8'))  # Décodage et interprétation du message JSON
-                action = message.get("action")  # Extraction de l'action demandée par le client
-
-                # Traitement de l'action demandée par le client
-                if action == "NOM":
-                    self.enregistrer_nom(client_socket, message["nom"])
-                elif action == "PRET":
-                    self.gerer_pret(client_socket)
-                elif action == "CHOIX":
-                    self.traiter_choix(client_socket, message["position"])
-                elif action == "CHAT":
-                    self.traiter_chat(message["text"], client_socket)
+                # Une lecture peut contenir plusieurs messages, ou seulement une partie d'un message
+                messages = recevoir_messages(client_socket, decodeur)
+                if messages is None:
+                    break  # Sortie de la boucle si la connexion est fermée
+                self.faucheur.signaler(client_socket)
+                for message in messages:
+                    self.traiter_action(client_socket, message)
         except socket.error as socket_error:
             # Gestion des erreurs de socket
             print(f"{socket_error}")
+        except ErreurProtocole as erreur_protocole:
+            # Flux corrompu : on ne peut plus se resynchroniser, la connexion est abandonnée
+            print(f"Erreur de protocole : {erreur_protocole}")
         finally:
             # Assure la déconnexion propre du client
             self.retirer_joueur(client_socket)
-
-
-    def enregistrer_nom(self, client_socket, nom_joueur):
-        # Enregistrement du nom du joueur et initialisation de son score et de son choix
-        with self.verrou:
-            # Utilisation d'un verrou pour éviter les conflits d'accès
-            self.clients[client_socket] = nom_joueur  # Enregistrement du socket client
-            self.noms_clients[nom_joueur] = client_socket  # Association du nom du joueur avec son socket
-            self.scores_joueurs[nom_joueur] = self.points_depart  # Initialisation du score du joueur
-            self.choix_joueurs[nom_joueur] = None  # Initialisation du choix du joueur
-            print(f"{nom_joueur} est connecté.")
-            # Envoi un message de bienvenue au joueur
-            message_bienvenue = "Il faut un minimum de 3 joueurs pour lancer le jeu. Cliquez juste sur prêt si oui, et patientez que la grille s'active, merci."
-            self.envoyer_message(nom_joueur, {"type": "INFO", "message": message_bienvenue})
-
-
-    def gerer_pret(self, client_socket):
-        # Gestion de l'état prêt d'un joueur
-        with self.verrou:
-            nom_joueur = self.clients[client_socket]
-            self.joueurs_prets.add(nom_joueur)  # Ajout du joueur à l'ensemble des joueurs prêts
-            
-            # Vérifie si tous les joueurs sont prêts pour commencer un nouveau tour
-            if len(self.joueurs_prets) == len(self.clients) and (len(self.clients) >= 3 or self.premier_tour_passe):
-                self.commencer_nouveau_tour()  # Commence un nouveau tour si toutes les conditions sont remplies
-                self.premier_tour_passe = True
-            elif not self.premier_tour_passe:
-                # Affichage de l'état de préparation des joueurs avant le début du jeu
-                print(f"En attente que tous les joueurs soient prêts. {len(self.joueurs_prets)}/{len(self.clients)} joueurs prêts.")
-
-
-    def commencer_nouveau_tour(self):
-        # Début d'un nouveau tour de jeu
-        # Réinitialisation de la taille de la grille pour le nouveau tour
-        self.taille_grille = random.randint(self.taille_grille_min, self.taille_grille_max)
-        self.position_chat = self.generer_position_chat()  # Génération d'une nouvelle position pour le chat
-        self.joueurs_prets.clear()  # Réinitialisation des joueurs prêts pour le nouveau tour
-        for nom_joueur in self.clients.values():
-            self.choix_joueurs[nom_joueur] = None  # Réinitialisation des choix des joueurs pour le nouveau tour
-            # Envoi de la nouvelle position du chat et de la taille de la grille aux joueurs
-            self.envoyer_message(nom_joueur, {
-                "type": "DEBUT_TOUR",
-                "position_chat": self.position_chat_numero(),
-                "taille_grille": self.taille_grille
-            })
-        self.partie_en_cours = True  # Indication que la partie est en cours
-
-
-    def traiter_choix(self, client_socket, position):
-        # Traitement du choix de position envoyé par un joueur
-        nom_joueur = self.clients[client_socket]
-        with self.verrou:
-            # Enregistrement du choix du joueur
-            self.choix_joueurs[nom_joueur] = position
-            # Si tous les joueurs ont fait leur choix, calculer les scores
-            if all(choix is not None for choix in self.choix_joueurs.values()):
-                self.calculer_scores()
-                self.envoyer_scores()
-
-
-    def calculer_scores(self):
-        # Calcul des scores des joueurs en fonction de leurs choix et de la position du chat
-        chat_x, chat_y = self.position_chat
-        for nom_joueur, position in self.choix_joueurs.items():
-            joueur_x, joueur_y = divmod(position, self.taille_grille)
-            # Attribution des points en fonction de la proximité du choix avec la position du chat
-            if (joueur_x, joueur_y) == (chat_x, chat_y):
-                self.scores_joueurs[nom_joueur] += 10
-            elif (abs(joueur_x - chat_x) == 1 and joueur_y == chat_y) or \
-                 (abs(joueur_y - chat_y) == 1 and joueur_x == chat_x):
-                self.scores_joueurs[nom_joueur] += 2
-            else:
-                self.scores_joueurs[nom_joueur] -= 1
-        
-        # Mise en place d'un délai avant de vérifier la fin du jeu pour permettre aux joueurs de voir les résultats
-        timer = threading.Timer(3.0, self.verifier_fin_jeu)
-        timer.start()
-
-
-    
-    def verifier_fin_jeu(self):
-        # Vérifie si la partie doit se terminer
-        with self.verrou:
-            # Identifie les joueurs dont le score est inférieur ou égal à 0
-            joueurs_a_retirer = [nom for nom, score in self.scores_joueurs.items() if score <= 0]
-            for nom_joueur in joueurs_a_retirer:
-                # Envoi un message aux joueurs éliminés et les retire du jeu
-                self.envoyer_message(nom_joueur, {"type": "FIN_JEU", "message": "Vous avez perdu toutes vos vies!"})
-
-            # Si tous les joueurs sont éliminés,  le serveur s'arrete
-            if len(self.scores_joueurs) - len(joueurs_a_retirer) == 0:
-                print("Tous les joueurs ont perdu. Partie terminée.")
-                self.arreter_serveur()
-            elif len(self.scores_joueurs) - len(joueurs_a_retirer) == 1:
-                # S'il reste un seul joueur, il est le gagnant
-                gagnant = next(iter(set(self.scores_joueurs.keys()) - set(joueurs_a_retirer)))
-                print(f"{gagnant} est le gagnant!")
-                self.envoyer_message(gagnant, {"type": "INFO", "message": "Félicitations, vous êtes le gagnant!"})
-                self.arreter_serveur()
-
-
-    def position_chat_numero(self):
-        # Calcule la position numérique du chat dans la grille
-        return self.position_chat[0] * self.taille_grille + self.position_chat[1]
-    
-
-    def envoyer_scores(self):
-        # Envoi les scores actuels et la position du chat à tous les clients
-        mise_a_jour = {
-            "type": "SCORES",
-            "position_chat": self.position_chat_numero(),
-            "scores": {nom: score for nom, score in self.scores_joueurs.items()},
-            "chat_position": self.position_chat_numero()
-        }
-        for client_socket in self.clients.keys():
-            self.envoyer_message_par_socket(client_socket, mise_a_jour)
-
-
-    def traiter_chat(self, texte, client_socket):
-        # Traite un message de chat envoyé par un joueur
-        nom_joueur = self.clients[client_socket]
-        message_chat = f"{nom_joueur}: {texte}"
-        with self.verrou:
-            self.historique_chat.append(message_chat)  # Ajoute le message à l'historique
-            self.diffuser_chat()  # Diffuse le message à tous les joueurs
-
-    def diffuser_chat(self):
-        # Diffuse les derniers messages de chat à tous les clients
-        mise_a_jour_chat = {
-            "type": "CHAT",
-            "historique_chat": self.historique_chat[-10:]  # Envoyer les 10 derniers messages
+            self.faucheur.oublier(client_socket)
+            self.enregistreur.deconnexion(client_socket)
+            connexion = self.connexions.pop(client_socket, None)
+            if connexion is not None:
+                connexion.fermer()
+
+
+    def traiter_action(self, client_socket, message):
+        # Traitement de l'action demandée par le client
+        action = message.get("action")  # Extraction de l'action demandée par le client
+        self.metriques.messages_recus.inc(etiquette=action)
+        self.enregistreur.message(client_socket, message)
+        if action == "NOM":
+            self.enregistrer_nom(client_socket, message["nom"], message.get("partie"), message.get("encodages", ()))
+        elif action == "REPRISE":
+            self.reprendre_session(client_socket, message["jeton"], message.get("encodages", ()))
+        elif action == "DECONNEXION":
+            self.quitter(client_socket)
+        elif action == "PARTIES":
+            self.envoyer_message_par_socket(client_socket, {"type": "PARTIES", "parties": self.lobby.lister()})
+        elif action == "SPECTATEUR":
+            self.observer(client_socket, message.get("partie"))
+        elif action == "PONG":
+            pass  # Réponse à un PING : l'activité de la connexion a déjà été notée à la lecture
+        else:
+            # Les autres actions concernent la partie du joueur
+            partie = self.parties_clients.get(client_socket)
+            if partie is None:
+                return  # Joueur pas encore placé dans une partie
+            if action == "PRET":
+                partie.gerer_pret(client_socket)
+            elif action == "CHOIX":
+                partie.traiter_choix(client_socket, message["position"])
+            elif action == "CHAT":
+                partie.traiter_chat(message["text"], client_socket)
+            elif action == "CHAT_HISTORIQUE":
+                partie.envoyer_historique_chat(client_socket, message.get("depuis", 0))
+
+
+    def enregistrer_nom(self, client_socket, nom_joueur, demande=None, encodages=()):
+        # Place le joueur dans une partie : celle demandée, une nouvelle, ou une partie ouverte.
+        # encodages liste les encodages que le client sait lire ; le binaire est retenu s'il en fait partie.
+        if client_socket in self.parties_clients:
+            return  # Le joueur est déjà dans une partie
+        self.spectateurs.retirer(client_socket)  # Un spectateur peut devenir joueur
+        connexion = self.connexions.get(client_socket)
+        if connexion is not None:
+            connexion.binaire = ENCODAGE_BINAIRE in encodages
+        while True:
+            partie = self.lobby.placer(demande)
+            if partie is None:
+                print("Un joueur a tenté de rejoindre une partie en cours ou inexistante.")
+                self.envoyer_message_par_socket(client_socket, {"type": "INFO", "message": "Cette partie est déjà en cours ou n'existe pas. Veuillez réessayer plus tard."})
+                return
+            if partie.enregistrer_nom(client_socket, nom_joueur):
+                self.parties_clients[client_socket] = partie
+                return
+            if nom_joueur in partie.inscrits:
+                return  # Nom déjà pris, éventuellement par un joueur en attente de reprise : il a été prévenu
+            if demande not in (None, "nouvelle"):
+                # La partie demandée a commencé ou s'est remplie entre-temps
+                self.envoyer_message_par_socket(client_socket, {"type": "INFO", "message": "Cette partie est déjà en cours ou complète. Veuillez réessayer plus tard."})
+                return
+            # La partie choisie a commencé ou s'est remplie entre-temps : on en cherche une autre
+
+
+    def reprendre_session(self, client_socket, jeton, encodages=()):
+        # Rattache le client à la place qu'il occupait avant une coupure, s'il est revenu à temps
+        if client_socket in self.parties_clients:
+            return  # Le joueur est déjà dans une partie
+        self.spectateurs.retirer(client_socket)
+        connexion = self.connexions.get(client_socket)
+        if connexion is not None:
+            connexion.binaire = ENCODAGE_BINAIRE in encodages
+        partie = self.sessions.get(jeton)
+        if partie is not None:
+            # Enregistré avant la reprise, pour que les actions suivantes du client trouvent sa partie
+            self.parties_clients[client_socket] = partie
+            if partie.reprendre(client_socket, jeton):
+                return
+            self.parties_clients.pop(client_socket, None)
+        self.envoyer_message_par_socket(client_socket, {"type": "REPRISE_REFUSEE", "message": "Session expirée, veuillez rejoindre une nouvelle partie."})
+
+
+    def observer(self, client_socket, demande=None):
+        # Rattache un spectateur à une partie, même commencée. Il n'est placé dans aucune partie : il ne
+        # compte pas parmi les joueurs, et ses PRET, CHOIX ou CHAT sont ignorés.
+        if client_socket in self.parties_clients:
+            return  # Un joueur ne peut pas regarder une autre partie
+        partie = self.lobby.trouver(demande)
+        if partie is None:
+            self.envoyer_message_par_socket(client_socket, {"type": "INFO", "message": "Aucune partie à regarder."})
+            return
+        self.envoyer_message_par_socket(client_socket, {"type": "SPECTATEUR", "partie": partie.identifiant})
+        self.spectateurs.ajouter(client_socket, partie)
+
+
+    def creer_jeton(self, partie):
+        # Jeton secret permettant de reprendre sa place après une coupure ; il commence par l'identifiant
+        # de la partie, pour que le frontal du mode grappe sache quel ouvrier la sert
+        return f"{partie.identifiant}.{secrets.token_urlsafe(16)}"
+
+
+    def statistiques_chat(self):
+        # Lignes de chat limitées et regroupées, cumulées sur les parties en cours
+        parties = self.lobby.lister_parties()
+        return {
+            "limites": sum(partie.chat_limites for partie in parties),
+            "fusionnes": sum(partie.chat_fusionnes for partie in parties),
         }
-        for client_socket in self.clients.keys():
-            self.envoyer_message_par_socket(client_socket, mise_a_jour_chat)
 
 
-    def envoyer_message(self, nom_joueur, message):
-        # Envoi un message à un joueur spécifique
-        client_socket = self.noms_clients[nom_joueur]
-        if client_socket:
-            self.envoyer_message_par_socket(client_socket, message)
+    def encodage(self, client_socket):
+        # Encodage négocié par le client lors de NOM
+        connexion = self.connexions.get(client_socket)
+        if connexion is not None and connexion.binaire:
+            return ENCODAGE_BINAIRE
+        return ENCODAGE_JSON
 
 
-    def envoyer_message_par_socket(self, client_socket, message):
-        # Envoi un message à travers le socket spécifié
-        try:
-            client_socket.sendall(json.dumps(message).encode('utf-8'))
-        except Exception as e:
-            print(f"Erreur lors de l'envoi d'un message: {e}")
-            self.retirer_joueur(client_socket)
+    def envoyer_message_par_socket(self, client_socket, message, cle=None, identifiants=None):
+        # Dépose un message dans la file d'envoi du client ; cle permet de remplacer une
+        # mise à jour de même nature encore en attente
+        self.metriques.messages_envoyes.inc(etiquette=message.get("type"))
+        connexion = self.connexions.get(client_socket)
+        if connexion is None:
+            return
+        if connexion.binaire:
+            connexion.envoyer(encoder_binaire(message, identifiants), cle)
+        else:
+            connexion.envoyer(encoder_message(message), cle)
+
+
+    def diffuser(self, sockets, message, cle=None, identifiants=None):
+        # Envoi un même message à plusieurs clients : il n'est encodé qu'une seule fois par encodage.
+        # identifiants (nom -> identifiant de joueur) permet l'encodage binaire des scores.
+        metriques = self.metriques
+        if metriques.actif:
+            debut = time.perf_counter()
+        trames = {}  # Trame déjà encodée pour chaque encodage (binaire ou non)
+        destinataires = 0
+        for client_socket in sockets:
+            connexion = self.connexions.get(client_socket)
+            if connexion is None:
+                continue
+            donnees = trames.get(connexion.binaire)
+            if donnees is None:
+                if connexion.binaire:
+                    donnees = encoder_binaire(message, identifiants)
+                else:
+                    donnees = encoder_message(message)
+                trames[connexion.binaire] = donnees
+            connexion.envoyer(donnees, cle)
+            destinataires += 1
+        if metriques.actif:
+            metriques.duree_diffusion.observer(time.perf_counter() - debut)
+            metriques.messages_envoyes.inc(destinataires, message.get("type"))
+
+
+    def fermer_connexion(self, client_socket, immediat=False):
+        # Ferme la connexion d'un client après l'envoi de ses messages en attente,
+        # ou tout de suite si immediat (client trop lent)
+        connexion = self.connexions.get(client_socket)
+        if connexion is not None:
+            connexion.fermer(immediat)
+
+
+    def oublier_client(self, client_socket):
+        # Détache un client de sa partie sans fermer sa connexion
+        return self.parties_clients.pop(client_socket, None)
 
 
     def retirer_joueur(self, client_socket):
-        # Retire un joueur de la partie et ferme sa connexion
-        with self.verrou:
-            nom_joueur = self.clients.pop(client_socket, None)
-            if nom_joueur:
-                print(f"{nom_joueur} s'est déconnecté.")
-                self.noms_clients.pop(nom_joueur, None)
-                self.scores_joueurs.pop(nom_joueur, None)
-                self.choix_joueurs.pop(nom_joueur, None)
-                self.joueurs_prets.discard(nom_joueur)
-                print(f"{nom_joueur} a été retiré du jeu.")
-
-                try:
-                    client_socket.close()
-                except Exception as e:
-                    print(f"Erreur lors de la fermeture d'un client socket: {e}")
-
-
-    def terminer_partie(self):
-        # Termine la partie et arrête le serveur
-        if len(self.clients) == 0:
-            print("Tous les joueurs ont perdu. Partie terminée.")
-        else:
-            print("Pas assez de joueurs pour continuer le jeu.")
-        self.arreter_serveur()
+        # Connexion perdue : ferme la connexion, la partie garde la place du joueur pour une reprise.
+        # Toujours appelé hors de tout verrou de partie (fin de lecture ou échec d'écriture).
+        self.fermer_connexion(client_socket)
+        if self.spectateurs.retirer(client_socket):
+            return
+        partie = self.oublier_client(client_socket)
+        if partie is not None:
+            partie.deconnecter_joueur(client_socket)
+
+
+    def quitter(self, client_socket):
+        # Départ volontaire (DECONNEXION) : le joueur quitte définitivement sa partie
+        self.spectateurs.retirer(client_socket)
+        partie = self.oublier_client(client_socket)
+        if partie is not None:
+            partie.retirer_joueur(client_socket)
+        self.fermer_connexion(client_socket)
+
+
+    def planifier(self, delai, fonction):
+        # Exécute une fonction après un délai en secondes ; renvoie une tâche annulable par cancel()
+        return self.ordonnanceur.planifier(delai, fonction)
 
 
     def arreter_serveur(self):
-        # Arrête le serveur et ferme toutes les connexions
-        with self.verrou:
-            for nom_joueur in self.clients.values():
-                self.envoyer_message(nom_joueur, {"type": "INFO", "message": "Le serveur est arrêté."})
-            time.sleep(1)  # Donner un peu de temps pour que les messages soient envoyés
-            for client_socket in list(self.clients.keys()):
-                try:
-                    client_socket.close()
-                except Exception as e:
-                    print(f"Erreur lors de la fermeture d'un client socket: {e}")
-            self.socket_serveur.close()  # Ferme le socket serveur
-            self.clients.clear()  # Efface tous les clients
-            self.noms_clients.clear()  # Efface tous les noms clients
-            self.scores_joueurs.clear()  # Efface tous les scores
-            self.choix_joueurs.clear()  # Efface tous les choix
-            self.joueurs_prets.clear()  # Efface la liste des joueurs prêts
-            self.partie_en_cours = False  # Indique que la partie n'est plus en cours
-            print("Serveur arrêté.")
+        # Arrêt en douceur : plus aucune connexion acceptée, les parties sont terminées, puis chaque
+        # connexion envoie ce qui reste dans sa file avant de se fermer, dans la limite de delai_arret
+        echeance = time.monotonic() + self.delai_arret
+        self.fermer_ecoute()  # Ferme le socket serveur
+        connexions = list(self.connexions.values())
+        for partie in self.lobby.vider():
+            partie.annoncer("Le serveur est arrêté.")
+            partie.fermer()  # Chaque connexion se ferme une fois sa file vidée
+        for client_socket in self.spectateurs.arreter():
+            self.fermer_connexion(client_socket)
+        for client_socket in list(self.connexions):
+            self.fermer_connexion(client_socket)  # Clients placés dans aucune partie
+        self.faucheur.arreter()
+        self.ordonnanceur.arreter()
+        if self.serveur_admin is not None:
+            self.serveur_admin.arreter()
+        self.stockage.fermer()  # Écrit ce qui reste de l'historique
+        self.enregistreur.fermer()
+        self.attendre_envois(connexions, echeance)
+        print("Serveur arrêté.")
+
+
+    def attendre_envois(self, connexions, echeance):
+        # Attend que les écrivains aient vidé leur file ; ceux qui n'ont pas fini à l'échéance sont coupés
+        en_retard = 0
+        for connexion in connexions:
+            if not connexion.attendre(echeance - time.monotonic()):
+                en_retard += 1
+        if en_retard:
+            print(f"{en_retard} connexion(s) coupée(s) avant d'avoir tout reçu.")
+
+
+    def fermer_ecoute(self):
+        # Arrête d'écouter les nouvelles connexions
+        self.socket_serveur.close()
 
 if __name__ == "__main__":
     serveur = Serveur()
-    serveur.demarrer_serveur()  # Démarre le serveur
\ No newline at end of file
+    serveur.demarrer_serveur()  # Démarre le serveur
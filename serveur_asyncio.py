@@ -0,0 +1,188 @@
+import asyncio
+import signal
+import threading
+import time
+
+from connexion import FileSortante, activer_keepalive
+from protocole import DecodeurFlux, ErreurProtocole, TAILLE_LECTURE
+from releve import annoncer_pret, sockets_herites
+from server import Serveur
+
+
+class ConnexionAsyncio:
+    # Connexion d'un client du serveur asyncio : même file d'envoi bornée que Connexion,
+    # vidée par une tâche écrivain au lieu d'un thread
+    def __init__(self, ecrivain, serveur, taille_file=1024 * 1024, delai_retard=5.0):
+        self.ecrivain = ecrivain
+        self.serveur = serveur
+        self.file = FileSortante(taille_file, delai_retard)
+        self.evenement = asyncio.Event()  # Signale des trames en attente ou la fermeture
+        self.fermee = False
+        self.binaire = False  # Encodage binaire négocié lors de NOM
+        self.tache = asyncio.get_running_loop().create_task(self.boucle_envoi())
+
+
+    def envoyer(self, donnees, cle=None):
+        # Dépose une trame déjà encodée dans la file d'envoi
+        if self.fermee:
+            return
+        if not self.file.ajouter(donnees, cle):
+            # Comme pour Connexion : la coupure termine la lecture, qui retire le joueur
+            print("Client trop lent, déconnexion.")
+            self.fermer(immediat=True)
+            return
+        self.evenement.set()
+
+
+    async def boucle_envoi(self):
+        # Envoie par lots, en attendant que le client ait lu le lot précédent
+        try:
+            while True:
+                await self.evenement.wait()
+                self.evenement.clear()
+                donnees = self.file.extraire()
+                if donnees:
+                    self.ecrivain.write(donnees)
+                    self.serveur.metriques.octets_envoyes.inc(len(donnees))
+                    await self.ecrivain.drain()
+                if self.fermee and not self.file:
+                    break
+        except ConnectionError as e:
+            if not self.fermee:
+                print(f"Erreur lors de l'envoi d'un message: {e}")
+                self.serveur.retirer_joueur(self.ecrivain)
+        finally:
+            self.ecrivain.close()
+
+
+    def fermer(self, immediat=False):
+        # Ferme la connexion, après avoir envoyé les trames en attente sauf si immediat
+        self.fermee = True
+        if immediat:
+            self.file.extraire()
+            self.ecrivain.transport.abort()  # Abandonne aussi le tampon du transport
+        self.evenement.set()
+
+
+class ServeurAsyncio(Serveur):
+    # Variante du serveur où toutes les connexions sont servies par une seule boucle asyncio
+    # au lieu d'un thread par client. Les règles du jeu restent celles de Serveur : seules
+    # l'acceptation, la lecture, l'envoi et la planification changent.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.boucle = None  # Boucle asyncio, connue une fois le serveur démarré
+        self.serveur_asyncio = None  # Serveur renvoyé par asyncio.start_server
+        self.vidage = None  # Tâche qui attend la fin des envois lors de l'arrêt
+
+
+    def demarrer_serveur(self):
+        # Démarrage du serveur dans une nouvelle boucle asyncio
+        try:
+            asyncio.run(self.servir())
+        except asyncio.CancelledError:
+            pass  # Le serveur a été arrêté par arreter_serveur
+
+
+    async def servir(self):
+        # Écoute les connexions entrantes jusqu'à l'arrêt du serveur
+        self.boucle = asyncio.get_running_loop()
+        herites = sockets_herites()
+        self.demarrer_admin(herites.get("admin"))
+        self.spectateurs.programmer()
+        self.faucheur.demarrer()
+        # Le socket d'écoute est ouvert comme dans Serveur, pour pouvoir être transmis lors d'une relève
+        self.ouvrir_ecoute(herites.get("ecoute"))
+        self.serveur_asyncio = await asyncio.start_server(self.gerer_connexion, sock=self.socket_serveur)
+        print(f"Serveur en écoute sur l'adresse {self.hote} et sur le port {self.port}")
+        self.installer_signaux()
+        annoncer_pret()
+        async with self.serveur_asyncio:
+            try:
+                await self.serveur_asyncio.serve_forever()
+            except asyncio.CancelledError:
+                pass  # Écoute fermée par arreter_serveur
+            if self.vidage is not None:
+                await self.vidage
+
+
+    def installer_signaux(self):
+        # Mêmes signaux que Serveur, traités par la boucle
+        if threading.current_thread() is not threading.main_thread():
+            return
+        self.boucle.add_signal_handler(signal.SIGTERM, self.demander_arret)
+        self.boucle.add_signal_handler(signal.SIGINT, self.demander_arret)
+        self.boucle.add_signal_handler(signal.SIGUSR2, self.lancer_releve)
+
+
+    def demander_arret(self):
+        # Appelable depuis n'importe quel thread, dont celui de la relève
+        if not self.arret_demande:
+            self.arret_demande = True
+            self.boucle.call_soon_threadsafe(self.arreter_serveur)
+
+
+    async def gerer_connexion(self, lecteur, ecrivain):
+        # Équivalent de gerer_client pour une connexion asyncio.
+        # L'écrivain sert d'identifiant du client, comme le socket dans Serveur.
+        if self.keepalive:
+            activer_keepalive(ecrivain.get_extra_info('socket'))
+        self.connexions[ecrivain] = ConnexionAsyncio(ecrivain, self, self.taille_file_envoi, self.delai_retard)
+        self.faucheur.suivre(ecrivain)
+        self.enregistreur.connexion(ecrivain)
+        decodeur = DecodeurFlux()  # Tampon de lecture propre à cette connexion
+        try:
+            while True:
+                donnees = await lecteur.read(TAILLE_LECTURE)
+                if not donnees:
+                    break  # La connexion a été fermée par le client
+                self.faucheur.signaler(ecrivain)
+                for message in decodeur.alimenter(donnees):
+                    self.traiter_action(ecrivain, message)
+        except ConnectionError as erreur_connexion:
+            # Gestion des erreurs de socket
+            print(f"{erreur_connexion}")
+        except ErreurProtocole as erreur_protocole:
+            # Flux corrompu : on ne peut plus se resynchroniser, la connexion est abandonnée
+            print(f"Erreur de protocole : {erreur_protocole}")
+        finally:
+            # Assure la déconnexion propre du client
+            self.retirer_joueur(ecrivain)
+            self.faucheur.oublier(ecrivain)
+            self.enregistreur.deconnexion(ecrivain)
+            connexion = self.connexions.pop(ecrivain, None)
+            if connexion is not None:
+                connexion.fermer()
+
+
+    def planifier(self, delai, fonction):
+        # Les délais sont gérés par la boucle elle-même : l'ordonnanceur à thread n'est jamais démarré
+        return self.boucle.call_later(delai, fonction)
+
+
+    def attendre_envois(self, connexions, echeance):
+        # Appelé dans la boucle : l'attente est confiée à une tâche, attendue par servir après la fin de l'écoute
+        self.vidage = self.boucle.create_task(self.vider_envois(connexions, echeance))
+
+
+    async def vider_envois(self, connexions, echeance):
+        # Attend les tâches écrivains jusqu'à l'échéance ; les connexions en retard sont coupées
+        taches = [connexion.tache for connexion in connexions]
+        if taches:
+            await asyncio.wait(taches, timeout=max(echeance - time.monotonic(), 0))
+        en_retard = [connexion for connexion in connexions if not connexion.tache.done()]
+        for connexion in en_retard:
+            connexion.fermer(immediat=True)
+        if en_retard:
+            print(f"{len(en_retard)} connexion(s) coupée(s) avant d'avoir tout reçu.")
+            await asyncio.wait([connexion.tache for connexion in en_retard], timeout=1.0)
+
+
+    def fermer_ecoute(self):
+        # Arrête d'accepter les connexions, ce qui termine aussi serve_forever
+        if self.serveur_asyncio is not None:
+            self.serveur_asyncio.close()
+
+
+if __name__ == "__main__":
+    serveur = ServeurAsyncio()
+    serveur.demarrer_serveur()  # Démarre le serveur
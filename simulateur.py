@@ -0,0 +1,178 @@
+import argparse
+import collections
+import concurrent.futures
+import os
+import random
+import time
+
+from bot import STRATEGIES
+from regles import ecarts_scores, generer_position_chat, joueurs_elimines
+
+
+def simuler_partie(rng, strategies, taille_grille_min=3, taille_grille_max=10, points_depart=10, tours_max=10000):
+    # Joue une partie sans réseau, avec les règles du serveur : chaque tour tire une grille et la
+    # position du chat, chaque joueur choisit une case selon sa stratégie, les scores sont mis à jour
+    # puis les joueurs à 0 point ou moins sont éliminés. La partie s'arrête quand il reste au plus un joueur.
+    scores = {numero: points_depart for numero in range(len(strategies))}
+    eliminations = []  # Tour d'élimination de chaque joueur éliminé
+    tours = 0
+    while len(scores) > 1 and tours < tours_max:
+        tours += 1
+        taille_grille = rng.randint(taille_grille_min, taille_grille_max)
+        position_chat = generer_position_chat(taille_grille, rng)
+        # Même contenu que le message DEBUT_TOUR reçu par les bots
+        debut_tour = {"type": "DEBUT_TOUR", "position_chat": position_chat[0] * taille_grille + position_chat[1],
+                      "taille_grille": taille_grille}
+        joueurs = list(scores)
+        positions = [strategies[numero](debut_tour, rng) for numero in joueurs]
+        for numero, ecart in zip(joueurs, ecarts_scores(positions, taille_grille, position_chat)):
+            scores[numero] += ecart
+        elimines = joueurs_elimines(scores)
+        if len(elimines) == len(scores):
+            # Tous éliminés au même tour : pas de gagnant, l'écart est mesuré sur les scores de ce tour
+            classement = sorted(scores.values(), reverse=True)
+            marge = classement[0] - classement[1] if len(classement) > 1 else 0
+            eliminations.extend(tours for _ in elimines)
+            return {"tours": tours, "eliminations": eliminations, "gagnant": None, "marge": marge}
+        scores_elimines = [scores.pop(numero) for numero in elimines]
+        eliminations.extend(tours for _ in elimines)
+        if len(scores) == 1:
+            # Écart entre le gagnant et le meilleur des joueurs éliminés à ce dernier tour
+            (gagnant, score_gagnant), = scores.items()
+            return {"tours": tours, "eliminations": eliminations, "gagnant": gagnant,
+                    "marge": score_gagnant - max(scores_elimines)}
+    # Partie interrompue (stratégies qui ne perdent jamais) ou partie à un seul joueur
+    return {"tours": tours, "eliminations": eliminations, "gagnant": None, "marge": None}
+
+
+def simuler_lot(graine, nombre_parties, noms_strategies, taille_grille_min, taille_grille_max, points_depart, tours_max):
+    # Exécuté dans un processus du pool : joue un lot de parties et renvoie des distributions agrégées,
+    # pour ne pas renvoyer un résultat par partie au processus principal
+    rng = random.Random(graine)
+    strategies = [STRATEGIES[nom] for nom in noms_strategies]
+    resultats = {
+        "parties": 0,
+        "interrompues": 0,
+        "sans_gagnant": 0,
+        "tours": collections.Counter(),
+        "eliminations": collections.Counter(),
+        "marges": collections.Counter(),
+        "victoires": collections.Counter(),  # Victoires par stratégie
+    }
+    for _ in range(nombre_parties):
+        partie = simuler_partie(rng, strategies, taille_grille_min, taille_grille_max, points_depart, tours_max)
+        resultats["parties"] += 1
+        resultats["tours"][partie["tours"]] += 1
+        resultats["eliminations"].update(partie["eliminations"])
+        if partie["marge"] is None:
+            resultats["interrompues"] += 1
+        else:
+            resultats["marges"][partie["marge"]] += 1
+            if partie["gagnant"] is None:
+                resultats["sans_gagnant"] += 1
+            else:
+                resultats["victoires"][noms_strategies[partie["gagnant"]]] += 1
+    return resultats
+
+
+def fusionner(total, resultats):
+    # Ajoute les résultats d'un lot au total
+    for cle, valeur in resultats.items():
+        if cle in total:
+            total[cle] += valeur
+        else:
+            total[cle] = valeur
+
+
+def centile(distribution, proportion):
+    # Centile d'une distribution donnée sous forme de Counter {valeur: effectif}
+    total = sum(distribution.values())
+    if not total:
+        return float("nan")
+    rang = proportion * (total - 1)
+    cumul = 0
+    for valeur in sorted(distribution):
+        cumul += distribution[valeur]
+        if cumul > rang:
+            return valeur
+    return max(distribution)
+
+
+def decrire(titre, distribution):
+    # Une ligne de résumé : moyenne et centiles
+    total = sum(distribution.values())
+    if not total:
+        return f"{titre:<22} aucune donnée"
+    moyenne = sum(valeur * effectif for valeur, effectif in distribution.items()) / total
+    centiles = ", ".join(f"p{int(p * 100)} {centile(distribution, p)}" for p in (0.1, 0.5, 0.9, 0.99))
+    return f"{titre:<22} moyenne {moyenne:.2f}, {centiles}, max {max(distribution)}"
+
+
+def histogramme(distribution, largeur=50, classes=20):
+    # Histogramme texte, par classes de même largeur
+    if not distribution:
+        return []
+    minimum, maximum = min(distribution), max(distribution)
+    pas = max(1, -(-(maximum - minimum + 1) // classes))
+    effectifs = collections.Counter()
+    for valeur, effectif in distribution.items():
+        effectifs[(valeur - minimum) // pas] += effectif
+    plus_grand = max(effectifs.values())
+    lignes = []
+    for classe in range(max(effectifs) + 1):
+        debut = minimum + classe * pas
+        barre = "#" * round(effectifs[classe] / plus_grand * largeur)
+        lignes.append(f"  {debut:>6}-{debut + pas - 1:<6} {effectifs[classe]:>10} {barre}")
+    return lignes
+
+
+def rapport(total, noms_strategies, duree):
+    parties = total["parties"]
+    print(f"{parties:,} parties de {len(noms_strategies)} joueurs en {duree:.1f} s ({parties / duree:,.0f} parties/s)")
+    print(f"Parties sans gagnant (tous éliminés au même tour) : {total['sans_gagnant'] / parties:.2%}")
+    if total["interrompues"]:
+        print(f"Parties interrompues après le nombre maximal de tours : {total['interrompues'] / parties:.2%}")
+    print(decrire("Tours par partie", total["tours"]))
+    for ligne in histogramme(total["tours"]):
+        print(ligne)
+    print(decrire("Tour d'élimination", total["eliminations"]))
+    print(decrire("Marge du gagnant", total["marges"]))
+    # Chaque stratégie peut être jouée par plusieurs joueurs
+    nombre_par_strategie = collections.Counter(noms_strategies)
+    for nom, nombre in sorted(nombre_par_strategie.items()):
+        print(f"Victoires {nom} ({nombre} joueur(s)) : {total['victoires'][nom] / parties:.2%}")
+
+
+def simuler(nombre_parties, noms_strategies, taille_grille_min=3, taille_grille_max=10, points_depart=10,
+            tours_max=10000, processus=None, taille_lot=10000, graine=0):
+    # Répartit les parties en lots sur un pool de processus et renvoie les distributions fusionnées
+    total = {}
+    lots = [min(taille_lot, nombre_parties - debut) for debut in range(0, nombre_parties, taille_lot)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processus) as pool:
+        # Chaque lot a sa propre graine, pour des résultats reproductibles quel que soit l'ordonnancement
+        futures = [pool.submit(simuler_lot, graine * 1000003 + numero, taille, noms_strategies, taille_grille_min,
+                               taille_grille_max, points_depart, tours_max)
+                   for numero, taille in enumerate(lots)]
+        for future in concurrent.futures.as_completed(futures):
+            fusionner(total, future.result())
+    return total
+
+
+if __name__ == "__main__":
+    parseur = argparse.ArgumentParser(description="Simule des parties pour régler la grille et les points de départ")
+    parseur.add_argument("--parties", type=int, default=100000)
+    parseur.add_argument("--strategies", nargs="+", default=["aleatoire"] * 4, choices=list(STRATEGIES),
+                         help="stratégie de chaque joueur")
+    parseur.add_argument("--taille-grille-min", type=int, default=3)
+    parseur.add_argument("--taille-grille-max", type=int, default=10)
+    parseur.add_argument("--points-depart", type=int, default=10)
+    parseur.add_argument("--tours-max", type=int, default=10000)
+    parseur.add_argument("--processus", type=int, default=os.cpu_count())
+    parseur.add_argument("--taille-lot", type=int, default=10000)
+    parseur.add_argument("--graine", type=int, default=0)
+    arguments = parseur.parse_args()
+    debut = time.perf_counter()
+    total = simuler(arguments.parties, arguments.strategies, arguments.taille_grille_min, arguments.taille_grille_max,
+                    arguments.points_depart, arguments.tours_max, arguments.processus, arguments.taille_lot,
+                    arguments.graine)
+    rapport(total, arguments.strategies, time.perf_counter() - debut)
@@ -0,0 +1,101 @@
+import threading
+
+
+class DiffuseurSpectateurs:
+    # Étage de diffusion séparé pour les spectateurs : les parties se contentent de changer de version,
+    # et ce diffuseur envoie au plus un instantané par partie et par période, encodé une seule fois pour
+    # tous ses spectateurs. Un public nombreux ne rallonge donc jamais la diffusion aux joueurs, et un
+    # spectateur lent ne garde en file que le dernier instantané (clé de regroupement "SPECTACLE").
+    def __init__(self, serveur, periode=0.25, lignes_chat=20):
+        self.serveur = serveur
+        self.periode = periode  # Intervalle entre deux passages, donc débit maximal par partie, en secondes
+        self.lignes_chat = lignes_chat  # Dernières lignes de chat incluses dans chaque instantané
+        self.spectateurs = {}  # Sockets des spectateurs de chaque partie
+        self.parties_spectateurs = {}  # Partie regardée par chaque socket spectateur
+        self.nouveaux = set()  # Spectateurs qui attendent leur premier instantané
+        # Verrou des trois attributs précédents ; jamais pris sous un verrou de partie, ni l'inverse
+        self.verrou = threading.Lock()
+        self.versions = {}  # Version de chaque partie dans le dernier instantané, lue et écrite par diffuser seul
+        self.arret = threading.Event()
+
+
+    def ajouter(self, client_socket, partie):
+        # Un socket ne regarde qu'une partie à la fois
+        with self.verrou:
+            self._retirer(client_socket)
+            self.parties_spectateurs[client_socket] = partie
+            self.spectateurs.setdefault(partie, set()).add(client_socket)
+            self.nouveaux.add(client_socket)
+
+
+    def retirer(self, client_socket):
+        # Renvoie True si le socket était un spectateur
+        with self.verrou:
+            return self._retirer(client_socket)
+
+
+    def _retirer(self, client_socket):
+        partie = self.parties_spectateurs.pop(client_socket, None)
+        if partie is None:
+            return False
+        sockets = self.spectateurs[partie]
+        sockets.discard(client_socket)
+        if not sockets:
+            del self.spectateurs[partie]
+        self.nouveaux.discard(client_socket)
+        return True
+
+
+    def nombre(self):
+        return len(self.parties_spectateurs)
+
+
+    def demarrer(self):
+        # Serveur à threads : un thread dédié, distinct des threads des joueurs et de l'ordonnanceur
+        threading.Thread(target=self.boucle, daemon=True).start()
+
+
+    def boucle(self):
+        while not self.arret.wait(self.periode):
+            self.diffuser()
+
+
+    def programmer(self):
+        # Serveur asyncio : les connexions ne se partagent pas entre threads, chaque passage est donc
+        # planifié dans la boucle du serveur
+        if self.arret.is_set():
+            return
+        self.diffuser()
+        self.serveur.planifier(self.periode, self.programmer)
+
+
+    def diffuser(self):
+        # Un passage : un instantané par partie qui a changé depuis le précédent ou qui a de nouveaux spectateurs
+        with self.verrou:
+            nouveaux = self.nouveaux
+            self.nouveaux = set()
+            groupes = [(partie, tuple(sockets)) for partie, sockets in self.spectateurs.items()]
+        versions = {}
+        for partie, sockets in groupes:
+            version = (partie.version, partie.seq_chat)
+            versions[partie] = version
+            if self.versions.get(partie) == version and nouveaux.isdisjoint(sockets):
+                continue
+            self.serveur.diffuser(sockets, partie.spectacle(self.lignes_chat), cle="SPECTACLE")
+            if partie.terminee:
+                # Le dernier instantané est parti : les spectateurs d'une partie finie sont déconnectés
+                for client_socket in sockets:
+                    if self.retirer(client_socket):
+                        self.serveur.fermer_connexion(client_socket)
+        self.versions = versions
+
+
+    def arreter(self):
+        # Arrête les passages et renvoie les sockets des spectateurs, que le serveur ferme
+        self.arret.set()
+        with self.verrou:
+            sockets = list(self.parties_spectateurs)
+            self.parties_spectateurs.clear()
+            self.spectateurs.clear()
+            self.nouveaux.clear()
+        return sockets